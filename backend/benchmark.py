@@ -0,0 +1,804 @@
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_all_start_methods, get_context
+from random import Random
+from statistics import mean, median
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import perf_counter
+from typing import Callable
+import gc
+import json
+import os
+import platform
+import sys
+import tracemalloc
+import numpy
+from compact_graph import CompactRoutingGraph
+from osm_data_types import BoundingBox, TagSetInterner
+from routing_engine import (
+    RouteCalculator,
+    RoutingEngine,
+    RoutingGraph,
+    RoutingOptions,
+)
+from routing_profile import DEFAULT_PROFILE, DEFAULT_WAY_TAG_KEYS, CompiledProfile
+from shared_graph import RouteWorkerPool
+from synthetic_osm import (
+    BLOCK_LAT,
+    BLOCK_LON,
+    ORIGIN,
+    synthetic_overpass_json,
+    synthetic_tag_corpus,
+)
+from tag_columns import TagColumns
+
+DEFAULT_SIZES = [10, 30, 60]
+DEFAULT_CORPUS_SIZE = 20_000
+DEFAULT_BULK_EDGES = 1_000_000
+# The same options as the demo route in main.py
+BENCHMARK_OPTIONS = {
+    "unpaved_paths": 0,
+    "paved_paths": 0,
+    "covered_paths": 1,
+    "indoor_paths": 0,
+    "pavements": 0,
+    "lit_paths": 0,
+    "steps": 0,
+    "prefer_marked_crossings": False,
+    "prefer_traffic_light_crossings": False,
+    "prefer_audible_crossings": False,
+    "prefer_dipped_kerbs": False,
+    "prefer_tactile_paving": False,
+    "allow_private_access": False,
+    "allow_customer_access": True,
+    "allow_walking_on_roads": True,
+    "allow_higher_traffic_roads": True,
+    "rights_of_way": 1,
+    "maintained_paths": 1,
+    "desire_paths": 0,
+    "treacherous_paths": -1,
+    "wheelchair_accessible": False,
+}
+
+
+def summarise(times: list[float]) -> dict:
+    """Summarises the durations (in seconds) of several runs of the same thing"""
+    return {
+        "runs": len(times),
+        "min": min(times),
+        "median": median(times),
+        "mean": mean(times),
+        "max": max(times),
+    }
+
+
+def time_each[T](function: Callable[[T], object], inputs: list[T]) -> list[float]:
+    times = []
+    for value in inputs:
+        start = perf_counter()
+        function(value)
+        times.append(perf_counter() - start)
+    return times
+
+
+def scan_edges_from_way(
+    graph: RoutingGraph, target_way_id: int
+) -> list[tuple[int, int]]:
+    """How `get_edges_from_way()` used to work (by checking every edge), to compare the index against"""
+    edges = []
+    for node_a, node_b, way_id in graph._graph.edges.data("id", default=0):  # type: ignore
+        if way_id == target_way_id:
+            edges.append((node_a, node_b))
+    return edges
+
+
+def random_point(size: int, random: Random) -> tuple[float, float]:
+    """Returns a point anywhere on a synthetic grid with `size` streets in each direction"""
+    return (
+        ORIGIN[0] + random.uniform(0, size - 1) * BLOCK_LAT,
+        ORIGIN[1] + random.uniform(0, size - 1) * BLOCK_LON,
+    )
+
+
+def benchmark_size(size: int, seed: int, repeat: int, queries: int) -> dict:
+    """Runs every benchmark on a synthetic graph with `size` streets in each direction"""
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(size, seed))
+    results: dict[str, dict] = {}
+
+    graphs = []
+
+    def compute_graph(_):
+        graphs.append(engine.compute_graph(ways, raw_nodes))
+
+    results["compute_graph"] = summarise(time_each(compute_graph, [None] * repeat))
+    graph = graphs[-1]
+
+    random = Random(seed)
+    points = [random_point(size, random) for _ in range(queries)]
+    journeys = [
+        (random_point(size, random), random_point(size, random)) for _ in range(queries)
+    ]
+
+    results["nearest_node"] = summarise(time_each(graph.nearest_node, points))
+
+    way_ids = [way.id for way in random.sample(ways, min(queries, len(ways)))]
+    results["get_edges_from_way"] = summarise(
+        time_each(graph.get_edges_from_way, way_ids)
+    )
+    results["get_edges_from_way_scan"] = summarise(
+        time_each(lambda way_id: scan_edges_from_way(graph, way_id), way_ids)
+    )
+
+    calculator = RouteCalculator(graph, RoutingOptions(BENCHMARK_OPTIONS))
+    routes = []
+    results["calculate_route_a_star"] = summarise(
+        time_each(
+            lambda journey: routes.append(calculator.calculate_route_a_star(*journey)),
+            journeys,
+        )
+    )
+    # Each stage of the route calculations, from the routes' own stats
+    for stage in ["snap", "search", "reconstruct"]:
+        results[f"route_{stage}"] = summarise(
+            [route.stats[f"{stage}_time"] for route in routes]
+        )
+
+    # The same journeys on a compact graph, which searches its node indexes with a weight column
+    compact_graph = engine.compute_graph(ways, raw_nodes, compact=True)
+    compact_calculator = RouteCalculator(
+        compact_graph, RoutingOptions(BENCHMARK_OPTIONS)
+    )
+    results["calculate_route_a_star_compact"] = summarise(
+        time_each(
+            lambda journey: compact_calculator.calculate_route_a_star(*journey),
+            journeys,
+        )
+    )
+
+    # Starting from a snapshot instead of building the graph (compare with compute_graph)
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "graph.snapshot")
+        results["save_snapshot"] = summarise(
+            time_each(lambda _: compact_graph.save_snapshot(path), [None] * repeat)
+        )
+        results["load_snapshot"] = summarise(
+            time_each(
+                lambda _: CompactRoutingGraph.load_snapshot(path), [None] * repeat
+            )
+        )
+
+        def cold_start(journey):
+            # Everything a new process does before it can answer its first route
+            graph = CompactRoutingGraph.load_snapshot(path)
+            calculator = RouteCalculator(graph, RoutingOptions(BENCHMARK_OPTIONS))
+            calculator.calculate_route_a_star(*journey)
+
+        results["snapshot_first_route"] = summarise(
+            time_each(cold_start, journeys[:repeat])
+        )
+
+    return {
+        "size": size,
+        "nodes": len(raw_nodes),
+        "ways": len(ways),
+        "graph_nodes": sum(1 for _ in graph.nodes()),
+        "benchmarks": results,
+    }
+
+
+def max_rss_bytes() -> int | None:
+    """Returns the peak resident set size of this process so far, or None where that isn't available (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports it in kilobytes, macOS in bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def measure_memory[T](function: Callable[[], T]) -> tuple[T, dict]:
+    """Calls `function`, and returns its result with how much memory (traced by `tracemalloc`) it used
+
+    - `retained_bytes` is how much more memory is in use afterwards, e.g. by the objects that it built,
+      and `peak_bytes` is the most that was in use at once while it ran (both relative to before it ran)
+    """
+    gc.collect()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    result = function()
+    gc.collect()
+    after, peak = tracemalloc.get_traced_memory()
+    return result, {
+        "retained_bytes": after - before,
+        "peak_bytes": peak - before,
+        "max_rss_bytes": max_rss_bytes(),
+    }
+
+
+def benchmark_memory(size: int, seed: int) -> dict:
+    """Measures the memory that the OSM elements and each kind of graph take up, for a synthetic graph
+
+    - `parse` is the `OSMWay`s and `OSMNode`s made from an Overpass response (which already exists),
+      so bytes per node and per way show how compact their representation is (both divide the same total,
+      because the nodes are shared between ways)
+    - Times would be skewed by `tracemalloc`, so this doesn't time anything
+    - `max_rss_bytes` is for the whole process so far, so it only ever goes up
+    """
+    engine = RoutingEngine()
+    response_json = synthetic_overpass_json(size, seed)
+    tracemalloc.start()
+    try:
+        (ways, raw_nodes), parse = measure_memory(
+            lambda: engine.parse_overpass_json(response_json)
+        )
+        graph, networkx_graph = measure_memory(
+            lambda: engine.compute_graph(ways, raw_nodes)
+        )
+        _, compact_graph = measure_memory(
+            lambda: engine.compute_graph(ways, raw_nodes, compact=True)
+        )
+    finally:
+        tracemalloc.stop()
+    parse["bytes_per_node"] = parse["retained_bytes"] / len(raw_nodes)
+    parse["bytes_per_way"] = parse["retained_bytes"] / len(ways)
+    graph_nodes = sum(1 for _ in graph.nodes())
+    for stats in (networkx_graph, compact_graph):
+        stats["bytes_per_node"] = stats["retained_bytes"] / graph_nodes
+    return {
+        "size": size,
+        "nodes": len(raw_nodes),
+        "ways": len(ways),
+        "graph_nodes": graph_nodes,
+        "memory": {
+            "parse": parse,
+            "compute_graph": networkx_graph,
+            "compute_graph_compact": compact_graph,
+        },
+    }
+
+
+def benchmark_workers(
+    size: int, seed: int, repeat: int, queries: int, max_workers: int
+) -> dict:
+    """Times routing the same journeys on a synthetic compact graph in this process, and spread across pools of
+    1, 2, 4, ... `max_workers` worker processes that share the graph (see `shared_graph`)
+
+    - Each pool routes every journey once before it's timed, so that its workers have started and attached
+      to the graph, and this process's calculator does the same
+    - `routes_per_second` is the throughput of the median run
+    """
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(size, seed))
+    compact_graph = engine.compute_graph(ways, raw_nodes, compact=True)
+    random = Random(seed)
+    journeys = [
+        (random_point(size, random), random_point(size, random)) for _ in range(queries)
+    ]
+    benchmarks = {}
+
+    calculator = RouteCalculator(compact_graph, RoutingOptions(BENCHMARK_OPTIONS))
+
+    def route_in_process(_):
+        for journey in journeys:
+            calculator.calculate_route_a_star(*journey)
+
+    route_in_process(None)
+    benchmarks["in_process"] = summarise(time_each(route_in_process, [None] * repeat))
+
+    worker_counts = [1]
+    while worker_counts[-1] * 2 < max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    if max_workers > 1:
+        worker_counts.append(max_workers)
+    for workers in worker_counts:
+        with RouteWorkerPool(compact_graph, workers) as pool:
+            # Small enough chunks that every worker gets a few of them
+            chunksize = max(1, len(journeys) // (workers * 4))
+
+            def route_in_workers(_):
+                for _ in pool.map_routes(
+                    BENCHMARK_OPTIONS, journeys, chunksize=chunksize
+                ):
+                    pass
+
+            route_in_workers(None)
+            benchmarks[f"workers_{workers}"] = summarise(
+                time_each(route_in_workers, [None] * repeat)
+            )
+    return {
+        "size": size,
+        "routes": len(journeys),
+        "benchmarks": benchmarks,
+        "routes_per_second": {
+            name: len(journeys) / stats["median"] for name, stats in benchmarks.items()
+        },
+    }
+
+
+def serve_overpass_response(response: bytes) -> ThreadingHTTPServer:
+    """Starts a local HTTP server (on a background thread) that answers every request with `response`,
+    standing in for the Overpass API"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def build_from_overpass(
+    overpass_url: str, streaming: bool
+) -> tuple[float, int | None, int | None]:
+    """Downloads a graph from `overpass_url` and builds it, returning how long that took,
+    and the peak RSS of this process before and after"""
+    startup_rss = max_rss_bytes()
+    engine = RoutingEngine(overpass_url)
+    bbox = BoundingBox(*ORIGIN, *ORIGIN)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        start = perf_counter()
+        if streaming:
+            engine.stream_graph(bbox)
+        else:
+            engine.compute_graph(*engine.download_osm_data(bbox))
+        seconds = perf_counter() - start
+    return seconds, startup_rss, max_rss_bytes()
+
+
+def benchmark_streaming(size: int, seed: int, repeat: int) -> dict:
+    """Times downloading and building a synthetic graph over HTTP with `compute_graph_streaming()` (via
+    `stream_graph()`) and with `compute_graph()`, and measures the peak RSS of each
+
+    - Peak RSS only ever goes up, so every run happens in a fresh process. `startup_rss_bytes` is its peak RSS
+      before it starts building, which is mostly the modules it imported.
+    - Where possible, processes are forked from a small fork server, because on Linux a process started with
+      `spawn` inherits the peak RSS of this (much bigger) process
+    """
+    context = get_context(
+        "forkserver" if "forkserver" in get_all_start_methods() else "spawn"
+    )
+    response = json.dumps(synthetic_overpass_json(size, seed)).encode()
+    server = serve_overpass_response(response)
+    overpass_url = f"http://127.0.0.1:{server.server_address[1]}/api/interpreter"
+    benchmarks = {}
+    memory = {}
+    try:
+        for name, streaming in [
+            ("compute_graph", False),
+            ("compute_graph_streaming", True),
+        ]:
+            runs = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(1, mp_context=context) as executor:
+                    runs.append(
+                        executor.submit(
+                            build_from_overpass, overpass_url, streaming
+                        ).result()
+                    )
+            benchmarks[name] = summarise([seconds for seconds, _, _ in runs])
+            _, startup_rss, max_rss = max(runs, key=lambda run: run[2] or 0)
+            memory[name] = {
+                "startup_rss_bytes": startup_rss,
+                "max_rss_bytes": max_rss,
+            }
+    finally:
+        server.shutdown()
+        server.server_close()
+    return {
+        "size": size,
+        "response_bytes": len(response),
+        "benchmarks": benchmarks,
+        "memory": memory,
+    }
+
+
+def random_options(random: Random) -> dict:
+    """Returns routing options with a random value for each option in `BENCHMARK_OPTIONS`"""
+    return {
+        key: (
+            random.choice([True, False])
+            if isinstance(value, bool)
+            else random.choice([-1, 0, 1])
+        )
+        for key, value in BENCHMARK_OPTIONS.items()
+    }
+
+
+def benchmark_profile(corpus_size: int, seed: int, repeat: int) -> dict:
+    """Times compiling the default profile, and weighing random tag sets with it
+
+    - `tests/test_routing_profile.py` checks that these weights match the original hand-written weighting
+    """
+    way_tags, node_tags = synthetic_tag_corpus(corpus_size, seed)
+    routing_options = RoutingOptions(BENCHMARK_OPTIONS)
+    profile = CompiledProfile(DEFAULT_PROFILE, routing_options)
+    results = {
+        "compile_profile": summarise(
+            time_each(
+                lambda _: CompiledProfile(DEFAULT_PROFILE, routing_options),
+                [None] * repeat * 10,
+            )
+        ),
+        "way_weights": summarise(
+            time_each(
+                lambda _: [profile.way_weight(tags) for tags in way_tags],
+                [None] * repeat,
+            )
+        ),
+        "node_weights": summarise(
+            time_each(
+                lambda _: [profile.node_weight(tags) for tags in node_tags],
+                [None] * repeat,
+            )
+        ),
+    }
+    return {"corpus_size": corpus_size, "benchmarks": results}
+
+
+def benchmark_bulk_weights(edge_count: int, seed: int, repeat: int) -> dict:
+    """Times weighing every edge of a very large graph at once with `TagColumns`, against weighing them one at a time
+
+    - The edges are given random tag sets from a synthetic corpus, which is much quicker than building a graph that big
+    - Also checks that both ways give exactly the same weights
+    """
+    way_tags, _ = synthetic_tag_corpus(2_000, seed)
+    tag_sets = TagSetInterner()
+    for tags in way_tags:
+        tag_sets.intern(tags)
+    edge_tags_keys = numpy.random.default_rng(seed).integers(
+        len(tag_sets), size=edge_count, dtype=numpy.int32
+    )
+    random = Random(seed)
+    profiles = [
+        CompiledProfile(DEFAULT_PROFILE, RoutingOptions(options))
+        for options in [BENCHMARK_OPTIONS]
+        + [random_options(random) for _ in range(repeat - 1)]
+    ]
+
+    def build_columns() -> TagColumns:
+        return TagColumns.from_tag_sets(
+            tag_sets.tag_sets, edge_tags_keys, DEFAULT_WAY_TAG_KEYS
+        )
+
+    def one_at_a_time(profile: CompiledProfile) -> list[float]:
+        # Like `RouteCalculator.way_weight_for_tag_set()`, with a weight cache per tag set
+        weights_by_tag_set: dict[int, float] = {}
+        weights = []
+        for tags_key in edge_tags_keys.tolist():
+            weight = weights_by_tag_set.get(tags_key)
+            if weight is None:
+                weight = profile.way_weight(tag_sets.tag_sets[tags_key])
+                weights_by_tag_set[tags_key] = weight
+            weights.append(weight)
+        return weights
+
+    columns = build_columns()
+    results = {
+        "build_tag_columns": summarise(
+            time_each(lambda _: build_columns(), [None] * repeat)
+        ),
+        "find_combinations": summarise(
+            time_each(
+                lambda _: TagColumns(
+                    columns.keys, columns.categories, columns.codes
+                ).combinations(),
+                [None] * repeat,
+            )
+        ),
+    }
+    columns.combinations()
+    results["bulk_way_weights"] = summarise(
+        time_each(lambda profile: columns.evaluate(profile.way_weight), profiles)
+    )
+    results["way_weights_per_edge"] = summarise(time_each(one_at_a_time, profiles))
+    mismatch_count = sum(
+        int(
+            numpy.count_nonzero(
+                columns.evaluate(profile.way_weight)
+                != numpy.array(one_at_a_time(profile))
+            )
+        )
+        for profile in profiles
+    )
+    return {
+        "edges": edge_count,
+        "tag_sets": len(tag_sets),
+        "combinations": len(columns.combinations()[0]),
+        "mismatch_count": mismatch_count,
+        "benchmarks": results,
+    }
+
+
+def compare_benchmarks(old_benchmarks: dict, new_benchmarks: dict):
+    for name, stats in new_benchmarks.items():
+        old_stats = old_benchmarks.get(name)
+        if old_stats is None:
+            continue
+        ratio = stats["median"] / old_stats["median"]
+        print(
+            f"  {name:<30} {old_stats['median'] * 1000:10.3f} ms -> {stats['median'] * 1000:10.3f} ms"
+            f"  ({ratio:.2f}x)"
+        )
+
+
+def compare_memory(old_memory: dict, new_memory: dict):
+    for name, stats in new_memory.items():
+        old_stats = old_memory.get(name)
+        if old_stats is None:
+            continue
+        ratio = stats["bytes_per_node"] / old_stats["bytes_per_node"]
+        print(
+            f"  {name:<30} {old_stats['bytes_per_node']:10.1f} B/node -> {stats['bytes_per_node']:10.1f} B/node"
+            f"  ({ratio:.2f}x)"
+        )
+
+
+def compare(old_results: dict, new_results: dict):
+    """Prints how the median time of each benchmark (or the memory use) changed between two runs"""
+    for mode in ["streaming", "workers"]:
+        if mode not in new_results:
+            continue
+        old_sizes = {result["size"]: result for result in old_results.get(mode, [])}
+        for result in new_results[mode]:
+            old_result = old_sizes.get(result["size"])
+            if old_result is None:
+                continue
+            print(f"Size {result['size']}:")
+            compare_benchmarks(old_result["benchmarks"], result["benchmarks"])
+        return
+    if "memory" in new_results:
+        old_sizes = {result["size"]: result for result in old_results.get("memory", [])}
+        for result in new_results["memory"]:
+            old_result = old_sizes.get(result["size"])
+            if old_result is None:
+                continue
+            print(f"Size {result['size']}:")
+            compare_memory(old_result["memory"], result["memory"])
+        return
+    old_sizes = {result["size"]: result for result in old_results.get("results", [])}
+    for result in new_results["results"]:
+        old_result = old_sizes.get(result["size"])
+        if old_result is None:
+            continue
+        print(f"Size {result['size']}:")
+        compare_benchmarks(old_result["benchmarks"], result["benchmarks"])
+    if old_results.get("profile") and new_results.get("profile"):
+        print("Profile:")
+        compare_benchmarks(
+            old_results["profile"]["benchmarks"], new_results["profile"]["benchmarks"]
+        )
+    if old_results.get("bulk") and new_results.get("bulk"):
+        print("Bulk weights:")
+        compare_benchmarks(
+            old_results["bulk"]["benchmarks"], new_results["bulk"]["benchmarks"]
+        )
+
+
+def print_benchmarks(benchmarks: dict):
+    for name, stats in benchmarks.items():
+        print(
+            f"  {name:<30} median {stats['median'] * 1000:10.3f} ms"
+            f"  (min {stats['min'] * 1000:.3f} ms, {stats['runs']} runs)"
+        )
+
+
+def print_memory(memory: dict):
+    for name, stats in memory.items():
+        per_way = (
+            f", {stats['bytes_per_way']:.1f} B/way" if "bytes_per_way" in stats else ""
+        )
+        max_rss = stats["max_rss_bytes"]
+        print(
+            f"  {name:<30} retained {stats['retained_bytes'] / 2**20:8.2f} MiB"
+            f"  ({stats['bytes_per_node']:.1f} B/node{per_way}),"
+            f" peak {stats['peak_bytes'] / 2**20:8.2f} MiB"
+            + (f", max RSS {max_rss / 2**20:.1f} MiB" if max_rss is not None else "")
+        )
+
+
+def print_streaming(result: dict):
+    print(f"  {result['response_bytes'] / 2**20:.1f} MiB response")
+    print_benchmarks(result["benchmarks"])
+    for name, stats in result["memory"].items():
+        if stats["max_rss_bytes"] is None:
+            continue
+        print(
+            f"  {name:<30} max RSS {stats['max_rss_bytes'] / 2**20:8.1f} MiB"
+            f"  ({stats['startup_rss_bytes'] / 2**20:.1f} MiB before building)"
+        )
+
+
+def print_workers(result: dict):
+    print(f"  {result['routes']} routes")
+    print_benchmarks(result["benchmarks"])
+    for name, routes_per_second in result["routes_per_second"].items():
+        print(f"  {name:<30} {routes_per_second:10.1f} routes/s")
+
+
+def main():
+    parser = ArgumentParser(
+        description="Times graph building, nearest node lookups and routing on synthetic street grids"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="*",
+        default=DEFAULT_SIZES,
+        help="numbers of streets in each direction",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="how many times to build each graph"
+    )
+    parser.add_argument(
+        "--queries",
+        type=int,
+        default=20,
+        help="how many nearest node lookups and routes to time for each size",
+    )
+    parser.add_argument(
+        "--corpus",
+        type=int,
+        default=DEFAULT_CORPUS_SIZE,
+        help="how many random tag sets to weigh with the default profile (0 to skip)",
+    )
+    parser.add_argument(
+        "--edges",
+        type=int,
+        default=DEFAULT_BULK_EDGES,
+        help="how many edges to weigh all at once with tag columns (0 to skip)",
+    )
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="measure the memory used by the OSM elements and graphs of each size, instead of timing anything",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="time downloading and building the graphs of each size from a local HTTP server, with and without "
+        "streaming, and measure their peak RSS, instead of the usual benchmarks",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="time routing on the compact graph of each size in this process, and in pools of 1, 2, 4, ... up to "
+        "this many worker processes, instead of the usual benchmarks",
+    )
+    parser.add_argument("--output", help="file to save the results to, as JSON")
+    parser.add_argument(
+        "--compare", help="results file from an earlier run to compare against"
+    )
+    args = parser.parse_args()
+
+    if args.memory:
+        memory_results = []
+        for size in args.sizes:
+            print(f"Measuring memory for size {size}")
+            result = benchmark_memory(size, args.seed)
+            memory_results.append(result)
+            print(
+                f"  {result['nodes']} nodes and {result['ways']} ways, "
+                f"{result['graph_nodes']} nodes in the graph"
+            )
+            print_memory(result["memory"])
+        save_and_compare(
+            args,
+            {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "seed": args.seed,
+                "memory": memory_results,
+            },
+        )
+        return
+
+    if args.streaming:
+        streaming_results = []
+        for size in args.sizes:
+            print(f"Benchmarking streaming for size {size}")
+            result = benchmark_streaming(size, args.seed, args.repeat)
+            streaming_results.append(result)
+            print_streaming(result)
+        save_and_compare(
+            args,
+            {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "seed": args.seed,
+                "repeat": args.repeat,
+                "streaming": streaming_results,
+            },
+        )
+        return
+
+    if args.workers:
+        worker_results = []
+        for size in args.sizes:
+            print(f"Benchmarking up to {args.workers} workers for size {size}")
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                result = benchmark_workers(
+                    size, args.seed, args.repeat, args.queries, args.workers
+                )
+            worker_results.append(result)
+            print_workers(result)
+        save_and_compare(
+            args,
+            {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "seed": args.seed,
+                "repeat": args.repeat,
+                "queries": args.queries,
+                "workers": worker_results,
+            },
+        )
+        return
+
+    profile_result = None
+    if args.corpus:
+        print(f"Benchmarking the default profile with {args.corpus} tag sets")
+        profile_result = benchmark_profile(args.corpus, args.seed, args.repeat)
+        print_benchmarks(profile_result["benchmarks"])
+    bulk_result = None
+    if args.edges:
+        print(f"Benchmarking weighing {args.edges} edges at once")
+        bulk_result = benchmark_bulk_weights(args.edges, args.seed, args.repeat)
+        print(
+            f"  {bulk_result['combinations']} distinct combinations of tags, "
+            f"{bulk_result['mismatch_count']} weights differ from weighing one at a time"
+        )
+        print_benchmarks(bulk_result["benchmarks"])
+    results = []
+    for size in args.sizes:
+        print(f"Benchmarking size {size}")
+        # Messages about duplicate edges aren't what we're measuring
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            result = benchmark_size(size, args.seed, args.repeat, args.queries)
+        results.append(result)
+        print(f"  {result['graph_nodes']} nodes in the graph")
+        print_benchmarks(result["benchmarks"])
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "queries": args.queries,
+        "results": results,
+        "profile": profile_result,
+        "bulk": bulk_result,
+    }
+    save_and_compare(args, run)
+
+
+def save_and_compare(args: Namespace, run: dict):
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(run, file, indent=2)
+        print(f"Saved results to {args.output}")
+    if args.compare:
+        with open(args.compare) as file:
+            compare(json.load(file), run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,601 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import heappop, heappush
+from itertools import count
+from pathlib import Path
+from sys import intern
+from typing import Any, Callable, Hashable, Iterable, Iterator, Mapping, Sequence
+from networkx import NetworkXNoPath
+from contraction_hierarchy import ContractionHierarchy
+from graph_snapshot import read_snapshot, write_snapshot
+from landmarks import Landmarks
+from osm_data_types import Coordinates, OSMWayData, TagSetInterner
+from spatial_index import SpatialIndex, nearest_by_scan
+from tag_columns import TagColumns
+from tag_validation import TagValidationReport
+from weight_cache import EdgeWeightCache
+
+
+class CompactRoutingGraph:
+    """A read-only routing graph stored in flat arrays, as an alternative to the NetworkX-based `RoutingGraph`
+
+    - Nodes are numbered from 0 (in order of OSM ID), and edges are numbered in the order they were added
+    - Adjacency is stored in compressed sparse row (CSR) format: the half-edges leaving node `i` are
+      `offsets[i]` to `offsets[i + 1]`, and each has a target node and an (undirected) edge number
+    - Per-edge data (length, way ID, tag set) lives in one array per attribute, instead of one dict per edge
+    - Provides the same methods as `RoutingGraph`, so `RouteCalculator` works with either
+    """
+
+    def __init__(
+        self,
+        node_ids: Sequence[int],
+        lats: array | memoryview,
+        lons: array | memoryview,
+        offsets: Sequence[int],
+        targets: Sequence[int],
+        half_edge_edges: Sequence[int],
+        edge_lengths: Sequence[float],
+        edge_way_ids: Sequence[int],
+        edge_tags_keys: Sequence[int],
+        tag_sets: TagSetInterner,
+        node_tags: Mapping[int, dict],
+    ):
+        self.node_ids = node_ids
+        self.lats = lats
+        self.lons = lons
+        self.offsets = offsets
+        self.targets = targets
+        self.half_edge_edges = half_edge_edges
+        self.edge_lengths = edge_lengths
+        self.edge_way_ids = edge_way_ids
+        self.edge_tags_keys = edge_tags_keys
+        self.tag_sets = tag_sets
+        # Maps node indexes to tags, only for nodes that have tags
+        self.node_tags = node_tags
+        self.spatial_index: SpatialIndex | None = None
+        self.weight_cache = EdgeWeightCache()
+        # Preprocessed contraction hierarchies, keyed by routing options fingerprint
+        self.contraction_hierarchies: dict[Hashable, ContractionHierarchy] = {}
+        # Landmark distance tables for the ALT heuristic, keyed by routing options fingerprint
+        self.landmarks: dict[Hashable, Landmarks] = {}
+        # Built the first time that edges are looked up by way ID, see `build_way_index()`
+        self.edge_ends: tuple[array, array] | None = None
+        self.edges_by_way: array | None = None
+        self.sorted_way_ids: array | None = None
+        # Problems with tag values, from `validate_tags()` (which isn't run when loading snapshots, to keep that quick)
+        self.tag_report: TagValidationReport | None = None
+        # The routing-relevant tags of every edge as categorical columns, from `build_tag_columns()`
+        self.tag_columns: TagColumns | None = None
+        # Counts of things that happened while building the graph, e.g. duplicate edges that were replaced
+        self.build_stats: dict[str, int] = {}
+
+    @classmethod
+    def from_edges(
+        cls,
+        edges: Iterable[tuple[int, int, int, int, float]],
+        positions: dict[int, Coordinates],
+        node_tags: dict[int, dict],
+        tag_sets: TagSetInterner,
+        tag_report: TagValidationReport | None = None,
+    ) -> "CompactRoutingGraph":
+        """Builds a graph from (node A ID, node B ID, way ID, tags key, length) tuples.
+
+        - `positions` and `node_tags` are keyed by OSM node ID
+        - If there's more than one edge between the same two nodes, the last one wins (like in NetworkX),
+          and the number of edges that were replaced is stored in `build_stats["duplicate_edges"]`
+        - The tags are checked with `validate_tags()`, unless a `tag_report` for them is provided
+        """
+        # Maps each (smaller node ID, larger node ID) pair to its edge index
+        edge_indexes: dict[tuple[int, int], int] = {}
+        edge_ends: list[tuple[int, int]] = []
+        edge_data: list[tuple[int, int, float]] = []
+        duplicate_edges = 0
+        for node_a, node_b, way_id, tags_key, length in edges:
+            pair = (node_a, node_b) if node_a < node_b else (node_b, node_a)
+            edge_index = edge_indexes.get(pair)
+            if edge_index is not None:
+                duplicate_edges += 1
+                edge_data[edge_index] = (way_id, tags_key, length)
+                continue
+            edge_indexes[pair] = len(edge_ends)
+            edge_ends.append((node_a, node_b))
+            edge_data.append((way_id, tags_key, length))
+
+        node_ids = array(
+            "q", sorted({node_id for pair in edge_indexes for node_id in pair})
+        )
+        node_indexes = {node_id: index for index, node_id in enumerate(node_ids)}
+        # Half-edges leaving each node, in the order the edges were added
+        adjacency: list[list[tuple[int, int]]] = [[] for _ in node_ids]
+        for edge_index, (node_a, node_b) in enumerate(edge_ends):
+            index_a = node_indexes[node_a]
+            index_b = node_indexes[node_b]
+            adjacency[index_a].append((index_b, edge_index))
+            adjacency[index_b].append((index_a, edge_index))
+        offsets = array("i", [0])
+        targets = array("i")
+        half_edge_edges = array("i")
+        for half_edges in adjacency:
+            for target, edge_index in half_edges:
+                targets.append(target)
+                half_edge_edges.append(edge_index)
+            offsets.append(len(targets))
+
+        graph = cls(
+            node_ids=node_ids,
+            lats=array("d", (positions[node_id][0] for node_id in node_ids)),
+            lons=array("d", (positions[node_id][1] for node_id in node_ids)),
+            offsets=offsets,
+            targets=targets,
+            half_edge_edges=half_edge_edges,
+            edge_lengths=array("d", (length for _, _, length in edge_data)),
+            edge_way_ids=array("q", (way_id for way_id, _, _ in edge_data)),
+            edge_tags_keys=array("i", (tags_key for _, tags_key, _ in edge_data)),
+            tag_sets=tag_sets,
+            node_tags={
+                node_indexes[node_id]: tags
+                for node_id, tags in node_tags.items()
+                if node_id in node_indexes
+            },
+        )
+        graph.build_stats["duplicate_edges"] = duplicate_edges
+        if tag_report is None:
+            graph.validate_tags()
+        else:
+            graph.tag_report = tag_report
+        return graph
+
+    def save_snapshot(self, path: str | Path):
+        """Saves the graph to a binary snapshot file, which can be loaded very quickly with `load_snapshot()`"""
+        write_snapshot(path, *self.snapshot_columns())
+
+    def snapshot_columns(self) -> tuple[dict[str, array], dict]:
+        """Returns the columns and metadata that make up a snapshot of the graph (see `graph_snapshot`)
+
+        - Tags are stored as a table of distinct strings, plus tag sets made of (key, value) string indexes
+        - Node tags are stored as sorted (node index, tag set) pairs
+        """
+        # Node tag sets go after the way tag sets, so that the way tag sets keep their keys
+        all_tag_sets = list(self.tag_sets.tag_sets)
+        node_tag_set_keys: dict[frozenset, int] = {}
+        tagged_nodes = sorted(self.node_tags.items())
+        node_tag_sets = array("i")
+        for _, tags in tagged_nodes:
+            frozen_tags = frozenset(tags.items())
+            key = node_tag_set_keys.get(frozen_tags)
+            if key is None:
+                key = len(all_tag_sets)
+                node_tag_set_keys[frozen_tags] = key
+                all_tag_sets.append(tags)
+            node_tag_sets.append(key)
+
+        string_indexes: dict[str, int] = {}
+        tag_set_offsets = array("i", [0])
+        tag_pairs = array("i")
+        for tags in all_tag_sets:
+            for key, value in tags.items():
+                tag_pairs.append(string_indexes.setdefault(key, len(string_indexes)))
+                tag_pairs.append(string_indexes.setdefault(value, len(string_indexes)))
+            tag_set_offsets.append(len(tag_pairs) // 2)
+        strings = array("B")
+        string_offsets = array("q", [0])
+        for string in string_indexes:
+            strings.frombytes(string.encode())
+            string_offsets.append(len(strings))
+
+        def column(typecode: str, values: Sequence) -> array:
+            return values if isinstance(values, array) else array(typecode, values)
+
+        return (
+            {
+                "node_ids": column("q", self.node_ids),
+                "lats": column("d", self.lats),
+                "lons": column("d", self.lons),
+                "offsets": column("i", self.offsets),
+                "targets": column("i", self.targets),
+                "half_edge_edges": column("i", self.half_edge_edges),
+                "edge_lengths": column("d", self.edge_lengths),
+                "edge_way_ids": column("q", self.edge_way_ids),
+                "edge_tags_keys": column("i", self.edge_tags_keys),
+                "strings": strings,
+                "string_offsets": string_offsets,
+                "tag_set_offsets": tag_set_offsets,
+                "tag_pairs": tag_pairs,
+                "tagged_nodes": array("i", (index for index, _ in tagged_nodes)),
+                "node_tag_sets": node_tag_sets,
+            },
+            {"node_count": self.node_count(), "edge_count": self.edge_count()},
+        )
+
+    @classmethod
+    def load_snapshot(cls, path: str | Path) -> "CompactRoutingGraph":
+        """Loads a graph saved with `save_snapshot()`.
+
+        - The node and edge arrays are used straight from the (memory-mapped) file, so this takes about the same time
+          however big the graph is. Only the tag tables are turned back into Python objects.
+        """
+        columns, _ = read_snapshot(path)
+        return cls.from_snapshot_columns(columns)
+
+    @classmethod
+    def from_snapshot_columns(
+        cls, columns: dict[str, memoryview]
+    ) -> "CompactRoutingGraph":
+        """Builds a graph that uses the columns of a snapshot in place, e.g. from `read_snapshot_from()`"""
+        strings = bytes(columns["strings"])
+        string_offsets = columns["string_offsets"]
+        string_table = [
+            intern(strings[string_offsets[i] : string_offsets[i + 1]].decode())
+            for i in range(len(string_offsets) - 1)
+        ]
+        tag_set_offsets = columns["tag_set_offsets"]
+        tag_pairs = columns["tag_pairs"]
+        tag_sets = TagSetInterner.from_tag_sets(
+            [
+                {
+                    string_table[tag_pairs[2 * pair]]: string_table[
+                        tag_pairs[2 * pair + 1]
+                    ]
+                    for pair in range(tag_set_offsets[i], tag_set_offsets[i + 1])
+                }
+                for i in range(len(tag_set_offsets) - 1)
+            ]
+        )
+        return cls(
+            node_ids=columns["node_ids"],
+            lats=columns["lats"],
+            lons=columns["lons"],
+            offsets=columns["offsets"],
+            targets=columns["targets"],
+            half_edge_edges=columns["half_edge_edges"],
+            edge_lengths=columns["edge_lengths"],
+            edge_way_ids=columns["edge_way_ids"],
+            edge_tags_keys=columns["edge_tags_keys"],
+            tag_sets=tag_sets,
+            node_tags=SortedNodeTags(
+                columns["tagged_nodes"], columns["node_tag_sets"], tag_sets.tag_sets
+            ),
+        )
+
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    def edge_count(self) -> int:
+        return len(self.edge_lengths)
+
+    def nodes(self) -> Iterable[int]:
+        return iter(self.node_ids)
+
+    def index_of(self, node_id: int) -> int:
+        """Returns the index of a node in the graph's arrays, given its OSM ID"""
+        index = bisect_left(self.node_ids, node_id)
+        if index == len(self.node_ids) or self.node_ids[index] != node_id:
+            raise KeyError(node_id)
+        return index
+
+    def edge_data(self, edge_index: int) -> OSMWayData:
+        """Returns the data of an edge, in the same format as a `RoutingGraph` edge"""
+        tags_key = self.edge_tags_keys[edge_index]
+        return {
+            "id": self.edge_way_ids[edge_index],
+            "tags": self.tag_sets.tag_sets[tags_key],
+            "tags_key": tags_key,
+            "length": self.edge_lengths[edge_index],
+        }
+
+    def build_spatial_index(self):
+        """Indexes every node's position, so that nearest node lookups don't have to check every node"""
+        self.spatial_index = SpatialIndex()
+        for node_id, lat, lon in zip(self.node_ids, self.lats, self.lons):
+            self.spatial_index.insert(node_id, (lat, lon))
+
+    def build_tag_columns(self, keys: list[str]) -> TagColumns:
+        """Stores the values of the given tag keys as one column per key, in edge index order (see `TagColumns`)"""
+        self.tag_columns = TagColumns.from_tag_sets(
+            self.tag_sets.tag_sets, self.edge_tags_keys, keys
+        )
+        return self.tag_columns
+
+    def validate_tags(self) -> TagValidationReport:
+        """Checks the tags of every way and node, storing the problems in `tag_report`"""
+        tag_report = TagValidationReport()
+        checked_way_ids = set()
+        for way_id, tags_key in zip(self.edge_way_ids, self.edge_tags_keys):
+            if way_id not in checked_way_ids:
+                checked_way_ids.add(way_id)
+                tag_report.check_way(way_id, tags_key, self.tag_sets.tag_sets[tags_key])
+        for index, tags in self.node_tags.items():
+            tag_report.check_node(self.node_ids[index], tags)
+        self.tag_report = tag_report
+        return tag_report
+
+    def build_way_index(self):
+        """Finds the two ends of every edge, and sorts the edges by way ID, so that looking up a way's edges is quick"""
+        edge_ends = (
+            array("i", bytes(4 * self.edge_count())),
+            array("i", bytes(4 * self.edge_count())),
+        )
+        for node_from in range(self.node_count()):
+            for half_edge in range(
+                self.offsets[node_from], self.offsets[node_from + 1]
+            ):
+                node_to = self.targets[half_edge]
+                # Each edge appears twice, so only use the half-edge from the lower index
+                if node_from < node_to:
+                    edge_index = self.half_edge_edges[half_edge]
+                    edge_ends[0][edge_index] = node_from
+                    edge_ends[1][edge_index] = node_to
+        # Edges were added in order along each way, so sorting by (way ID, edge index) keeps that order
+        self.edges_by_way = array(
+            "i",
+            sorted(
+                range(self.edge_count()),
+                key=lambda edge_index: self.edge_way_ids[edge_index],
+            ),
+        )
+        self.sorted_way_ids = array(
+            "q", (self.edge_way_ids[edge_index] for edge_index in self.edges_by_way)
+        )
+        self.edge_ends = edge_ends
+
+    def get_edges_from_way(self, target_way_id: int) -> list[tuple[int, int]]:
+        """Returns the edges that make up a way, in order along the way (although each edge's ends may be swapped)"""
+        if self.edge_ends is None:
+            self.build_way_index()
+        assert self.edges_by_way is not None and self.sorted_way_ids is not None
+        nodes_a, nodes_b = self.edge_ends  # type: ignore
+        start = bisect_left(self.sorted_way_ids, target_way_id)
+        end = bisect_right(self.sorted_way_ids, target_way_id)
+        return [
+            (
+                self.node_ids[nodes_a[edge_index]],
+                self.node_ids[nodes_b[edge_index]],
+            )
+            for edge_index in self.edges_by_way[start:end]
+        ]
+
+    def get_ways_from_node(self, node_id: int) -> list[int]:
+        """Returns the IDs of the ways that a node is part of"""
+        index = self.index_of(node_id)
+        return list(
+            dict.fromkeys(
+                self.edge_way_ids[self.half_edge_edges[half_edge]]
+                for half_edge in range(self.offsets[index], self.offsets[index + 1])
+            )
+        )
+
+    def nearest_node(self, coordinates: Coordinates) -> int:
+        return self.k_nearest_nodes(coordinates, 1)[0]
+
+    def k_nearest_nodes(self, coordinates: Coordinates, k: int) -> list[int]:
+        """Returns the IDs of the `k` nodes closest to the provided coordinates, nearest first"""
+        if self.spatial_index is None:
+            # e.g. just after loading a snapshot: checking every node is much quicker than building an index
+            nearest = [
+                self.node_ids[index]
+                for index in nearest_by_scan(coordinates, k, self.lats, self.lons)
+            ]
+        else:
+            nearest = self.spatial_index.nearest(coordinates, k, self.node_position)
+        if not nearest:
+            raise ValueError("No nodes could be found")
+        return nearest
+
+    def get_edge_between_nodes(self, node_a: int, node_b: int) -> OSMWayData:
+        index_a = self.index_of(node_a)
+        index_b = self.index_of(node_b)
+        for half_edge in range(self.offsets[index_a], self.offsets[index_a + 1]):
+            if self.targets[half_edge] == index_b:
+                return self.edge_data(self.half_edge_edges[half_edge])
+        raise KeyError(f"The edge {node_a}-{node_b} is not in the graph")
+
+    def node(self, node_id: int) -> dict:
+        index = self.index_of(node_id)
+        node: dict[str, Any] = {"pos": (self.lats[index], self.lons[index])}
+        tags = self.node_tags.get(index)
+        if tags is not None:
+            node["tags"] = tags
+        return node
+
+    def node_position(self, node_id: int) -> Coordinates:
+        index = self.index_of(node_id)
+        return self.lats[index], self.lons[index]
+
+    def neighbours(self, node_id: int) -> Iterable[tuple[int, OSMWayData]]:
+        """Returns (neighbour node ID, edge data) pairs for every edge of a node"""
+        index = self.index_of(node_id)
+        for half_edge in range(self.offsets[index], self.offsets[index + 1]):
+            yield (
+                self.node_ids[self.targets[half_edge]],
+                self.edge_data(self.half_edge_edges[half_edge]),  # type: ignore
+            )
+
+    def weight_column(self, weight: Callable[[int, int, dict], float]) -> array:
+        """Calculates the weight of every half-edge up front, e.g. to pass to `astar_path()`"""
+        weights = array("d", bytes(8 * len(self.targets)))
+        for node_from in range(len(self.node_ids)):
+            node_from_id = self.node_ids[node_from]
+            for half_edge in range(
+                self.offsets[node_from], self.offsets[node_from + 1]
+            ):
+                weights[half_edge] = weight(
+                    node_from_id,
+                    self.node_ids[self.targets[half_edge]],
+                    self.edge_data(self.half_edge_edges[half_edge]),  # type: ignore
+                )
+        return weights
+
+    def astar_path(
+        self,
+        start: int,
+        end: int,
+        heuristic: Callable[[int, int], float],
+        weight: Callable[[int, int, dict], float] | Sequence[float],
+    ) -> list[int]:
+        """Returns the node IDs along the lowest-weight path between two nodes, using A* search.
+
+        - `weight` can either be a function (like NetworkX expects), or a column from `weight_column()`.
+          With a column, the search runs on node indexes (see `astar_index_path()`), which is much quicker.
+        - Raises `NetworkXNoPath` if the end node can't be reached, for consistency with `RoutingGraph`
+        """
+        node_ids = self.node_ids
+        if not callable(weight):
+            path = self.astar_index_path(
+                self.index_of(start),
+                self.index_of(end),
+                lambda index: heuristic(node_ids[index], end),
+                weight,
+            )
+            return [node_ids[index] for index in path]
+
+        offsets = self.offsets
+        targets = self.targets
+        half_edge_edges = self.half_edge_edges
+        start_index = self.index_of(start)
+        end_index = self.index_of(end)
+
+        # The counter breaks ties, so that we never have to compare node indexes
+        counter = count()
+        queue = [(0.0, next(counter), start_index, 0.0, -1)]
+        # Maps nodes we have seen to the (cost, heuristic) that they were queued with
+        queued: dict[int, tuple[float, float]] = {}
+        # Maps explored nodes to their parent on the lowest-weight path
+        explored: dict[int, int] = {}
+        while queue:
+            _, _, node, distance, parent = heappop(queue)
+            if node == end_index:
+                path = [node_ids[node]]
+                while parent != -1:
+                    path.append(node_ids[parent])
+                    parent = explored[parent]
+                path.reverse()
+                return path
+            if node in explored:
+                continue
+            explored[node] = parent
+            node_id = node_ids[node]
+            for half_edge in range(offsets[node], offsets[node + 1]):
+                neighbour = targets[half_edge]
+                if neighbour in explored:
+                    continue
+                cost = weight(
+                    node_id,
+                    node_ids[neighbour],
+                    self.edge_data(half_edge_edges[half_edge]),  # type: ignore
+                )
+                new_distance = distance + cost
+                if neighbour in queued:
+                    queued_distance, h = queued[neighbour]
+                    if queued_distance <= new_distance:
+                        continue
+                else:
+                    h = heuristic(node_ids[neighbour], end)
+                queued[neighbour] = new_distance, h
+                heappush(
+                    queue,
+                    (new_distance + h, next(counter), neighbour, new_distance, node),
+                )
+        raise NetworkXNoPath(f"Node {end} not reachable from {start}")
+
+    def astar_index_path(
+        self,
+        start_index: int,
+        end_index: int,
+        heuristic: Callable[[int], float],
+        weights: Sequence[float],
+        stats: dict[str, int] | None = None,
+    ) -> list[int]:
+        """Returns the node indexes along the lowest-weight path between two nodes, using A* search on node indexes.
+
+        - `heuristic(node_index)` estimates the weight from a node to the end node
+        - `weights` has the weight of every half-edge, e.g. from `RouteCalculator.weight_column()`,
+          so no edge data or OSM IDs are looked at during the search
+        - If `stats` is provided, the numbers of nodes settled and edges relaxed are added to it
+        - Raises `NetworkXNoPath` if the end node can't be reached
+        """
+        offsets = self.offsets
+        targets = self.targets
+
+        # The counter breaks ties, so that we never have to compare node indexes
+        counter = count()
+        queue = [(0.0, next(counter), start_index, 0.0, -1)]
+        # Maps nodes we have seen to the (cost, heuristic) that they were queued with
+        queued: dict[int, tuple[float, float]] = {}
+        # Maps explored nodes to their parent on the lowest-weight path
+        explored: dict[int, int] = {}
+        relaxed = 0
+        try:
+            while queue:
+                _, _, node, distance, parent = heappop(queue)
+                if node == end_index:
+                    path = [node]
+                    while parent != -1:
+                        path.append(parent)
+                        parent = explored[parent]
+                    path.reverse()
+                    return path
+                if node in explored:
+                    continue
+                explored[node] = parent
+                for half_edge in range(offsets[node], offsets[node + 1]):
+                    neighbour = targets[half_edge]
+                    if neighbour in explored:
+                        continue
+                    relaxed += 1
+                    new_distance = distance + weights[half_edge]
+                    if neighbour in queued:
+                        queued_distance, h = queued[neighbour]
+                        if queued_distance <= new_distance:
+                            continue
+                    else:
+                        h = heuristic(neighbour)
+                    queued[neighbour] = new_distance, h
+                    heappush(
+                        queue,
+                        (
+                            new_distance + h,
+                            next(counter),
+                            neighbour,
+                            new_distance,
+                            node,
+                        ),
+                    )
+        finally:
+            if stats is not None:
+                stats["settled_forward"] = len(explored)
+                stats["edges_relaxed"] = relaxed
+        raise NetworkXNoPath(
+            f"Node {self.node_ids[end_index]} not reachable from {self.node_ids[start_index]}"
+        )
+
+
+class SortedNodeTags(Mapping[int, dict]):
+    """Maps node indexes to tags, backed by a sorted array of node indexes and a parallel array of tag set keys
+
+    - Used for graphs loaded from snapshots, so that we don't need a dict entry for every tagged node
+    """
+
+    def __init__(
+        self,
+        node_indexes: Sequence[int],
+        tag_set_keys: Sequence[int],
+        tag_sets: list[dict],
+    ):
+        self.node_indexes = node_indexes
+        self.tag_set_keys = tag_set_keys
+        self.tag_sets = tag_sets
+
+    def __getitem__(self, node_index: int) -> dict:
+        position = bisect_left(self.node_indexes, node_index)
+        if (
+            position == len(self.node_indexes)
+            or self.node_indexes[position] != node_index
+        ):
+            raise KeyError(node_index)
+        return self.tag_sets[self.tag_set_keys[position]]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.node_indexes)
+
+    def __len__(self) -> int:
+        return len(self.node_indexes)
@@ -0,0 +1,264 @@
+from heapq import heapify, heappop, heappush
+from itertools import count
+from math import inf
+from typing import Callable, Hashable, Iterable, Protocol
+import pickle
+from networkx import NetworkXNoPath
+from osm_data_types import OSMWayData
+
+
+class ContractibleGraph(Protocol):
+    def nodes(self) -> Iterable[int]: ...
+    def neighbours(self, node_id: int) -> Iterable[tuple[int, OSMWayData]]: ...
+
+
+class ContractionHierarchy:
+    """A preprocessed version of a routing graph for one routing profile, which answers route queries very quickly
+
+    - Built by "contracting" nodes one at a time (least important first): each contracted node is removed,
+      and shortcut edges are added between its neighbours wherever the node was on the only shortest path
+    - A query only ever follows edges towards more important nodes, from both ends, so it settles very few nodes
+    - Shortcuts remember the node they skip over, so paths are unpacked back into the original nodes
+    - Edges with infinite weight are treated as impassable
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(
+        self,
+        fingerprint: Hashable,
+        ranks: dict[int, int],
+        upward: dict[int, list[tuple[int, float]]],
+        downward: dict[int, list[tuple[int, float]]],
+        shortcut_middles: dict[tuple[int, int], int],
+    ):
+        # The fingerprint of the routing options that the hierarchy was built for
+        self.fingerprint = fingerprint
+        # Maps node IDs to their position in the contraction order
+        self.ranks = ranks
+        # Edges from each node to more important nodes, as (target, weight)
+        self.upward = upward
+        # Edges *into* each node from more important nodes, as (source, weight)
+        self.downward = downward
+        # Maps (node A, node B) shortcut edges to the node that they skip over
+        self.shortcut_middles = shortcut_middles
+
+    @classmethod
+    def build(
+        cls,
+        graph: ContractibleGraph,
+        weight: Callable[[int, int, OSMWayData], float],
+        fingerprint: Hashable,
+        witness_search_limit: int = 50,
+    ) -> "ContractionHierarchy":
+        """Contracts every node of a graph, using `weight(node_from, node_to, data)` for the edge weights.
+
+        - `witness_search_limit` is the most nodes we settle when checking if a shortcut is needed.
+          Smaller values make building faster, but may add unnecessary shortcuts (which never cause wrong routes).
+        """
+        # Edges between nodes that haven't been contracted yet, in both directions
+        outgoing: dict[int, dict[int, float]] = {}
+        incoming: dict[int, dict[int, float]] = {}
+        for node in graph.nodes():
+            outgoing.setdefault(node, {})
+            incoming.setdefault(node, {})
+            for neighbour, data in graph.neighbours(node):
+                edge_weight = weight(node, neighbour, data)
+                if edge_weight == inf:
+                    continue
+                outgoing[node][neighbour] = edge_weight
+                incoming.setdefault(neighbour, {})[node] = edge_weight
+                outgoing.setdefault(neighbour, {})
+
+        original_edges: dict[tuple[int, int], float] = {
+            (node, neighbour): edge_weight
+            for node, neighbours in outgoing.items()
+            for neighbour, edge_weight in neighbours.items()
+        }
+        # Maps (node_from, node_to) to the (weight, skipped node) of the best shortcut between them
+        shortcuts: dict[tuple[int, int], tuple[float, int]] = {}
+        contracted_neighbours = dict.fromkeys(outgoing, 0)
+
+        def witness_distance(source: int, target: int, skip: int, limit: float):
+            """Returns the weight of the best path from source to target that avoids `skip` (or inf if it's over `limit`)"""
+            distances = {source: 0.0}
+            queue = [(0.0, source)]
+            settled = 0
+            while queue and settled < witness_search_limit:
+                distance, node = heappop(queue)
+                if distance > distances[node]:
+                    continue
+                if node == target or distance > limit:
+                    break
+                settled += 1
+                for neighbour, edge_weight in outgoing[node].items():
+                    if neighbour == skip:
+                        continue
+                    new_distance = distance + edge_weight
+                    if new_distance < distances.get(neighbour, inf):
+                        distances[neighbour] = new_distance
+                        heappush(queue, (new_distance, neighbour))
+            return distances.get(target, inf)
+
+        def needed_shortcuts(node: int) -> list[tuple[int, int, float]]:
+            shortcuts = []
+            for source, weight_in in incoming[node].items():
+                for target, weight_out in outgoing[node].items():
+                    if source == target:
+                        continue
+                    via_node = weight_in + weight_out
+                    if witness_distance(source, target, node, via_node) > via_node:
+                        shortcuts.append((source, target, via_node))
+            return shortcuts
+
+        def priority(node: int) -> int:
+            # The "edge difference", plus a term that spreads contraction evenly over the graph
+            edges_removed = len(incoming[node]) + len(outgoing[node])
+            return (
+                len(needed_shortcuts(node))
+                - edges_removed
+                + contracted_neighbours[node]
+            )
+
+        counter = count()
+        queue = [(priority(node), next(counter), node) for node in outgoing]
+        heapify(queue)
+        ranks: dict[int, int] = {}
+        while queue:
+            _, _, node = heappop(queue)
+            # Priorities go out of date as neighbours are contracted, so check it again lazily
+            current_priority = priority(node)
+            if queue and current_priority > queue[0][0]:
+                heappush(queue, (current_priority, next(counter), node))
+                continue
+            ranks[node] = len(ranks)
+            for source, target, shortcut_weight in needed_shortcuts(node):
+                if shortcut_weight < outgoing[source].get(target, inf):
+                    outgoing[source][target] = shortcut_weight
+                    incoming[target][source] = shortcut_weight
+                    shortcuts[(source, target)] = (shortcut_weight, node)
+            for neighbour in set(incoming[node]) | set(outgoing[node]):
+                outgoing[neighbour].pop(node, None)
+                incoming[neighbour].pop(node, None)
+                contracted_neighbours[neighbour] += 1
+            del outgoing[node]
+            del incoming[node]
+
+        # Only keep the best edge between each pair of nodes
+        best_edges = dict(original_edges)
+        shortcut_middles: dict[tuple[int, int], int] = {}
+        for edge, (shortcut_weight, middle) in shortcuts.items():
+            if shortcut_weight < best_edges.get(edge, inf):
+                best_edges[edge] = shortcut_weight
+                shortcut_middles[edge] = middle
+        upward: dict[int, list[tuple[int, float]]] = {}
+        downward: dict[int, list[tuple[int, float]]] = {}
+        for (node_from, node_to), edge_weight in best_edges.items():
+            if ranks[node_from] < ranks[node_to]:
+                upward.setdefault(node_from, []).append((node_to, edge_weight))
+            else:
+                downward.setdefault(node_to, []).append((node_from, edge_weight))
+        return cls(fingerprint, ranks, upward, downward, shortcut_middles)
+
+    def shortest_path(
+        self, start: int, end: int, stats: dict | None = None
+    ) -> list[int]:
+        """Returns the node IDs along the lowest-weight path between two (original graph) nodes.
+
+        - If `stats` is provided, the number of nodes settled in each direction and edges relaxed are stored in it
+        - Raises `NetworkXNoPath` if the end node can't be reached
+        """
+        # Index 0 is the search upwards from the start, index 1 is the search upwards from the end
+        edges = (self.upward, self.downward)
+        distances: tuple[dict[int, float], dict[int, float]] = ({start: 0}, {end: 0})
+        parents: tuple[dict[int, int], dict[int, int]] = ({}, {})
+        queues: tuple[list, list] = ([(0.0, start)], [(0.0, end)])
+        settled = [0, 0]
+        relaxed = 0
+        best_weight = inf
+        meeting_node = None
+        while True:
+            # Each search can stop once it can't find anything better than the best path so far
+            active = [
+                direction
+                for direction in (0, 1)
+                if queues[direction] and queues[direction][0][0] < best_weight
+            ]
+            if not active:
+                break
+            direction = min(active, key=lambda direction: queues[direction][0][0])
+            distance, node = heappop(queues[direction])
+            if distance > distances[direction][node]:
+                continue
+            settled[direction] += 1
+            other_distance = distances[1 - direction].get(node)
+            if other_distance is not None and distance + other_distance < best_weight:
+                best_weight = distance + other_distance
+                meeting_node = node
+            node_edges = edges[direction].get(node, ())
+            relaxed += len(node_edges)
+            for neighbour, edge_weight in node_edges:
+                new_distance = distance + edge_weight
+                if new_distance < distances[direction].get(neighbour, inf):
+                    distances[direction][neighbour] = new_distance
+                    parents[direction][neighbour] = node
+                    heappush(queues[direction], (new_distance, neighbour))
+
+        if stats is not None:
+            stats["settled_forward"] = settled[0]
+            stats["settled_backward"] = settled[1]
+            stats["edges_relaxed"] = relaxed
+        if meeting_node is None:
+            raise NetworkXNoPath(f"Node {end} not reachable from {start}")
+
+        path = [meeting_node]
+        node = meeting_node
+        while node != start:
+            parent = parents[0][node]
+            path[:0] = self._unpack(parent, node)[:-1]
+            node = parent
+        node = meeting_node
+        while node != end:
+            child = parents[1][node]
+            path.extend(self._unpack(node, child)[1:])
+            node = child
+        return path
+
+    def _unpack(self, node_from: int, node_to: int) -> list[int]:
+        """Returns the original nodes along an edge, which may be a shortcut (including both ends)"""
+        middle = self.shortcut_middles.get((node_from, node_to))
+        if middle is None:
+            return [node_from, node_to]
+        return self._unpack(node_from, middle) + self._unpack(middle, node_to)[1:]
+
+    def save(self, path: str):
+        """Saves the hierarchy to a file, so that it doesn't have to be rebuilt every time"""
+        with open(path, "wb") as file:
+            pickle.dump(
+                {
+                    "version": self.FORMAT_VERSION,
+                    "fingerprint": self.fingerprint,
+                    "ranks": self.ranks,
+                    "upward": self.upward,
+                    "downward": self.downward,
+                    "shortcut_middles": self.shortcut_middles,
+                },
+                file,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "ContractionHierarchy":
+        """Loads a hierarchy saved with `save()`. Only load files that you trust!"""
+        with open(path, "rb") as file:
+            data = pickle.load(file)
+        if data.get("version") != cls.FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported contraction hierarchy format version: {data.get('version')}"
+            )
+        return cls(
+            data["fingerprint"],
+            data["ranks"],
+            data["upward"],
+            data["downward"],
+            data["shortcut_middles"],
+        )
@@ -0,0 +1,81 @@
+from array import array
+from typing import Callable
+from osm_data_types import Coordinates
+
+
+class DebugWeightRecorder:
+    """Records the weight of every edge that searches weigh, for debugging (e.g. the map's weight overlay)
+
+    - Each edge that's weighed adds a row to a set of preallocated columns (one array per attribute),
+      which double in size when they fill up, instead of creating a dict per edge
+    - Positions aren't recorded, because they can be looked up from the graph when the data is exported
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self.length = 0
+        self.nodes_a = array("q", bytes(8 * capacity))
+        self.nodes_b = array("q", bytes(8 * capacity))
+        self.way_ids = array("q", bytes(8 * capacity))
+        # Way weight per meter, and way weight multiplied by the edge's length
+        self.weights = array("d", bytes(8 * capacity))
+        self.total_weights = array("d", bytes(8 * capacity))
+
+    def __len__(self):
+        return self.length
+
+    def _grow(self):
+        for column in (
+            self.nodes_a,
+            self.nodes_b,
+            self.way_ids,
+            self.weights,
+            self.total_weights,
+        ):
+            column.frombytes(bytes(column.itemsize * max(len(column), 1)))
+
+    def record(
+        self, node_a: int, node_b: int, way_id: int, weight: float, total_weight: float
+    ):
+        row = self.length
+        if row == len(self.weights):
+            self._grow()
+        self.nodes_a[row] = node_a
+        self.nodes_b[row] = node_b
+        self.way_ids[row] = way_id
+        self.weights[row] = weight
+        self.total_weights[row] = total_weight
+        self.length = row + 1
+
+    def segment_weights(
+        self, node_position: Callable[[int], Coordinates]
+    ) -> list[dict[str, Coordinates | float]]:
+        """Returns the most recent weight of each (directed) edge that has been weighed"""
+        latest_rows: dict[tuple[int, int], int] = {}
+        for row in range(self.length):
+            latest_rows[(self.nodes_a[row], self.nodes_b[row])] = row
+        return [
+            {
+                "pos_a": node_position(node_a),
+                "pos_b": node_position(node_b),
+                "weight": self.weights[row],
+                "total_weight": self.total_weights[row],
+            }
+            for (node_a, node_b), row in latest_rows.items()
+        ]
+
+    def way_weights(self) -> dict[int, dict[str, float]]:
+        """Returns each way's weight, and the total weight of every time one of its edges was weighed"""
+        way_weights: dict[int, dict[str, float]] = {}
+        for row in range(self.length):
+            way_id = self.way_ids[row]
+            if way_id in way_weights:
+                way_weights[way_id]["total_weight"] += self.total_weights[row]
+            else:
+                way_weights[way_id] = {
+                    "weight": self.weights[row],
+                    "total_weight": self.total_weights[row],
+                }
+        return way_weights
+
+    def clear(self):
+        self.length = 0
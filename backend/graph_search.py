@@ -0,0 +1,198 @@
+from heapq import heappop, heappush
+from itertools import count
+from math import inf, isfinite
+from operator import add
+from typing import Callable, Collection, Iterable, Protocol
+from networkx import NetworkXNoPath
+from osm_data_types import OSMWayData
+
+
+class SearchableGraph(Protocol):
+    def neighbours(self, node_id: int) -> Iterable[tuple[int, OSMWayData]]: ...
+
+
+def bidirectional_astar_path(
+    graph: SearchableGraph,
+    start: int,
+    end: int,
+    heuristic: Callable[[int, int], float],
+    weight: Callable[[int, int, OSMWayData], float],
+    stats: dict[str, int] | None = None,
+) -> list[int]:
+    """Returns the node IDs along the lowest-weight path between two nodes, searching from both ends at once.
+
+    - Edges can have a different weight in each direction: the backward search (from `end`) weighs the edge from
+      its neighbour *into* the node, i.e. `weight(neighbour, node, data)`
+    - `heuristic(a, b)` must never overestimate the weight of the best path from `a` to `b`
+    - Both searches use the same "average" potential, `(heuristic(node, end) - heuristic(start, node)) / 2`,
+      which is added to the forward keys and subtracted from the backward keys. This keeps the two searches
+      consistent with each other, so (as long as the heuristic also obeys the triangle inequality) we can stop
+      as soon as the smallest forward key plus the smallest backward key reaches the weight of the best path
+      we've found.
+    - Nodes with an infinite heuristic are never queued
+    - If `stats` is provided, the number of nodes settled in each direction and edges relaxed are stored in it
+    - Raises `NetworkXNoPath` if the end node can't be reached at all, for consistency with `RoutingGraph`
+    """
+    if start == end:
+        return [start]
+    potentials: dict[int, float] = {}
+
+    def potential(node: int) -> float:
+        value = potentials.get(node)
+        if value is None:
+            value = (heuristic(node, end) - heuristic(start, node)) / 2
+            potentials[node] = value
+        return value
+
+    counter = count()
+    # Index 0 is the forward search, index 1 is the backward search
+    signs = (1, -1)
+    distances: tuple[dict[int, float], dict[int, float]] = ({start: 0}, {end: 0})
+    parents: tuple[dict[int, int], dict[int, int]] = ({}, {})
+    settled: tuple[set[int], set[int]] = (set(), set())
+    queues: tuple[list, list] = (
+        [(potential(start), next(counter), start)],
+        [(-potential(end), next(counter), end)],
+    )
+    best_weight = inf
+    meeting_node = None
+    relaxed = 0
+
+    while queues[0] and queues[1]:
+        if (
+            meeting_node is not None
+            and queues[0][0][0] + queues[1][0][0] >= best_weight
+        ):
+            break
+        # Expand whichever search has the smaller frontier, to keep them balanced
+        direction = 0 if len(queues[0]) <= len(queues[1]) else 1
+        _, _, node = heappop(queues[direction])
+        if node in settled[direction]:
+            continue
+        settled[direction].add(node)
+        node_distance = distances[direction][node]
+        other_distances = distances[1 - direction]
+        for neighbour, data in graph.neighbours(node):
+            if neighbour in settled[direction]:
+                continue
+            relaxed += 1
+            if direction == 0:
+                cost = weight(node, neighbour, data)
+            else:
+                cost = weight(neighbour, node, data)
+            new_distance = node_distance + cost
+            # Like NetworkX, we still queue nodes that can only be reached with infinite weight,
+            # so that we return an (infinite weight) path rather than no path at all
+            known_distance = distances[direction].get(neighbour)
+            if known_distance is not None and new_distance >= known_distance:
+                continue
+            neighbour_potential = potential(neighbour)
+            if not isfinite(neighbour_potential):
+                # The heuristic says there's no finite-weight path through this node
+                continue
+            distances[direction][neighbour] = new_distance
+            parents[direction][neighbour] = node
+            key = new_distance + signs[direction] * neighbour_potential
+            heappush(queues[direction], (key, next(counter), neighbour))
+            if neighbour in other_distances:
+                total = new_distance + other_distances[neighbour]
+                if total < best_weight or meeting_node is None:
+                    best_weight = total
+                    meeting_node = neighbour
+
+    if stats is not None:
+        stats["settled_forward"] = len(settled[0])
+        stats["settled_backward"] = len(settled[1])
+        stats["edges_relaxed"] = relaxed
+    if meeting_node is None:
+        raise NetworkXNoPath(f"Node {end} not reachable from {start}")
+
+    path = [meeting_node]
+    node = meeting_node
+    while node != start:
+        node = parents[0][node]
+        path.append(node)
+    path.reverse()
+    node = meeting_node
+    while node != end:
+        node = parents[1][node]
+        path.append(node)
+    return path
+
+
+def dijkstra_distances(
+    graph: SearchableGraph,
+    source: int,
+    weight: Callable[[int, int, OSMWayData], float],
+    reverse=False,
+    max_distance: float = inf,
+) -> dict[int, float]:
+    """Returns the weight of the best path from `source` to every node that can be reached from it.
+
+    - If `reverse` is true, returns the weight of the best path from every node *to* `source` instead
+    - Edges with infinite weight are treated as impassable, so unreachable nodes are left out
+    - Nodes whose best path weighs more than `max_distance` are left out too, and never explored past,
+      so the search only covers the area around `source`
+    """
+    distances: dict[int, float] = {source: 0}
+    settled: set[int] = set()
+    queue = [(0.0, source)]
+    while queue:
+        distance, node = heappop(queue)
+        if node in settled:
+            continue
+        settled.add(node)
+        for neighbour, data in graph.neighbours(node):
+            if neighbour in settled:
+                continue
+            if reverse:
+                new_distance = distance + weight(neighbour, node, data)
+            else:
+                new_distance = distance + weight(node, neighbour, data)
+            if new_distance > max_distance:
+                continue
+            if new_distance < distances.get(neighbour, inf):
+                distances[neighbour] = new_distance
+                heappush(queue, (new_distance, neighbour))
+    return distances
+
+
+def one_to_many_dijkstra(
+    graph: SearchableGraph,
+    source: int,
+    targets: Collection[int],
+    cost: Callable[[int, int, OSMWayData], tuple[float, ...]],
+    measure_count: int = 0,
+) -> dict[int, tuple[float, ...]]:
+    """Finds the lowest-weight paths from `source` to every node in `targets`, using one Dijkstra search.
+
+    - `cost(node_from, node_to, data)` returns the edge's weight, followed by `measure_count` other values
+      (e.g. distance and time) that are added up along the lowest-weight path too
+    - Returns (weight, *measures) for each target that can be reached. Edges with infinite weight are impassable.
+    - Stops as soon as every target has been reached
+    """
+    remaining = set(targets)
+    results: dict[int, tuple[float, ...]] = {}
+    distances: dict[int, float] = {source: 0.0}
+    settled: set[int] = set()
+    counter = count()
+    queue = [(0.0, next(counter), source, (0.0,) * measure_count)]
+    while queue and remaining:
+        distance, _, node, measures = heappop(queue)
+        if node in settled:
+            continue
+        settled.add(node)
+        if node in remaining:
+            remaining.remove(node)
+            results[node] = (distance, *measures)
+        for neighbour, data in graph.neighbours(node):
+            if neighbour in settled:
+                continue
+            edge_weight, *edge_measures = cost(node, neighbour, data)
+            new_distance = distance + edge_weight
+            if new_distance >= distances.get(neighbour, inf):
+                continue
+            distances[neighbour] = new_distance
+            new_measures = tuple(map(add, measures, edge_measures))
+            heappush(queue, (new_distance, next(counter), neighbour, new_measures))
+    return results
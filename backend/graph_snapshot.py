@@ -0,0 +1,133 @@
+from array import array
+from pathlib import Path
+import json
+import os
+import struct
+import sys
+
+MAGIC = b"MMMGRAPH"
+FORMAT_VERSION = 1
+# Magic bytes, format version, and the length of the (JSON) table of contents that follows
+HEADER = struct.Struct("<8sII")
+# Every column starts on a multiple of this many bytes, so that it can be used in place
+ALIGNMENT = 8
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _layout(columns: dict[str, array], metadata: dict) -> tuple[bytes, list[int], int]:
+    """Returns the header and table of contents, the position of each column, and the total size of a snapshot"""
+    table_of_contents = {}
+    offset = 0
+    for name, column in columns.items():
+        table_of_contents[name] = {
+            "typecode": column.typecode,
+            "itemsize": column.itemsize,
+            "offset": offset,
+            "length": len(column),
+        }
+        offset = _aligned(offset + column.itemsize * len(column))
+    contents = json.dumps(
+        {
+            "byteorder": sys.byteorder,
+            "columns": table_of_contents,
+            "metadata": metadata,
+        }
+    ).encode()
+    data_start = _aligned(HEADER.size + len(contents))
+    positions = [data_start + column["offset"] for column in table_of_contents.values()]
+    return (
+        HEADER.pack(MAGIC, FORMAT_VERSION, len(contents)) + contents,
+        positions,
+        data_start + offset,
+    )
+
+
+def snapshot_size(columns: dict[str, array], metadata: dict) -> int:
+    """Returns how many bytes `write_snapshot_into()` needs"""
+    return _layout(columns, metadata)[2]
+
+
+def write_snapshot(path: str | Path, columns: dict[str, array], metadata: dict):
+    """Writes named columns of numbers to a snapshot file, which can be loaded again with `read_snapshot()`
+
+    - Each column is stored as raw bytes, in this machine's byte order
+    - `metadata` must be JSON-serializable
+    """
+    header, positions, size = _layout(columns, metadata)
+    temporary_path = Path(f"{path}.tmp")
+    with open(temporary_path, "wb") as file:
+        file.write(header)
+        for position, column in zip(positions, columns.values()):
+            file.write(bytes(position - file.tell()))
+            file.write(column.tobytes())
+        file.write(bytes(size - file.tell()))
+    os.replace(temporary_path, path)
+
+
+def write_snapshot_into(buffer, columns: dict[str, array], metadata: dict):
+    """Like `write_snapshot()`, but writes to a writable buffer (e.g. shared memory) of at least `snapshot_size()` bytes"""
+    header, positions, size = _layout(columns, metadata)
+    view = memoryview(buffer).cast("B")
+    if len(view) < size:
+        raise ValueError(f"The buffer is too small for the snapshot ({size} bytes)")
+    view[: len(header)] = header
+    for position, column in zip(positions, columns.values()):
+        view[position : position + column.itemsize * len(column)] = memoryview(
+            column
+        ).cast("B")
+
+
+def read_snapshot(path: str | Path) -> tuple[dict[str, memoryview], dict]:
+    """Opens a snapshot written by `write_snapshot()`, returning its columns (as memoryviews) and metadata
+
+    - The file is memory-mapped where possible, so columns are only read from disk when they're used
+      and nothing has to be parsed or copied. Otherwise (e.g. under Pyodide), the whole file is read.
+    - Raises `ValueError` if the file isn't a snapshot, or was written by an incompatible version
+    """
+    with open(path, "rb") as file:
+        try:
+            import mmap
+
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ImportError, OSError, ValueError):
+            buffer = file.read()
+    return read_snapshot_from(buffer, str(path))
+
+
+def read_snapshot_from(
+    buffer, name: str = "The buffer"
+) -> tuple[dict[str, memoryview], dict]:
+    """Like `read_snapshot()`, but reads from a buffer that's already in memory, without copying the columns
+
+    - `name` is only used in error messages
+    """
+    view = memoryview(buffer).cast("B")
+    if len(view) < HEADER.size:
+        raise ValueError(f"{name} is not a graph snapshot")
+    magic, version, contents_length = HEADER.unpack(view[: HEADER.size])
+    if magic != MAGIC:
+        raise ValueError(f"{name} is not a graph snapshot")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported graph snapshot format version: {version}")
+    contents = json.loads(bytes(view[HEADER.size : HEADER.size + contents_length]))
+    if contents["byteorder"] != sys.byteorder:
+        raise ValueError(
+            f"{name} was saved on a {contents['byteorder']}-endian machine, so it can't be loaded here"
+        )
+
+    data_start = _aligned(HEADER.size + contents_length)
+    columns: dict[str, memoryview] = {}
+    for column_name, column in contents["columns"].items():
+        if array(column["typecode"]).itemsize != column["itemsize"]:
+            raise ValueError(
+                f"Column {column_name} of {name} uses {column['itemsize']}-byte items, which this machine doesn't support"
+            )
+        start = data_start + column["offset"]
+        end = start + column["itemsize"] * column["length"]
+        if end > len(view):
+            raise ValueError(f"{name} is truncated")
+        columns[column_name] = view[start:end].cast(column["typecode"])
+    return columns, contents["metadata"]
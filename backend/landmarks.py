@@ -0,0 +1,90 @@
+from math import inf
+from typing import Callable, Hashable, Iterable, Protocol
+from graph_search import dijkstra_distances
+from osm_data_types import OSMWayData
+
+
+class LandmarkGraph(Protocol):
+    def nodes(self) -> Iterable[int]: ...
+    def neighbours(self, node_id: int) -> Iterable[tuple[int, OSMWayData]]: ...
+
+
+class Landmarks:
+    """Precomputed weights to and from a few "landmark" nodes, for one routing profile, used as an A* heuristic.
+
+    - Uses the triangle inequality (the ALT technique): the best path from `a` to `b` can't weigh less than
+      `d(L, b) - d(L, a)` or `d(a, L) - d(b, L)` for any landmark `L`
+    - This never overestimates, whatever the edge weights are, so routes found with it are always optimal
+    - Edges with infinite weight are treated as impassable when building the tables, so a heuristic of infinity
+      means that there's no finite-weight path between the two nodes
+    """
+
+    def __init__(
+        self,
+        fingerprint: Hashable,
+        landmarks: list[int],
+        distances_from: list[dict[int, float]],
+        distances_to: list[dict[int, float]],
+    ):
+        # The fingerprint of the routing options that the tables were built for
+        self.fingerprint = fingerprint
+        self.landmarks = landmarks
+        # For each landmark, maps node IDs to the weight of the best path from the landmark to the node
+        self.distances_from = distances_from
+        # For each landmark, maps node IDs to the weight of the best path from the node to the landmark
+        self.distances_to = distances_to
+
+    @classmethod
+    def build(
+        cls,
+        graph: LandmarkGraph,
+        weight: Callable[[int, int, OSMWayData], float],
+        fingerprint: Hashable,
+        landmark_count: int = 8,
+    ) -> "Landmarks":
+        """Picks landmarks spread out around the edges of the graph, and calculates their distance tables.
+
+        - Each landmark is the node furthest (by weight) from all of the landmarks picked before it
+        - Building takes two Dijkstra searches over the whole graph per landmark
+        """
+        first_node = next(iter(graph.nodes()), None)
+        if first_node is None:
+            raise ValueError("Can't pick landmarks in an empty graph")
+        landmarks: list[int] = []
+        distances_from: list[dict[int, float]] = []
+        distances_to: list[dict[int, float]] = []
+        # How far each node is from the nearest landmark picked so far
+        nearest_landmark = dijkstra_distances(graph, first_node, weight)
+        while len(landmarks) < landmark_count:
+            candidates = [
+                node
+                for node, distance in nearest_landmark.items()
+                if 0 < distance < inf
+            ]
+            if not candidates:
+                break
+            landmark = max(candidates, key=lambda node: nearest_landmark[node])
+            landmarks.append(landmark)
+            distances_from.append(dijkstra_distances(graph, landmark, weight))
+            distances_to.append(
+                dijkstra_distances(graph, landmark, weight, reverse=True)
+            )
+            for node in nearest_landmark:
+                nearest_landmark[node] = min(
+                    nearest_landmark[node], distances_from[-1].get(node, inf)
+                )
+        return cls(fingerprint, landmarks, distances_from, distances_to)
+
+    def heuristic(self, node_from: int, node_to: int) -> float:
+        """Returns a lower bound for the weight of the best path between two nodes"""
+        bound = 0.0
+        for from_landmark, to_landmark in zip(self.distances_from, self.distances_to):
+            # Landmark -> node_from -> node_to can't be shorter than landmark -> node_to
+            landmark_to_from = from_landmark.get(node_from, inf)
+            if landmark_to_from < inf:
+                bound = max(bound, from_landmark.get(node_to, inf) - landmark_to_from)
+            # node_from -> node_to -> landmark can't be shorter than node_from -> landmark
+            to_to_landmark = to_landmark.get(node_to, inf)
+            if to_to_landmark < inf:
+                bound = max(bound, to_landmark.get(node_from, inf) - to_to_landmark)
+        return bound
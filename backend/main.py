@@ -1,10 +1,10 @@
 from pathlib import Path
-from sys import argv, stderr
+from sys import argv, exit, stderr
 
 from networkx import astar_path
 from osm_data_types import BoundingBox
+from overpass_cache import OverpassCache
 from routing_engine import RouteCalculator, RoutingEngine, RoutingOptions
-import xml.etree.ElementTree
 
 
 def print_error(message: str):
@@ -80,13 +80,25 @@ if __name__ == "__main__":
     try:
         export_to_js_window()
     except ImportError:
-        routing_engine = RoutingEngine()
-        print("Downloading OSM data")
-        ways, raw_nodes = routing_engine.download_osm_data(
-            BoundingBox(51.26268, -0.41497, 51.27914, -0.36755)
-        )
-        print("Computing routing graph")
-        routing_graph = routing_engine.compute_graph(ways, raw_nodes)
+        routing_engine = RoutingEngine(cache=OverpassCache(".overpass_cache"))
+        if len(argv) > 1:
+            # Use a local OSM file instead of downloading from Overpass
+            if not validate_args():
+                exit(1)
+            data_file_path = get_data_file_path()
+            if not validate_file_is_readable(data_file_path):
+                exit(1)
+            print(f"Loading OSM data from {data_file_path}")
+            routing_graph = routing_engine.load_osm_file(data_file_path)
+        else:
+            print("Downloading OSM data")
+            ways, raw_nodes = routing_engine.download_osm_data(
+                BoundingBox(51.26268, -0.41497, 51.27914, -0.36755)
+            )
+            print("Computing routing graph")
+            routing_graph = routing_engine.compute_graph(ways, raw_nodes)
+        if routing_graph.tag_report is not None:
+            print(routing_graph.tag_report.summary())
         calculator = RouteCalculator(
             routing_graph,
             RoutingOptions(
@@ -124,3 +136,7 @@ if __name__ == "__main__":
         print(
             f"Route with {len(route.parts)} parts, {route.total_distance():.0f} meters, {route.total_time():.0f} seconds"
         )
+        print(
+            f"{len(routing_graph.tag_sets)} distinct tag sets, "
+            f"tag set cache hit rate {calculator.tag_set_hit_rate():.1%}"
+        )
@@ -1,7 +1,7 @@
+from functools import lru_cache
 from math import radians, tan
-from typing import Literal, TypedDict
-import warnings
-
+from sys import intern
+from typing import Any, Callable, Literal, TypedDict
 
 type Coordinates = tuple[float, float]
 
@@ -21,13 +21,26 @@ class BoundingBox:
         return f"{self.min_lat},{self.min_lon},{self.max_lat},{self.max_lon}"
 
 
+def intern_tags(tags: dict[str, str]) -> dict[str, str]:
+    """Returns a copy of the tags where every key and value is interned, so that
+    repeated strings (e.g. `highway` or `residential`) are only stored once"""
+    return {intern(key): intern(value) for key, value in tags.items()}
+
+
+# These are created for every node and way that we download, so they use __slots__ to save memory
+
+
 class OSMElement:
+    __slots__ = ("type", "tags")
+
     def __init__(self, type: str, tags: dict):
         self.type = type
         self.tags = tags
 
 
 class OSMNode(OSMElement):
+    __slots__ = ("id", "pos")
+
     def __init__(self, id: int, pos: Coordinates, tags: dict):
         super().__init__("node", tags)
         self.id = id
@@ -35,6 +48,8 @@ class OSMNode(OSMElement):
 
 
 class OSMWay(OSMElement):
+    __slots__ = ("id", "nodes")
+
     def __init__(self, id: int, nodes: list[OSMNode], tags: dict):
         super().__init__("way", tags)
         self.id = id
@@ -44,9 +59,56 @@ class OSMWay(OSMElement):
 class OSMWayData(TypedDict):
     id: int
     tags: dict[str, str]
+    tags_key: int
     length: float
 
 
+class TagSetInterner:
+    """Gives each distinct set of tags a small integer key, and shares one tags dict between identical sets
+
+    Most ways in an area have one of only a few thousand distinct sets of tags
+    (e.g. `highway=residential, sidewalk=both`), so this saves memory and lets us
+    calculate things once per tag set instead of once per way.
+    """
+
+    def __init__(self):
+        # Built lazily for interners made with `from_tag_sets()`, which are usually never added to
+        self._keys: dict[frozenset[tuple[str, str]], int] | None = {}
+        self.tag_sets: list[dict[str, str]] = []
+
+    def __len__(self):
+        return len(self.tag_sets)
+
+    @classmethod
+    def from_tag_sets(cls, tag_sets: list[dict[str, str]]) -> "TagSetInterner":
+        """Rebuilds an interner from its list of tag sets, so that every tag set keeps the same key
+
+        - The tags should already be interned with `intern_tags()`
+        """
+        interner = cls()
+        interner.tag_sets = tag_sets
+        interner._keys = None
+        return interner
+
+    def intern(self, tags: dict[str, str]) -> tuple[int, dict[str, str]]:
+        """Returns the key of the provided tag set, and the shared dict that should be used instead of it"""
+        if self._keys is None:
+            self._keys = {}
+            for key, existing_tags in enumerate(self.tag_sets):
+                self._keys.setdefault(frozenset(existing_tags.items()), key)
+        frozen_tags = frozenset(tags.items())
+        key = self._keys.get(frozen_tags)
+        if key is None:
+            key = len(self.tag_sets)
+            self._keys[frozen_tags] = key
+            self.tag_sets.append(intern_tags(tags))
+        return key, self.tag_sets[key]
+
+
+SIDEWALK_YES_VALUES = ["yes"]
+SIDEWALK_NO_VALUES = ["no", "separate", "lane", "none"]
+
+
 def truthy_tag(tags: dict[str, str], key: str) -> bool:
     value = tags.get(key)
     if not value:
@@ -57,37 +119,32 @@ def truthy_tag(tags: dict[str, str], key: str) -> bool:
 
 
 def way_has_sidewalk(
-    way: dict[str, str]
+    way: dict[str, str],
 ) -> Literal["both"] | Literal["left"] | Literal["right"] | Literal["no"] | None:
     """Returns whether the given way has a sidewalk on the left, right, both sides
 
     - Returns `None` if sidewalk information is not available
     - Warning: returns `"no"` if no sidewalk is present (not `False` as you might expect)
+    - Unknown values are ignored (they're listed in the graph's tag validation report instead)
     """
-    yes_values = ["yes"]
-    no_values = ["no", "separate", "lane", "none"]
-
     sidewalk_left = way.get("sidewalk:left")
     if sidewalk_left:
-        if sidewalk_left in yes_values:
+        if sidewalk_left in SIDEWALK_YES_VALUES:
             return "left"
-        if sidewalk_left in no_values:
+        if sidewalk_left in SIDEWALK_NO_VALUES:
             return "no"
-        warnings.warn(f"Unknown tag value: sidewalk:left={sidewalk_left}")
     sidewalk_right = way.get("sidewalk:right")
     if sidewalk_right:
-        if sidewalk_right in yes_values:
+        if sidewalk_right in SIDEWALK_YES_VALUES:
             return "right"
-        if sidewalk_right in no_values:
+        if sidewalk_right in SIDEWALK_NO_VALUES:
             return "no"
-        warnings.warn(f"Unknown tag value: sidewalk:right={sidewalk_right}")
     sidewalk_both = way.get("sidewalk:both")
     if sidewalk_both:
-        if sidewalk_both in yes_values:
+        if sidewalk_both in SIDEWALK_YES_VALUES:
             return "both"
-        if sidewalk_both in no_values:
+        if sidewalk_both in SIDEWALK_NO_VALUES:
             return "no"
-        warnings.warn(f"Unknown tag value: sidewalk:both={sidewalk_both}")
 
     match way.get("sidewalk"):
         case "both":
@@ -98,10 +155,7 @@ def way_has_sidewalk(
             return "right"
         case "no" | "none" | "separate" | "lane":
             return "no"
-        case None:
-            return None
-        case unknown_value:
-            warnings.warn(f"Unknown tag value: sidewalk={unknown_value}")
+        case _:
             return None
 
 
@@ -121,34 +175,18 @@ def parse_speed(value: str, unit: str) -> float:
             raise ValueError(f"Unknown unit for speed: {unit}")
 
 
-def way_maxspeed_mph(way: dict[str, str]) -> float | None:
-    value = way.get("maxspeed")
-    if not value:
-        return None
+def parse_maxspeed_mph(value: str) -> float:
     normalised_value = value.strip().lower()
     match normalised_value.split(" "):
         case [speed, unit]:
-            try:
-                return parse_speed(speed, unit)
-            except ValueError as e:
-                warnings.warn(f"Invalid maxspeed: {e}")
-                return None
+            return parse_speed(speed, unit)
         case [speed]:
-            try:
-                return parse_speed(speed, "km/h")
-            except ValueError as e:
-                warnings.warn(f"Invalid maxspeed: {e}")
-                return None
+            return parse_speed(speed, "km/h")
         case _:
-            warnings.warn(f"Invalid tag format: maxspeed={value}")
-            return None
+            raise ValueError(f"Invalid tag format: maxspeed={value}")
 
 
-def way_width_meters(way: dict[str, str]) -> float | None:
-    """Parses the width=* tag, falling back to est_width=* if not present"""
-    value = way.get("width") or way.get("est_width")
-    if not value:
-        return None
+def parse_width_meters(value: str) -> float:
     normalised_value = value.strip().lower()
     match normalised_value.split(" "):
         case [width, unit]:
@@ -157,35 +195,27 @@ def way_width_meters(way: dict[str, str]) -> float | None:
                     try:
                         return float(width)
                     except ValueError as e:
-                        warnings.warn(f"Invalid width: {e}")
-                        return None
+                        raise ValueError(f"Invalid width: {e}")
                 case _:
                     # TODO: Implement other units
-                    warnings.warn(f"Ignoring quantity with unit {unit}")
-                    return None
+                    raise ValueError(f"Ignoring quantity with unit {unit}")
         case [width]:
             try:
                 return float(width)
             except ValueError as e:
-                warnings.warn(f"Invalid width: {e}")
-                return None
+                raise ValueError(f"Invalid width: {e}")
         case _:
-            warnings.warn(f"Invalid tag format: width={value}")
-            return None
+            raise ValueError(f"Invalid tag format: width={value}")
 
 
-def way_incline_gradient(
-    way: dict[str, str]
-) -> float | Literal["up"] | Literal["down"] | None:
-    """Parses the incline=* tag, converting it to a gradient (0 to 1) or returning `"up"`/`"down"`"""
-    value = way.get("incline")
-    if not value:
-        return None
+def parse_incline_gradient(value: str) -> float | Literal["up"] | Literal["down"]:
     normalised_value = value.strip().lower()
     if normalised_value == "up":
         return "up"
     if normalised_value == "down":
         return "down"
+    if not normalised_value:
+        raise ValueError(f"Invalid tag format: incline={value}")
     unit_char = normalised_value[-1]
     number = normalised_value[:-1].strip()
     match unit_char:
@@ -193,15 +223,81 @@ def way_incline_gradient(
             try:
                 return float(number) / 100
             except ValueError as e:
-                warnings.warn(f"Invalid incline: {e}")
-                return None
+                raise ValueError(f"Invalid incline: {e}")
         case "°" | "º" | "deg" | "degrees":
             try:
                 angle = radians(float(number))
                 return tan(angle)
             except ValueError as e:
-                warnings.warn(f"Invalid incline: {e}")
-                return None
+                raise ValueError(f"Invalid incline: {e}")
         case _:
-            warnings.warn(f"Invalid tag format: incline={value}")
-            return None
+            raise ValueError(f"Invalid tag format: incline={value}")
+
+
+def parse_lanes(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Couldn't parse lanes={value}")
+
+
+# Parsers for tags with numeric values, which raise a ValueError (with a message saying what's wrong) for invalid values
+TAG_VALUE_PARSERS: dict[str, Callable[[str], object]] = {
+    "maxspeed": parse_maxspeed_mph,
+    "width": parse_width_meters,
+    "est_width": parse_width_meters,
+    "incline": parse_incline_gradient,
+    "lanes": parse_lanes,
+}
+
+
+# Even a large region only has a few thousand distinct values of these tags, but this is a long-running
+# process's cache, so the least recently used values are forgotten after this many
+PARSED_TAG_VALUE_CACHE_SIZE = 65_536
+
+
+@lru_cache(maxsize=PARSED_TAG_VALUE_CACHE_SIZE)
+def parsed_tag_value(key: str, value: str) -> tuple[Any, str | None]:
+    """Parses a tag value with its parser from `TAG_VALUE_PARSERS`
+
+    - Returns `(parsed value, None)`, or `(None, problem)` if the value is invalid
+    - Each distinct value is usually only parsed once, while the graph is being built (see `tag_validation`),
+      so that routing just looks up the parsed value
+    """
+    try:
+        return TAG_VALUE_PARSERS[key](value), None
+    except ValueError as error:
+        return None, str(error)
+
+
+def way_maxspeed_mph(way: dict[str, str]) -> float | None:
+    value = way.get("maxspeed")
+    if not value:
+        return None
+    return parsed_tag_value("maxspeed", value)[0]
+
+
+def way_width_meters(way: dict[str, str]) -> float | None:
+    """Parses the width=* tag, falling back to est_width=* if not present"""
+    key = "width" if way.get("width") else "est_width"
+    value = way.get(key)
+    if not value:
+        return None
+    return parsed_tag_value(key, value)[0]
+
+
+def way_incline_gradient(
+    way: dict[str, str],
+) -> float | Literal["up"] | Literal["down"] | None:
+    """Parses the incline=* tag, converting it to a gradient (0 to 1) or returning `"up"`/`"down"`"""
+    value = way.get("incline")
+    if not value:
+        return None
+    return parsed_tag_value("incline", value)[0]
+
+
+def way_lanes(way: dict[str, str]) -> int | None:
+    value = way.get("lanes")
+    if not value:
+        return None
+    return parsed_tag_value("lanes", value)[0]
@@ -0,0 +1,96 @@
+from io import BufferedIOBase
+from pathlib import Path
+from sys import intern
+from typing import Collection, Iterator
+import xml.etree.ElementTree
+
+
+def open_osm_file(path: str | Path) -> BufferedIOBase:
+    """Opens an OSM XML file for reading, decompressing it if it ends in `.bz2` or `.gz`"""
+    path = Path(path)
+    match path.suffix:
+        case ".bz2":
+            import bz2
+
+            return bz2.open(path, "rb")
+        case ".gz":
+            import gzip
+
+            return gzip.open(path, "rb")
+        case _:
+            return open(path, "rb")
+
+
+def iter_elements(path: str | Path) -> Iterator[xml.etree.ElementTree.Element]:
+    """Yields each top-level element (node, way, relation, etc.) of an OSM XML file once it has been parsed
+
+    - Each element is cleared as soon as the caller is done with it, so memory use doesn't grow with the file size
+    """
+    with open_osm_file(path) as file:
+        events = xml.etree.ElementTree.iterparse(file, events=("start", "end"))
+        _, root = next(events)
+        depth = 0
+        for event, element in events:
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 0:
+                yield element
+                # Also drops the (now empty) element from the root, which would otherwise keep it around
+                root.clear()
+
+
+def element_tags(element: xml.etree.ElementTree.Element) -> dict[str, str]:
+    return {
+        intern(tag.attrib["k"]): intern(tag.attrib["v"]) for tag in element.iter("tag")
+    }
+
+
+def iter_osm_file_elements(
+    path: str | Path, highway_values: Collection[str]
+) -> Iterator[dict]:
+    """Yields the routable ways in an OSM XML file, and their nodes, in the same format as the Overpass API's JSON
+
+    - Only ways with a `highway=*` value in `highway_values` are included, like in the Overpass query
+    - Reads the file twice: first to find which nodes the routable ways use, then to yield those nodes and the ways.
+      This means that the nodes that we don't need (which is most of them) never have to be stored, so memory use
+      depends on the size of the routing graph rather than the file.
+    - The cost is that the file is parsed (and for `.bz2` and `.gz` files, decompressed) twice, which roughly
+      doubles the time this takes. To load a compressed file more than once, decompress it beforehand.
+    """
+    highway_values = set(highway_values)
+    needed_nodes: set[int] = set()
+    for element in iter_elements(path):
+        if element.tag != "way":
+            continue
+        if element_tags(element).get("highway") not in highway_values:
+            continue
+        needed_nodes.update(int(nd.attrib["ref"]) for nd in element.iter("nd"))
+
+    for element in iter_elements(path):
+        match element.tag:
+            case "node":
+                node_id = int(element.attrib["id"])
+                if node_id not in needed_nodes:
+                    continue
+                node = {
+                    "type": "node",
+                    "id": node_id,
+                    "lat": float(element.attrib["lat"]),
+                    "lon": float(element.attrib["lon"]),
+                }
+                tags = element_tags(element)
+                if tags:
+                    node["tags"] = tags
+                yield node
+            case "way":
+                tags = element_tags(element)
+                if tags.get("highway") not in highway_values:
+                    continue
+                yield {
+                    "type": "way",
+                    "id": int(element.attrib["id"]),
+                    "nodes": [int(nd.attrib["ref"]) for nd in element.iter("nd")],
+                    "tags": tags,
+                }
@@ -0,0 +1,139 @@
+from hashlib import sha256
+from pathlib import Path
+import json
+import os
+import time
+from osm_data_types import BoundingBox
+
+
+def normalise_query(query_template: str) -> str:
+    """Collapses whitespace, so that queries that only differ in formatting share cache entries"""
+    return " ".join(query_template.split())
+
+
+class OverpassCache:
+    """Stores raw Overpass API responses on disk, so that repeated downloads can be served locally
+
+    - Entries are keyed by the (normalised) query template and the bounding box it was run for
+    - A request for a bounding box that's inside a cached one is served from the cached response,
+      because it contains all the data that the smaller request would have returned
+    - Entries expire after `ttl` seconds, and the least recently used entries are deleted
+      when the cache grows beyond `max_bytes`
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(
+        self,
+        directory: str | Path,
+        ttl: float = 7 * 24 * 60 * 60,
+        max_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._entries: list[dict] = self._read_index()
+
+    def _read_index(self) -> list[dict]:
+        try:
+            with open(self.directory / self.INDEX_FILE, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return []
+        except json.JSONDecodeError:
+            # A corrupt index just means that we start again with an empty cache
+            return []
+
+    def _write_index(self):
+        temporary_path = self.directory / f"{self.INDEX_FILE}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(self._entries, file)
+        os.replace(temporary_path, self.directory / self.INDEX_FILE)
+
+    def _remove_entry(self, entry: dict):
+        self._entries.remove(entry)
+        (self.directory / entry["file"]).unlink(missing_ok=True)
+
+    def _remove_expired(self, now: float):
+        for entry in list(self._entries):
+            if now - entry["created"] > self.ttl:
+                self._remove_entry(entry)
+
+    def total_bytes(self) -> int:
+        return sum(entry["size"] for entry in self._entries)
+
+    def get(self, query_template: str, bbox: BoundingBox) -> bytes | None:
+        """Returns a cached response for the query that covers the bounding box, or `None` if there isn't one.
+
+        - `query_template` should contain `{bbox}` where the bounding box goes
+        """
+        now = time.time()
+        self._remove_expired(now)
+        query_hash = sha256(normalise_query(query_template).encode()).hexdigest()
+        containing_entries = [
+            entry
+            for entry in self._entries
+            if entry["query_hash"] == query_hash
+            and entry["bbox"][0] <= bbox.min_lat
+            and entry["bbox"][1] <= bbox.min_lon
+            and entry["bbox"][2] >= bbox.max_lat
+            and entry["bbox"][3] >= bbox.max_lon
+        ]
+        if not containing_entries:
+            return None
+        # The smallest containing area will have the least surplus data to parse
+        entry = min(
+            containing_entries,
+            key=lambda entry: (entry["bbox"][2] - entry["bbox"][0])
+            * (entry["bbox"][3] - entry["bbox"][1]),
+        )
+        try:
+            content = (self.directory / entry["file"]).read_bytes()
+        except FileNotFoundError:
+            self._remove_entry(entry)
+            self._write_index()
+            return None
+        entry["last_used"] = now
+        self._write_index()
+        return content
+
+    def put(self, query_template: str, bbox: BoundingBox, content: bytes):
+        """Stores a response, evicting the least recently used entries if the cache is too big"""
+        now = time.time()
+        query_hash = sha256(normalise_query(query_template).encode()).hexdigest()
+        bbox_values = [bbox.min_lat, bbox.min_lon, bbox.max_lat, bbox.max_lon]
+        file_name = sha256(f"{query_hash}:{bbox_values}".encode()).hexdigest() + ".json"
+        for entry in list(self._entries):
+            if entry["file"] == file_name:
+                self._remove_entry(entry)
+        self._remove_expired(now)
+        if len(content) > self.max_bytes:
+            # It would just evict everything else and then get evicted itself
+            self._write_index()
+            return
+
+        temporary_path = self.directory / f"{file_name}.tmp"
+        temporary_path.write_bytes(content)
+        os.replace(temporary_path, self.directory / file_name)
+        self._entries.append(
+            {
+                "query_hash": query_hash,
+                "bbox": bbox_values,
+                "file": file_name,
+                "size": len(content),
+                "created": now,
+                "last_used": now,
+            }
+        )
+        while self.total_bytes() > self.max_bytes:
+            least_recently_used = min(
+                self._entries, key=lambda entry: entry["last_used"]
+            )
+            self._remove_entry(least_recently_used)
+        self._write_index()
+
+    def clear(self):
+        for entry in list(self._entries):
+            self._remove_entry(entry)
+        self._write_index()
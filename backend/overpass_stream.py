@@ -0,0 +1,174 @@
+from codecs import getincrementaldecoder
+from queue import Empty, Full, Queue
+from threading import Event, Thread
+from typing import Iterable, Iterator
+import json
+
+# How many bytes to ask for at a time when streaming a response
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_overpass_elements(chunks: Iterable[bytes]) -> Iterator[dict]:
+    """Yields the elements of an Overpass API JSON response one at a time, as the chunks of the response arrive
+
+    - Only one element (plus one chunk of unparsed text) is held in memory at a time,
+      instead of the whole response and its parsed JSON
+    - Everything other than the `elements` array (e.g. `version` and `osm3s`) is skipped
+    - Raises a `ValueError` if the response isn't valid JSON (e.g. a comma is missing or doubled), or if it ends
+      too early
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = getincrementaldecoder("utf-8")()
+    chunk_iterator = iter(chunks)
+    buffer = ""
+    position = 0
+    finished = False
+
+    def read_more() -> bool:
+        """Adds the next chunk to the buffer, returning False if there aren't any more"""
+        nonlocal buffer, position, finished
+        if finished:
+            return False
+        for chunk in chunk_iterator:
+            text = text_decoder.decode(chunk)
+            if text:
+                buffer = buffer[position:] + text
+                position = 0
+                return True
+        finished = True
+        buffer = buffer[position:] + text_decoder.decode(b"", final=True)
+        position = 0
+        return False
+
+    def skip_whitespace() -> bool:
+        """Consumes whitespace, returning False if the response ends before anything else"""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n":
+                position += 1
+            if position < len(buffer):
+                return True
+            if not read_more():
+                return False
+
+    def peek() -> str:
+        """Returns the next character that isn't whitespace, without consuming it"""
+        if not skip_whitespace():
+            raise ValueError("The Overpass response ended unexpectedly")
+        return buffer[position]
+
+    def expect(character: str):
+        nonlocal position
+        if peek() != character:
+            raise ValueError(
+                f"Expected {character!r} in the Overpass response at {buffer[position:position + 20]!r}"
+            )
+        position += 1
+
+    def separator(end: str) -> bool:
+        """Consumes the comma between two members or the `end` character after the last, returning True for a comma"""
+        nonlocal position
+        if peek() == ",":
+            position += 1
+            return True
+        expect(end)
+        return False
+
+    def decode_value():
+        nonlocal position
+        peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not read_more():
+                    raise
+                continue
+            # A number that's been cut off by the end of the buffer is still a valid number (e.g. "0." parses as 0),
+            # so make sure that the value is followed by something that can actually come after it
+            if (end == len(buffer) or buffer[end] not in ",:]} \t\r\n") and read_more():
+                continue
+            position = end
+            return value
+
+    # Every value has to be followed by exactly one comma, or by the end of its object or array
+    expect("{")
+    if peek() == "}":
+        position += 1
+    else:
+        while True:
+            key = decode_value()
+            if not isinstance(key, str):
+                raise ValueError(
+                    f"Expected a key in the Overpass response, not {key!r}"
+                )
+            expect(":")
+            if key != "elements":
+                decode_value()
+            else:
+                expect("[")
+                if peek() == "]":
+                    position += 1
+                else:
+                    while True:
+                        yield decode_value()
+                        if not separator("]"):
+                            break
+            if not separator("}"):
+                break
+    if skip_whitespace():
+        raise ValueError(
+            f"Unexpected text after the Overpass response at {buffer[position:position + 20]!r}"
+        )
+
+
+def read_in_background(
+    chunks: Iterable[bytes], max_queued: int = 64
+) -> Iterator[bytes]:
+    """Reads chunks on another thread, so that downloading carries on while we're processing earlier chunks
+
+    - At most `max_queued` chunks are buffered, so a slow consumer doesn't cause memory use to balloon
+    - Errors while reading are raised in the consuming thread
+    - Threads aren't available under Pyodide, so don't use this in the browser
+    """
+    queue: Queue = Queue(max_queued)
+    stopped = Event()
+    end_of_chunks = object()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def reader():
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    return
+        except Exception as error:
+            put(error)
+            return
+        put(end_of_chunks)
+
+    thread = Thread(target=reader, name="overpass-reader", daemon=True)
+    thread.start()
+    try:
+        while True:
+            try:
+                item = queue.get(timeout=0.1)
+            except Empty:
+                if not thread.is_alive() and queue.empty():
+                    raise RuntimeError("The reader thread stopped unexpectedly")
+                continue
+            if item is end_of_chunks:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Lets the reader thread finish if we stop early
+        stopped.set()
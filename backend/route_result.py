@@ -1,8 +1,11 @@
 from osm_data_types import Coordinates
 import abc
+import numpy
 
 
 class RoutePart(abc.ABC):
+    __slots__ = ("distance", "estimated_time")
+
     def __init__(self, distance: float, estimated_time: float):
         self.distance = distance
         self.estimated_time = estimated_time
@@ -13,6 +16,8 @@ class RoutePart(abc.ABC):
 
 
 class RouteProgression(RoutePart):
+    __slots__ = ("start", "end")
+
     def __init__(
         self,
         distance: float,
@@ -29,11 +34,15 @@ class RouteProgression(RoutePart):
 
 
 class RouteManoeuvre(RoutePart):
+    __slots__ = ()
+
     def __init__(self, estimated_time: float):
         super().__init__(distance=0, estimated_time=estimated_time)
 
 
 class StartWalking(RouteManoeuvre):
+    __slots__ = ("position",)
+
     def __init__(self, position: Coordinates):
         super().__init__(estimated_time=0)
         self.position = position
@@ -43,6 +52,8 @@ class StartWalking(RouteManoeuvre):
 
 
 class Arrive(RouteManoeuvre):
+    __slots__ = ("position",)
+
     def __init__(self, position: Coordinates):
         super().__init__(estimated_time=0)
         self.position = position
@@ -52,10 +63,21 @@ class Arrive(RouteManoeuvre):
 
 
 class RouteResult:
-    def __init__(self, start: Coordinates, end: Coordinates, parts: list[RoutePart]):
+    def __init__(
+        self,
+        start: Coordinates,
+        end: Coordinates,
+        parts: list[RoutePart],
+        stats: dict | None = None,
+        nodes: list[int] | None = None,
+    ):
         self.start = start
         self.end = end
         self.parts = parts
+        # The IDs of the nodes along the route
+        self.nodes: list[int] = nodes or []
+        # Timings and search counters, see `RouteCalculator.calculate_route_a_star()`
+        self.stats: dict = stats or {}
 
     def total_time(self) -> float:
         return sum(part.estimated_time for part in self.parts)
@@ -64,3 +86,54 @@ class RouteResult:
         return sum(
             part.distance for part in self.parts if isinstance(part, RouteProgression)
         )
+
+
+class RouteMatrix:
+    """The best routes between every origin and every destination, as (origins × destinations) arrays
+
+    - Row `i`, column `j` is the route from `origins[i]` to `destinations[j]`
+    - Pairs without a (finite-weight) route have a weight, distance and time of infinity
+    """
+
+    __slots__ = ("origins", "destinations", "weights", "distances", "times")
+
+    def __init__(
+        self,
+        origins: list[Coordinates],
+        destinations: list[Coordinates],
+        weights: numpy.ndarray,
+        distances: numpy.ndarray,
+        times: numpy.ndarray,
+    ):
+        self.origins = origins
+        self.destinations = destinations
+        self.weights = weights
+        self.distances = distances
+        self.times = times
+
+
+class Isochrone:
+    """Everything that can be reached from a start point within a budget of walking time or route weight
+
+    - `costs` maps each reachable node to the time (in seconds) or weight of the best path to it from the start
+    - `hull` is the convex hull of the reachable nodes, as a list of coordinates that can be drawn as a polygon
+    """
+
+    __slots__ = ("start", "budget", "budget_type", "costs", "hull")
+
+    def __init__(
+        self,
+        start: Coordinates,
+        budget: float,
+        budget_type: str,
+        costs: dict[int, float],
+        hull: list[Coordinates],
+    ):
+        self.start = start
+        self.budget = budget
+        self.budget_type = budget_type
+        self.costs = costs
+        self.hull = hull
+
+    def nodes(self) -> set[int]:
+        return set(self.costs)
@@ -0,0 +1,314 @@
+from argparse import ArgumentParser
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from http import HTTPStatus
+from signal import SIGINT, SIGTERM
+from typing import Hashable
+import asyncio
+import json
+import math
+from networkx import NetworkXNoPath
+from compact_graph import CompactRoutingGraph
+from route_result import RouteProgression, RouteResult
+from routing_engine import (
+    CalculatorCache,
+    RoutingEngine,
+    RoutingGraph,
+    RoutingOptions,
+    SearchMode,
+)
+from routing_profile import DEFAULT_OPTION_KEYS
+from shared_graph import RouteWorkerPool
+
+# Requests with bodies bigger than this are rejected
+MAX_BODY_BYTES = 1024 * 1024
+SEARCH_MODES = ["astar", "bidirectional_astar", "contraction_hierarchy"]
+
+
+class BadRequest(Exception):
+    """Raised for requests that we can't answer, and turned into an error response"""
+
+    def __init__(self, message: str, status: HTTPStatus = HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.status = status
+
+
+def load_region_graph(path: str) -> RoutingGraph | CompactRoutingGraph:
+    """Loads a graph from either a graph snapshot or an OSM XML file (which is much slower)"""
+    try:
+        return CompactRoutingGraph.load_snapshot(path)
+    except ValueError:
+        print(f"{path} isn't a graph snapshot, so loading it as an OSM file")
+        return RoutingEngine().load_osm_file(path).to_compact()
+
+
+class Region:
+    """A preloaded routing graph, and whatever we use to run searches on it
+
+    - With `workers`, searches run in a pool of processes that share the graph. Otherwise they run one at a time on
+      a background thread, because a `RouteCalculator` can't be used by more than one thread at once.
+    - Calculators are reused between searches with the same options, up to a limit (see `CalculatorCache`)
+    """
+
+    def __init__(self, graph: RoutingGraph | CompactRoutingGraph, workers: int = 0):
+        self.graph = graph
+        self.pool = RouteWorkerPool(graph, workers) if workers else None
+        self.executor: Executor = ThreadPoolExecutor(1)
+        self.calculators = CalculatorCache(graph)
+
+    def calculate_route(
+        self, options: dict, start, end, search_mode: SearchMode
+    ) -> RouteResult:
+        calculator = self.calculators.calculator(RoutingOptions(options), search_mode)
+        return calculator.calculate_route_a_star(start, end)
+
+    def submit_route(
+        self, options: dict, start, end, search_mode: SearchMode
+    ) -> Future[RouteResult]:
+        if self.pool is not None:
+            return self.pool.submit_route(options, start, end, search_mode)
+        return self.executor.submit(
+            self.calculate_route, options, start, end, search_mode
+        )
+
+    def shutdown(self):
+        self.executor.shutdown()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def route_to_json(route: RouteResult) -> dict:
+    return {
+        "distance": route.total_distance(),
+        "time": route.total_time(),
+        "parts": [
+            {
+                "type": type(part).__name__,
+                "description": part.description(),
+                "distance": part.distance,
+                "estimated_time": part.estimated_time,
+            }
+            for part in route.parts
+        ],
+        "lines": [
+            [part.start, part.end]
+            for part in route.parts
+            if isinstance(part, RouteProgression)
+        ],
+        "stats": route.stats,
+    }
+
+
+def parse_coordinates(value, name: str) -> tuple[float, float]:
+    if (
+        not isinstance(value, list)
+        or len(value) != 2
+        or not all(isinstance(number, (int, float)) for number in value)
+    ):
+        raise BadRequest(f"{name} must be a [latitude, longitude] pair")
+    lat, lon = float(value[0]), float(value[1])
+    if not (
+        math.isfinite(lat)
+        and math.isfinite(lon)
+        and -90 <= lat <= 90
+        and -180 <= lon <= 180
+    ):
+        raise BadRequest(f"{name} must be a valid latitude and longitude")
+    return lat, lon
+
+
+class RoutingServer:
+    """Answers route requests over HTTP, using graphs that are loaded once at startup
+
+    - `POST /route` with a JSON body like
+      `{"region": "guildford", "start": [lat, lon], "end": [lat, lon], "options": {...}}`
+      (optionally with a `"search_mode"`) returns the route as JSON
+    - `GET /regions` lists the regions that have been loaded
+    - Searches run in an executor, so the server keeps accepting requests while they run.
+      Identical requests that arrive while the first one is still being calculated share its result.
+    - `serve()` runs until SIGINT or SIGTERM, then shuts down every region
+    """
+
+    def __init__(self, regions: dict[str, Region]):
+        self.regions = regions
+        self.in_flight: dict[Hashable, asyncio.Future] = {}
+        # For checking that coalescing works
+        self.searches_started = 0
+        # The (host, port) that `serve()` is listening on, which is set before `listening` is
+        self.address: tuple[str, int] | None = None
+        self.listening = asyncio.Event()
+
+    async def route(self, request: dict) -> dict:
+        region_name = request.get("region")
+        region = self.regions.get(region_name)  # type: ignore
+        if region is None:
+            raise BadRequest(f"Unknown region: {region_name}", HTTPStatus.NOT_FOUND)
+        start = parse_coordinates(request.get("start"), "start")
+        end = parse_coordinates(request.get("end"), "end")
+        options = request.get("options")
+        if not isinstance(options, dict):
+            raise BadRequest("options must be an object")
+        try:
+            fingerprint = RoutingOptions(options).fingerprint()
+        except (TypeError, ValueError) as error:
+            raise BadRequest(str(error))
+        missing_options = [key for key in DEFAULT_OPTION_KEYS if key not in options]
+        if missing_options:
+            raise BadRequest(f"Missing options: {', '.join(missing_options)}")
+        search_mode = request.get("search_mode", "astar")
+        if search_mode not in SEARCH_MODES:
+            raise BadRequest(f"Unknown search mode: {search_mode}")
+
+        key = (region_name, start, end, fingerprint, search_mode)
+        result = self.in_flight.get(key)
+        if result is None:
+            self.searches_started += 1
+            result = asyncio.wrap_future(
+                region.submit_route(options, start, end, search_mode)
+            )
+            self.in_flight[key] = result
+            result.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        try:
+            # Shielded, so that one client disconnecting doesn't cancel the search for everyone else
+            route = await asyncio.shield(result)
+        except NetworkXNoPath:
+            raise BadRequest("No route could be found", HTTPStatus.NOT_FOUND)
+        except ValueError as error:
+            raise BadRequest(str(error))
+        return route_to_json(route)
+
+    async def handle_request(self, method: str, path: str, body: bytes) -> dict:
+        match method, path:
+            case "GET", "/regions":
+                return {"regions": list(self.regions)}
+            case "POST", "/route":
+                try:
+                    request = json.loads(body)
+                except ValueError:
+                    raise BadRequest("The request body must be JSON")
+                if not isinstance(request, dict):
+                    raise BadRequest("The request body must be a JSON object")
+                return await self.route(request)
+            case _, "/regions" | "/route":
+                raise BadRequest(
+                    f"{method} is not allowed here", HTTPStatus.METHOD_NOT_ALLOWED
+                )
+            case _:
+                raise BadRequest(f"Not found: {path}", HTTPStatus.NOT_FOUND)
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        """Handles a single HTTP/1.1 request, then closes the connection"""
+        status = HTTPStatus.OK
+        try:
+            try:
+                request_line = (await reader.readline()).decode("latin-1")
+                method, path, _ = request_line.split(" ", 2)
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode("latin-1").strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                content_length = int(headers.get("content-length", 0))
+            except ValueError:
+                raise BadRequest("Malformed HTTP request")
+            if content_length > MAX_BODY_BYTES:
+                raise BadRequest(
+                    "The request body is too large", HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+                )
+            body = await reader.readexactly(content_length)
+            response = await self.handle_request(method, path.split("?")[0], body)
+        except BadRequest as error:
+            status = error.status
+            response = {"error": str(error)}
+        except asyncio.IncompleteReadError:
+            writer.close()
+            return
+        except Exception as error:
+            print(f"Error while handling a request: {error!r}")
+            status = HTTPStatus.INTERNAL_SERVER_ERROR
+            response = {"error": "Internal server error"}
+
+        response_body = json.dumps(response).encode()
+        writer.write(
+            (
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(response_body)}\r\n"
+                "Access-Control-Allow-Origin: *\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("latin-1")
+            + response_body
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def serve(self, host: str, port: int):
+        """Serves requests until the process gets SIGINT or SIGTERM, then shuts down every region
+
+        - With port 0, the OS picks a free port, which is in `address` once `listening` is set
+        """
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signal_number in (SIGINT, SIGTERM):
+            loop.add_signal_handler(signal_number, stop.set)
+        try:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            async with server:
+                host, port = server.sockets[0].getsockname()[:2]
+                self.address = (host, port)
+                print(f"Listening on http://{host}:{port}")
+                self.listening.set()
+                await stop.wait()
+            print("Shutting down")
+        finally:
+            for signal_number in (SIGINT, SIGTERM):
+                loop.remove_signal_handler(signal_number)
+            for region in self.regions.values():
+                region.shutdown()
+
+
+def main():
+    parser = ArgumentParser(
+        description="Serves routes over HTTP, from graphs that are loaded once at startup"
+    )
+    parser.add_argument(
+        "regions",
+        nargs="+",
+        metavar="NAME=PATH",
+        help="a region to load, from a graph snapshot or an OSM XML file",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="number of worker processes per region (by default, searches run on a thread in this process)",
+    )
+    args = parser.parse_args()
+
+    regions: dict[str, Region] = {}
+    try:
+        for region in args.regions:
+            name, separator, path = region.partition("=")
+            if not separator:
+                parser.error(f"Regions must be given as NAME=PATH, not {region}")
+            print(f"Loading {name} from {path}")
+            regions[name] = Region(load_region_graph(path), args.workers)
+    except BaseException:
+        # Don't leave the shared memory of regions that were already loaded behind
+        for region in regions.values():
+            region.shutdown()
+        raise
+    # This shuts down the regions when it stops
+    asyncio.run(RoutingServer(regions).serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,307 @@
+from array import array
+from collections import OrderedDict
 from math import inf
-from typing import Literal
-from warnings import warn
+from time import perf_counter
+import json
+from typing import (
+    Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    Literal,
+    Mapping,
+    overload,
+)
 import networkx
+import numpy
 import requests
-from route_result import Arrive, RoutePart, RouteProgression, RouteResult, StartWalking
+from route_result import (
+    Arrive,
+    Isochrone,
+    RouteMatrix,
+    RoutePart,
+    RouteProgression,
+    RouteResult,
+    StartWalking,
+)
 from osm_data_types import (
     BoundingBox,
     Coordinates,
     OSMNode,
     OSMWay,
     OSMWayData,
-    truthy_tag,
-    way_has_sidewalk,
-    way_incline_gradient,
-    way_maxspeed_mph,
-    way_width_meters,
+    TagSetInterner,
+    intern_tags,
+)
+from compact_graph import CompactRoutingGraph
+from contraction_hierarchy import ContractionHierarchy
+from debug_weights import DebugWeightRecorder
+from graph_search import (
+    bidirectional_astar_path,
+    dijkstra_distances,
+    one_to_many_dijkstra,
+)
+from landmarks import Landmarks
+from overpass_cache import OverpassCache
+from osm_file import iter_osm_file_elements
+from overpass_stream import CHUNK_SIZE, iter_overpass_elements, read_in_background
+from routing_profile import (
+    DEFAULT_PROFILE,
+    DEFAULT_WAY_TAG_KEYS,
+    CompiledProfile,
+    profile_fingerprint,
+    profile_way_tag_keys,
 )
-from geographiclib.geodesic import Geodesic
+from geometry import (
+    chord_length,
+    convex_hull,
+    distance_between_points,
+    earth_centred_position,
+    segment_lengths,
+)
+from spatial_index import SpatialIndex
+from tag_columns import TagColumns
+from tag_validation import TagValidationReport
+from tiles import Tile, tile_bbox, tiles_for_bbox
+from weight_cache import EdgeWeightCache
+
+# (node A ID, node B ID, way ID, tags key, tags, length)
+type WaySegment = tuple[int, int, int, int, dict, float]
 
-geodesic_wgs84: Geodesic = Geodesic.WGS84  # type: ignore
 
+def way_segments(
+    ways: list[OSMWay], tag_sets: TagSetInterner, exact_lengths=False
+) -> list[WaySegment]:
+    """Splits ways into segments between consecutive nodes, interning each way's tags into `tag_sets`"""
+    unmeasured: list[tuple[int, int, int, int, dict]] = []
+    positions: dict[int, Coordinates] = {}
+    for way in ways:
+        tags_key, tags = tag_sets.intern(way.tags)
+        for node in way.nodes:
+            positions[node.id] = node.pos
+        for i in range(len(way.nodes) - 1):
+            unmeasured.append(
+                (way.nodes[i].id, way.nodes[i + 1].id, way.id, tags_key, tags)
+            )
+    return measure_segments(unmeasured, positions, exact_lengths)
 
-def distance_between_points(a: Coordinates, b: Coordinates) -> float:
-    """Returns the distance between two coordinates, in meters, using a geodesic model."""
-    result = geodesic_wgs84.Inverse(a[0], a[1], b[0], b[1])
-    distance_meters = result["s12"]
-    return distance_meters
+
+def measure_segments(
+    unmeasured: list[tuple[int, int, int, int, dict]],
+    positions: Mapping[int, Coordinates],
+    exact_lengths=False,
+) -> list[WaySegment]:
+    """Adds lengths to (node A ID, node B ID, way ID, tags key, tags) segments
+
+    - Lengths are calculated all at once with `segment_lengths()`,
+      unless `exact_lengths` is true, in which case each one is calculated with `distance_between_points()`
+    """
+    if not unmeasured:
+        return []
+    if exact_lengths:
+        lengths = [
+            distance_between_points(positions[node_from], positions[node_to])
+            for node_from, node_to, *_ in unmeasured
+        ]
+    else:
+        coordinates = numpy.array(
+            [
+                positions[node_from] + positions[node_to]
+                for node_from, node_to, *_ in unmeasured
+            ],
+            dtype=numpy.float64,
+        ).reshape(-1, 4)
+        lengths = segment_lengths(
+            coordinates[:, 0], coordinates[:, 1], coordinates[:, 2], coordinates[:, 3]
+        ).tolist()
+    return [
+        (node_from, node_to, way_id, tags_key, tags, length)
+        for (node_from, node_to, way_id, tags_key, tags), length in zip(
+            unmeasured, lengths
+        )
+    ]
 
 
 class RoutingGraph:
     def __init__(self, graph: networkx.Graph):
         self.osm_data = None  # TODO
         self._graph = graph
+        self.spatial_index: SpatialIndex | None = None
+        self.weight_cache = EdgeWeightCache()
+        self.tag_sets = TagSetInterner()
+        # Preprocessed contraction hierarchies, keyed by routing options fingerprint
+        self.contraction_hierarchies: dict[Hashable, ContractionHierarchy] = {}
+        # Landmark distance tables for the ALT heuristic, keyed by routing options fingerprint
+        self.landmarks: dict[Hashable, Landmarks] = {}
+        # Maps way IDs to the edges that they're made of, in order along the way
+        self.way_edges: dict[int, list[tuple[int, int]]] = {}
+        # Problems with tag values, found as ways and nodes are added
+        self.tag_report = TagValidationReport()
+        # The routing-relevant tags of every edge as categorical columns, from `build_tag_columns()`,
+        # with the edges in the order of `tag_column_edges`
+        self.tag_columns: TagColumns | None = None
+        self.tag_column_edges: list[tuple[int, int]] = []
+        for node_a, node_b, data in graph.edges(data=True):
+            way_id = data.get("id")
+            if way_id is None:
+                continue
+            if way_id not in self.way_edges:
+                self.tag_report.check_way(way_id, data["tags_key"], data["tags"])
+            self.way_edges.setdefault(way_id, []).append((node_a, node_b))
+        for node_id, tags in graph.nodes.data("tags"):  # type: ignore
+            if tags is not None:
+                self.tag_report.check_node(node_id, tags)
 
-    def get_edges_from_way(self, target_way_id: int) -> list[tuple[int, int]]:
+    def nodes(self) -> Iterable[int]:
+        return self._graph.nodes
+
+    def add_ways(
+        self, ways: list[OSMWay], raw_nodes: dict[int, dict], exact_lengths=False
+    ):
+        """Adds more ways (and their nodes) to the graph, e.g. when another area has been downloaded"""
+        self.add_segments(
+            way_segments(ways, self.tag_sets, exact_lengths),
+            positions={
+                node_id: (node["lat"], node["lon"])
+                for node_id, node in raw_nodes.items()
+            },
+            node_tags={
+                node_id: node["tags"]
+                for node_id, node in raw_nodes.items()
+                if "tags" in node
+            },
+        )
+
+    def add_segments(
+        self,
+        segments: list[WaySegment],
+        positions: Mapping[int, Coordinates],
+        node_tags: Mapping[int, dict],
+    ):
+        """Adds edges to the graph, keeping everything that's derived from the graph consistent with it
+
+        - The tags keys in `segments` must come from this graph's `tag_sets`
+        - `positions` must include every node in `segments`, and `node_tags` has the tags of those that have tags
+        - New nodes are added to the spatial index (if there is one), and new edges to the way ID index
+        - The tags of new ways and nodes are checked, adding any problems to `tag_report`
+        - Cached weights are forgotten for any edges that get replaced
+        - Contraction hierarchies, landmark tables and tag columns are thrown away, because they only cover the old edges
+        """
+        graph = self._graph
+        new_nodes = []
+        replaced_edges = []
+        for node_from, node_to, way_id, tags_key, tags, length in segments:
+            for node_id in (node_from, node_to):
+                if node_id not in graph:
+                    graph.add_node(node_id)
+                    new_nodes.append(node_id)
+            if graph.has_edge(node_from, node_to):
+                # :ohno:
+                print(f"Duplicate edge between {node_from} and {node_to}")
+                replaced_edges.append((node_from, node_to))
+                self._forget_way_edge(
+                    graph.edges[node_from, node_to]["id"], node_from, node_to
+                )
+            if way_id not in self.way_edges:
+                self.tag_report.check_way(way_id, tags_key, tags)
+            self.way_edges.setdefault(way_id, []).append((node_from, node_to))
+            graph.add_edge(
+                node_from,
+                node_to,
+                tags=tags,
+                tags_key=tags_key,
+                id=way_id,
+                length=length,
+            )
+        for node_id in new_nodes:
+            pos = positions[node_id]
+            graph.nodes[node_id]["pos"] = pos
+            tags = node_tags.get(node_id)
+            if tags is not None:
+                graph.nodes[node_id]["tags"] = tags
+                self.tag_report.check_node(node_id, tags)
+            if self.spatial_index is not None:
+                self.spatial_index.insert(node_id, pos)
+        self.weight_cache.forget_edges(replaced_edges)
+        if segments:
+            self.contraction_hierarchies.clear()
+            self.landmarks.clear()
+            self.tag_columns = None
+            self.tag_column_edges = []
+
+    def _forget_way_edge(self, way_id: int, node_a: int, node_b: int):
+        edges = self.way_edges.get(way_id)
+        if edges is None:
+            return
+        for edge in ((node_a, node_b), (node_b, node_a)):
+            if edge in edges:
+                edges.remove(edge)
+        if not edges:
+            del self.way_edges[way_id]
+
+    def build_tag_columns(self, keys: list[str]) -> TagColumns:
+        """Stores the values of the given tag keys as one column per key (see `TagColumns`)
+
+        - The columns are in the order of the edges in `tag_column_edges`, which this also sets
+        - The edges are found way by way (from `way_edges`), since every edge of a way has the same tags
+        """
         edges = []
-        for node_a, node_b, way_id in self._graph.edges.data("id", default=0):  # type: ignore
-            if way_id == target_way_id:
-                edges.append((node_a, node_b))
-        return edges
+        edge_tags_keys = []
+        for way_edges in self.way_edges.values():
+            edges.extend(way_edges)
+            edge_tags_keys.extend(
+                [self._graph.edges[way_edges[0]]["tags_key"]] * len(way_edges)
+            )
+        self.tag_column_edges = edges
+        self.tag_columns = TagColumns.from_tag_sets(
+            self.tag_sets.tag_sets, numpy.array(edge_tags_keys, numpy.int32), keys
+        )
+        return self.tag_columns
+
+    def to_compact(self) -> CompactRoutingGraph:
+        """Returns a copy of the graph as a `CompactRoutingGraph`, which uses the same tag set keys"""
+        return CompactRoutingGraph.from_edges(
+            (
+                (node_a, node_b, data["id"], data["tags_key"], data["length"])
+                for node_a, node_b, data in self._graph.edges(data=True)
+            ),
+            positions=dict(self._graph.nodes.data("pos")),  # type: ignore
+            node_tags={
+                node_id: tags
+                for node_id, tags in self._graph.nodes.data("tags")  # type: ignore
+                if tags is not None
+            },
+            tag_sets=self.tag_sets,
+            tag_report=self.tag_report,
+        )
+
+    def save_snapshot(self, path: str):
+        """Saves the graph to a binary snapshot file, which can be loaded with `CompactRoutingGraph.load_snapshot()`
+
+        - Loading a snapshot is much quicker than building a graph, because the file is used without parsing it
+        - Snapshots always load as a `CompactRoutingGraph`, because that's what lets us use the file's arrays directly
+        """
+        self.to_compact().save_snapshot(path)
+
+    def build_spatial_index(self):
+        """Indexes every node's position, so that nearest node lookups don't have to check every node"""
+        self.spatial_index = SpatialIndex()
+        for node_id in self._graph.nodes:
+            self.spatial_index.insert(node_id, self.node_position(node_id))
+
+    def get_edges_from_way(self, target_way_id: int) -> list[tuple[int, int]]:
+        """Returns the (node A, node B) edges that make up a way, in order along the way"""
+        return list(self.way_edges.get(target_way_id, ()))
+
+    def get_ways_from_node(self, node_id: int) -> list[int]:
+        """Returns the IDs of the ways that a node is part of"""
+        return list(
+            dict.fromkeys(data["id"] for data in self._graph.adj[node_id].values())
+        )
 
     def nearest_node(self, coordinates: Coordinates) -> int:
+        if self.spatial_index is not None:
+            return self.k_nearest_nodes(coordinates, 1)[0]
         nearest_node = None
         nearest_distance = float("inf")
         for node_id in self._graph.nodes():
@@ -53,10 +314,20 @@ class RoutingGraph:
             raise ValueError("No nodes could be found")
         return nearest_node
 
-    def get_edge_between_nodes(self, node_a: int, node_b: int) -> dict:
+    def k_nearest_nodes(self, coordinates: Coordinates, k: int) -> list[int]:
+        """Returns the IDs of the `k` nodes closest to the provided coordinates, nearest first"""
+        if self.spatial_index is None:
+            self.build_spatial_index()
+        assert self.spatial_index is not None
+        nearest = self.spatial_index.nearest(coordinates, k, self.node_position)
+        if not nearest:
+            raise ValueError("No nodes could be found")
+        return nearest
+
+    def get_edge_between_nodes(self, node_a: int, node_b: int) -> OSMWayData:
         # Here we're assuming that there aren't any ways (therefore edges) that share the same two consecutive nodes!
         # This won't always be the case, but I'm not sure how to handle that edge case...
-        return self._graph.edges[node_a, node_b]
+        return self._graph.edges[node_a, node_b]  # type: ignore
 
     def node(self, node_id: int) -> dict:
         return self._graph.nodes[node_id]
@@ -64,7 +335,32 @@ class RoutingGraph:
     def node_position(self, node_id: int) -> Coordinates:
         return self._graph.nodes[node_id]["pos"]
 
+    def neighbours(self, node_id: int) -> Iterable[tuple[int, OSMWayData]]:
+        """Returns (neighbour node ID, edge data) pairs for every edge of a node"""
+        return self._graph.adj[node_id].items()  # type: ignore
+
+    def astar_path(
+        self,
+        start: int,
+        end: int,
+        heuristic: Callable[[int, int], float],
+        weight: Callable[[int, int, dict], float],
+    ) -> list[int]:
+        """Returns the node IDs along the lowest-weight path between two nodes, using NetworkX's A* implementation"""
+        return networkx.astar_path(
+            self._graph,
+            start,
+            end,
+            heuristic=heuristic,
+            weight=weight,  # type: ignore
+        )
+
 
+type SearchMode = (
+    Literal["astar"] | Literal["bidirectional_astar"] | Literal["contraction_hierarchy"]
+)
+type HeuristicMode = Literal["distance"] | Literal["landmarks"]
+type IsochroneBudget = Literal["time"] | Literal["weight"]
 type AvoidPreferNeutral = Literal[-1] | Literal[0] | Literal[1]
 type RoutingOptionValue = AvoidPreferNeutral | bool
 
@@ -81,6 +377,14 @@ class RoutingOptions:
                 raise ValueError(f"Invalid option value: {key}={value}")
         self.options: dict[str, RoutingOptionValue] = options
 
+    def fingerprint(self) -> Hashable:
+        """Returns a hashable value that is equal for any two sets of identical options"""
+        # Include the type, because True == 1 but they mean different things here
+        return tuple(
+            (key, type(value).__name__, value)
+            for key, value in sorted(self.options.items())
+        )
+
     def get_tri_state(self, key: str) -> AvoidPreferNeutral:
         value = self.options[key]
         if isinstance(value, bool):
@@ -112,564 +416,272 @@ class RoutingOptions:
 
 
 class RouteCalculator:
-    def __init__(self, graph: RoutingGraph, options: RoutingOptions):
+    def __init__(
+        self,
+        graph: RoutingGraph | CompactRoutingGraph,
+        options: RoutingOptions,
+        search_mode: SearchMode = "astar",
+        heuristic: HeuristicMode = "distance",
+        stats_hook: Callable[[dict], None] | None = None,
+        debug_weights: bool = False,
+        profile: dict | None = None,
+    ):
         self.graph = graph
         self.options = options
-        # Stores way weights as they are calculated, for debugging only
-        self.way_weights = {}
-        self.segment_weights = {}
+        # How ways and nodes are weighed (see `routing_profile`), compiled once for these options
+        self.profile = CompiledProfile(profile or DEFAULT_PROFILE, options)
+        # Identifies the options and profile, for the caches that are shared between calculators on this graph
+        self.fingerprint: Hashable = (
+            options.fingerprint()
+            if profile is None
+            else (options.fingerprint(), profile_fingerprint(profile))
+        )
+        # The way tags that the profile reads, which the graph's tag columns need to have for bulk weighing
+        self.way_tag_keys = (
+            DEFAULT_WAY_TAG_KEYS if profile is None else profile_way_tag_keys(profile)
+        )
+        # "astar" searches from the start only, "bidirectional_astar" searches from both ends at once,
+        # and "contraction_hierarchy" uses (and builds, if needed) the graph's hierarchy for these options
+        self.search_mode: SearchMode = search_mode
+        # "distance" assumes a minimum weight per meter, "landmarks" uses the graph's landmark tables
+        # for these options (building them if needed), which is much tighter and always admissible
+        self.heuristic_mode: HeuristicMode = heuristic
+        # Instrumentation for the most recent route (see `calculate_route_a_star()`)
+        self.search_stats: dict[str, float | str | bool] = {}
+        # If provided, called with the stats of every route, e.g. to log them
+        self.stats_hook = stats_hook
+        self.weight_calls = 0
+        self.weight_cache_hits = 0
+        # Way weights only depend on the tags, so we calculate them once per distinct tag set
+        self.way_weights_by_tag_set: dict[int, float] = {}
+        self.tag_set_hits = 0
+        self.tag_set_misses = 0
+        # The weight of every half-edge, for searches on compact graphs (see `search_weight_column()`)
+        self._search_weight_column: array | None = None
+        # If `debug_weights` is true, records the weight of every edge that searches weigh, for debugging only.
+        # This slows searches down, so to show the weights along a route, use `route_segment_weights()` instead.
+        self.debug_weights = DebugWeightRecorder() if debug_weights else None
+
+    @property
+    def edge_weights(self) -> dict[tuple[int, int], tuple[float, float]]:
+        """The edge weight cache for our options and profile, which is shared by every calculator on this graph
+
+        - This is looked up each time rather than kept, so that once the graph's `weight_cache` forgets it,
+          its memory is freed even while this calculator is still around
+        """
+        return self.graph.weight_cache.profile(self.fingerprint)
+
+    def way_weights(self) -> dict[int, dict[str, float]]:
+        """Returns the weights of the ways that searches have weighed (only if `debug_weights` is on)"""
+        if self.debug_weights is None:
+            return {}
+        return self.debug_weights.way_weights()
+
+    def segment_weights(self) -> list[dict]:
+        """Returns the weights of every edge that searches have weighed (only if `debug_weights` is on)"""
+        if self.debug_weights is None:
+            return []
+        return self.debug_weights.segment_weights(self.graph.node_position)
+
+    def route_segment_weights(self, route: RouteResult) -> list[dict]:
+        """Returns the weight of each edge along a route, in the same format as `segment_weights()`
+
+        - Works whether or not `debug_weights` is on, and only looks at the route's edges
+        """
+        segment_weights = []
+        for node_a, node_b in zip(route.nodes, route.nodes[1:]):
+            way_data = self.graph.get_edge_between_nodes(node_a, node_b)
+            way_weight, _ = self.edge_weights.get((node_a, node_b)) or self.weigh_edge(
+                node_a, node_b, way_data
+            )
+            segment_weights.append(
+                {
+                    "pos_a": self.graph.node_position(node_a),
+                    "pos_b": self.graph.node_position(node_b),
+                    "weight": way_weight,
+                    "total_weight": way_weight * way_data["length"],
+                }
+            )
+        return segment_weights
 
     def way_weights_js(self):
         try:
             from pyodide.ffi import to_js  # type: ignore
         except ImportError as error:
             raise ImportError("Must be running under Pyodide") from error
-        return to_js(self.way_weights)
+        return to_js(self.way_weights())
 
     def segment_weights_js(self):
         try:
             from pyodide.ffi import to_js  # type: ignore
         except ImportError as error:
             raise ImportError("Must be running under Pyodide") from error
-        return to_js(list(self.segment_weights.values()))
-
-    def add_implicit_tags(self, way: dict):
-        if way.get("highway") == "motorway" or way.get("highway") == "motorway_link":
-            way.setdefault("foot", "no")
-        if way.get("service") == "driveway":
-            way.setdefault("access", "private")
-        if way.get("service") == "parking_aisle":
-            # assumes access=yes if access=* isn't present
-            if (not way.get("access")) or way.get("access") == "yes":
-                way.setdefault("foot", "yes")
-        if way.get("service") == "emergency_access":
-            way.setdefault("access", "no")
-        if way.get("service") == "bus":
-            way.setdefault("foot", "no")
-
-    def access_is_legal(self, tags: dict) -> bool:
-        """Checks if the provided node or way is legal to be walked on
-
-        - Uses access tags and the routing options to determine if access should be allowed
-        - Only considers pedestrian access
-        - Returns `True` if legal access is allowed, or `False` if access shouldn't be allowed
-        - Assumes `True` if access tags aren't present
-        """
-        access = tags.get("foot") or tags.get("access")
-        if access == "no":
-            return False
-        if access == "private" and not self.options.true("allow_private_access"):
-            return False
-        if access in ["customers", "permit"] and not self.options.true(
-            "allow_customer_access"
-        ):
-            return False
-        if access in ["agricultural", "forestry", "delivery", "military"]:
-            return False
-        return True
-
-    def base_weight_road(self, way: dict) -> float | None:
-        # In the future we might want consider additional factors in this method,
-        # hence the logic where we start with a weight of 1 and multiply it.
-        weight = 1
-        match way.get("highway"):
-            case "motorway" | "motorway_link":
-                weight *= 50_000
-            case "trunk" | "trunk_link":
-                weight *= 10_000
-            case "primary" | "primary_link":
-                weight *= 20
-            case "secondary" | "secondary_link":
-                weight *= 15
-            case "tertiary" | "tertiary_link":
-                weight *= 5 if self.options.true("allow_higher_traffic_roads") else 10
-            case "unclassified":
-                weight *= 4 if self.options.true("allow_higher_traffic_roads") else 6
-            case "residential":
-                weight *= 3
-            case "living_street":
-                weight *= 1.5
-            case "service":
-                match way.get("service"):
-                    case "driveway":
-                        weight *= 1
-                    case "parking_aisle" | "parking":
-                        weight *= 2
-                    case "alley":
-                        weight *= 1.3
-                    case "drive_through":
-                        weight *= 5
-                    case "slipway":
-                        weight *= 7
-                    case "layby":
-                        weight *= 1.75
-                    case _:
-                        weight *= 2
-            case _:
-                return None
-        if self.options.false("allow_walking_on_roads"):
-            weight *= 60
-        return weight
-
-    def additional_weight_road(self, way: dict) -> float:
-        factor = 1
-        if way.get("lanes"):
-            try:
-                lanes = int(way["lanes"])
-                if lanes >= 2:
-                    factor *= 2
-            except ValueError:
-                warn(f"Couldn't parse lanes={way['lanes']}")
-        if truthy_tag(way, "shoulder"):
-            factor *= 0.9
-        if truthy_tag(way, "verge"):
-            factor *= 0.95
-        return factor
-
-    def weight_path(self, way: dict) -> float | None:
-        path_highway_values = [
-            "footway",
-            "bridleway",
-            "steps",
-            "corridor",
-            "path",
-            "cycleway",
-            "track",
-            "pedestrian",
-        ]
-        if way.get("highway") not in path_highway_values:
-            return None
-        weight = 1
-        if way.get("highway") == "cycleway":
-            mixed_use: bool = (
-                way.get("segregated") in ["yes", "no"]
-                or way.get("foot") == "designated"
-            )
-            if not mixed_use:
-                # Mainly intended for cyclists
-                weight *= 1.5
-
-        # We will update this if we have decided to assume that a path is
-        # inaccessible to wheelchairs (-1) or suitable for wheelchairs (1)
-        wheelchair_suitable = 0
-        if way.get("highway") == "steps":
-            wheelchair_suitable = -1
-            # TODO
-            pass
-        # We might guess the value of trail_visibility=*
-        trail_visibility_default = None
-        # Our guess for if a path is "officially" maintained or not
-        maintained = 0
-        if way.get("highway") in ["footway", "cycleway", "pedestrian"]:
-            maintained = 1
-            wheelchair_suitable = 1
-        if way.get("designation"):
-            maintained = 1
-        if way.get("operator"):
-            maintained = 1
-        if way.get("informal") == "yes":
-            maintained = -1
-            weight *= 1 - self.options.get_tri_state("desire_paths") * 0.5
-        if maintained == 1:
-            trail_visibility_default = "excellent"
-            weight *= 1 - self.options.get_tri_state("maintained_paths") * 0.5
-        if maintained == -1:
-            weight *= 1.05
-        # Parse sac_scale=*
-        sac_scale = way.get("sac_scale")
-        match sac_scale:
-            case "strolling":
-                weight *= 0.9
-                wheelchair_suitable = 1
-            case "hiking":
-                weight *= 1
-            case "mountain_hiking":
-                weight *= 2.5
-                wheelchair_suitable = -1
-            case "demanding_mountain_hiking":
-                wheelchair_suitable = -1
-                if self.options.positive("treacherous_paths"):
-                    # You maniac
-                    weight *= 0.99
-                elif self.options.negative("treacherous_paths"):
-                    weight *= 10
-                else:
-                    weight *= 3
-            case "alpine_hiking":
-                wheelchair_suitable = -1
-                if self.options.positive("treacherous_paths"):
-                    weight *= 20
-                elif self.options.negative("treacherous_paths"):
-                    weight *= 1000
-                else:
-                    weight *= 30
-            case "demanding_alpine_hiking" | "difficult_alpine_hiking":
-                wheelchair_suitable = -1
-                weight = inf
-            case None:
-                pass
-            case _:
-                warn(f"Ignoring unknown value sac_scale={sac_scale}")
-        # Parse trail_visibility=*
-        trail_visibility = way.get("trail_visibility", trail_visibility_default)
-        match trail_visibility:
-            case "excellent":
-                weight *= 0.9
-            case "good":
-                weight *= 1.02
-            case "intermediate" | "bad" | "horrible" | "no":
-                weight *= 1.05
-                # TODO: Warn the user that this section of the route has poor trail visibility
-            case None:
-                pass
-            case _:
-                warn(f"Ignoring unknown value trail_visibility={trail_visibility}")
-        # Parse trailblazed=*
-        trailblazed = way.get("trailblazed")
-        if trailblazed is not None and trailblazed != "no":
-            weight *= 0.91
-        # Parse width=*
-        width = way_width_meters(way)
-        if width is not None:
-            if width < 0.20:
-                # 20cm gap is probably impassable!
-                weight = inf
-            elif width > 5:
-                weight *= 0.9
-            elif width > 2:
-                weight *= 0.975
-        # Parse designation=*
-        designation = way.get("designation")
-        match designation:
-            case "public_footpath" | "public_bridleway" | "restricted_byway":
-                weight *= 0.9
-            case "byway_open_to_all_traffic":
-                weight *= 0.95
-            case "public_right_of_way":
-                weight *= 0.91
-            case "core_path":
-                # Scotland!
-                weight *= 0.9
-        public_rights_of_way = [
-            "public_footpath",
-            "public_bridleway",
-            "restricted_byway",
-            "byway_open_to_all_traffic",
-            "public_right_of_way",
-            "core_path",
-        ]
-        if designation in public_rights_of_way:
-            weight *= 1 - self.options.get_tri_state("rights_of_way") * 0.3
-        # Parse segregated=*
-        segregated = way.get("segregated")
-        match segregated:
-            case "yes":
-                weight *= 0.98
-            case "no":
-                weight *= 1.02
-        # Handle obstacles along the path
-        obstacle = way.get("obstacle")
-        match obstacle:
-            case "vegetation":
-                weight *= 1.10
-        # Handle any pavement preference
-        if way.get("footway") == "sidewalk":
-            weight *= 1 - self.options.get_tri_state("pavements") * 0.4
-        # Add penalty for wheelchair users if the path is inaccessible
-        wheelchair = way.get("wheelchair", "yes" if wheelchair_suitable == 1 else "no")
-        if self.options.true("wheelchair_accessible"):
-            match wheelchair:
-                case "yes":
-                    weight *= 0.9
-                case "no":
-                    weight *= 100
-                case "limited":
-                    weight *= 0.96
-                case "designated":
-                    weight *= 0.89
-        return weight
+        return to_js(self.segment_weights())
 
-    def additional_weight_ford(self, way: dict) -> float:
-        factor = 1
-        match way.get("ford"):
-            case "yes":
-                factor *= 3
-            case "stepping_stones":
-                factor *= 2.5
-        return factor
-
-    def additional_weight_general(self, way: dict) -> float:
-        factor = 1
-        surface = way.get("surface")
-        assumed_smoothness = None
-        if surface in ["asphalt", "chipseal"]:
-            assumed_smoothness = "good"
-        nice_paved_surfaces = [
-            "asphalt",
-            "chipseal",
-            "paving_stones:lanes",
-            "paving_stones",
-            "bricks",
-            "concrete:plates",
-            "concrete:lanes",
-            "concrete",
-        ]
-        paved_surfaces = [
-            "grass_paver",
-            "sett",
-            "unhewn_cobblestone",
-            "metal",
-            "metal_grid",
-            "wood",
-            "rubber",
-            "tiles",
-            "paved",
-            "cobblestone",
-            "cobblestone:flattened",
-        ]
-        nice_unpaved_surfaces = [
-            "compacted",
-            "fine_gravel",
-            "gravel",
-            "shells",
-            "rock",
-            "pebblestone",
-            "woodchips",
-        ]
-        bare_ground_surfaces = ["dirt", "grass", "sand", "snow", "earth"]
-        muddy_surfaces = ["mud"]
-        if surface in nice_paved_surfaces:
-            factor *= 1 - self.options.get_tri_state("paved_paths") * 0.5
-            factor *= 0.95
-        elif surface in paved_surfaces:
-            factor *= 1 - self.options.get_tri_state("paved_paths") * 0.5
-            factor *= 1.1 if self.options.true("wheelchair_accessible") else 0.95
-        elif surface in nice_unpaved_surfaces:
-            factor *= 1 - self.options.get_tri_state("unpaved_paths") * 0.5
-            factor *= 0.99
-        elif surface in bare_ground_surfaces:
-            factor *= 1 - self.options.get_tri_state("unpaved_paths") * 0.5
-            factor *= 1.05
-        elif surface in muddy_surfaces:
-            factor *= 1 - self.options.get_tri_state("unpaved_paths") * 0.5
-            factor *= 4
-        match way.get("smoothness", assumed_smoothness):
-            case "excellent" | "good" | "intermediate":
-                factor *= 0.95
-            case "very_bad" | "horrible" | "very_horrible":
-                factor *= 1.9
-            case "impassable":
-                is_okay = way.get("sac_scale") in ["strolling", "hiking"]
-                factor *= 2 if is_okay else 5
-        gradient = way_incline_gradient(way)
-        if gradient is not None:
-            if gradient != 0:
-                factor *= 1.1
-            if isinstance(gradient, int) and abs(gradient) > 0.025:
-                # 2.5% as the maximum suitable incline for wheelchair users
-                if self.options.true("wheelchair_accessible"):
-                    factor *= 3
-        factor *= self.additional_weight_ford(way)
-        match way.get("lit"):
-            case "yes" | "24/7" | "automatic" | "limited":
-                lit = True
-            case "no" | "disused":
-                lit = False
-            case _:
-                lit = None
-        if lit is True:
-            factor *= 1 - self.options.get_tri_state("lit_paths") * 0.3
-        indoors = (
-            way.get("indoor") in ["yes", "corridor"] or way.get("highway") == "corridor"
-        )
-        if indoors:
-            factor *= 1 - self.options.get_tri_state("indoor_paths") * 0.5
-        covered = (
-            truthy_tag(way, "covered")
-            or truthy_tag(way, "tunnel")
-            or truthy_tag(way, "shelter")
-            or indoors
-        )
-        if covered:
-            factor *= 1 - self.options.get_tri_state("covered_paths") * 0.4
-        return factor
+    def route_segment_weights_js(self, route: RouteResult):
+        try:
+            from pyodide.ffi import to_js  # type: ignore
+        except ImportError as error:
+            raise ImportError("Must be running under Pyodide") from error
+        return to_js(self.route_segment_weights(route))
 
     def calculate_way_weight(self, way: dict) -> float:
-        # Handle access tags
-        if not self.access_is_legal(way):
-            return inf
-
-        # First, try parsing the way data as a road
-        base_weight_as_road = self.base_weight_road(way)
-        if base_weight_as_road is not None:
-            has_sidewalk = way_has_sidewalk(way)
-            sidewalk_guessed = False
-            if has_sidewalk is None:
-                # Sidewalk tags not present, so guess based off of road type
-                has_sidewalk = way.get("highway") in [
-                    "trunk",
-                    "primary",
-                    "secondary",
-                    "tertiary",
-                    "residential",
-                    "unclassified",
-                ]
-                sidewalk_guessed = True
-            if has_sidewalk == "no":
-                # We're walking on the road carriageway
-                if way.get("foot") == "use_sidepath":
-                    # Never route along a carriageway if it's forbidden to do so
-                    return inf
-                additional_factors = self.additional_weight_road(way)
-                return (
-                    base_weight_as_road
-                    * additional_factors
-                    * self.additional_weight_general(way)
-                )
-            pavement_weight = (
-                self.weight_path(
-                    {
-                        "highway": "footway",
-                        "footway": "sidewalk",
-                        "surface": "asphalt",
-                    }
-                )
-                if not sidewalk_guessed
-                # Deprioritize ways where we're just assuming a sidewalk is present
-                else 1.2
-            )
-            if pavement_weight is None:
-                warn("Failed to calculate pavement weight (this is a bug)")
-                pavement_weight = 1
-            # Improve or worsen the weight for walking along a pavement according to the road's maxspeed
-            maxspeed_value = way_maxspeed_mph(way)
-            if maxspeed_value and maxspeed_value >= 60:
-                pavement_weight *= 1.1
-            return pavement_weight
-
-        # If it's not a road, try parsing as a path
-        weight_as_path = self.weight_path(way)
-        if weight_as_path is not None:
-            return weight_as_path * self.additional_weight_general(way)
-        if way.get("highway") == "road":
-            warn("Encountered highway=road way")
-            return 1
-
-        # If it doesn't match any of the above, consider it unroutable
-        return inf
-
-    def calculate_crossing_weight(self, node: dict) -> float:
-        # Crossing types
-        crossing = node.get("crossing")
-        crossing_ref = node.get("crossing_ref")
-        weight = 2.5
-        if crossing == "no":
-            weight = inf
-        if crossing == "zebra" or crossing_ref == "zebra":
-            weight = 1.2
-        if crossing == "traffic_signals":
-            weight = 1
-        if crossing == "uncontrolled" or crossing == "unmarked":
-            weight = 2
-        if crossing == "informal":
-            weight = 4
-        if crossing:
-            warn(f"Ignoring unknown crossing tag: crossing={crossing}")
-        # User's preference for crossing types
-        marked_crossing = (
-            crossing in ["zebra", "traffic_signals"]
-            or crossing_ref == "zebra"
-            or truthy_tag(node, "crossing:markings")
-        )
-        if self.options.true("prefer_marked_crossings"):
-            if not marked_crossing:
-                weight *= 3
-        traffic_light_crossing = crossing == "traffic_signals" or truthy_tag(
-            node, "traffic_signals"
-        )
-        if self.options.true("prefer_traffic_light_crossings"):
-            if not traffic_light_crossing:
-                weight *= 2.5
-
-        # Additional crossing tags
-        raised_crossing = node.get("traffic_calming") == "table"
-        if raised_crossing:
-            weight *= 0.75
-        elif node.get("crossing:continuous") == "yes":
-            weight *= 0.5
-        if node.get("crossing:island") == "yes":
-            weight *= 0.7
-        if self.options.true("prefer_audible_crossings"):
-            if node.get("traffic_signals:sound") == "yes":
-                weight *= 0.6
-            elif node.get("traffic_signals:sound") == "no":
-                weight *= 4
-        kerb = node.get("kerb")
-        tactile_paving = node.get("tactile_paving")
-        if self.options.true("wheelchair_accessible") or self.options.true(
-            "prefer_dipped_kerbs"
-        ):
-            if kerb == "lowered" or raised_crossing:
-                weight *= 0.8
-            elif kerb == "flush":
-                weight *= 0.75
-        if self.options.true("prefer_tactile_paving"):
-            if kerb == "flush" and tactile_paving == "no":
-                weight *= 10
-        # TODO parse tactile_paving
-        return weight
+        return self.profile.way_weight(way)
 
     def calculate_node_weight(self, node_id: int) -> float:
         node = self.graph.node(node_id).get("tags")
         if not node:
             # Untagged node, so don't add any weight
             return 0
-        if not self.access_is_legal(node):
-            return inf
-        # Most barriers only block motor traffic, so we only consider those that generally block pedestrians.
-        # We assume (by default) that these barriers will be able to be opened by a pedestrian,
-        # unless tagged with locked=yes
-        if node.get("barrier") in ["gate", "sliding_gate", "wicket_gate"]:
-            if node.get("locked") == "yes":
-                return inf
-        # We assume that these barriers will be impassable to pedestrians
-        # unless explicitly tagged as open or unlocked
-        if node.get("barrier") in ["barrier_board"]:
-            explicitly_unlocked = node.get("locked") == "no" or node.get("open") in [
-                "yes",
-                "partial",
-            ]
-            if not explicitly_unlocked:
-                return inf
-        if node.get("highway") == "crossing":
-            return self.calculate_crossing_weight(node)
-        return 0
+        return self.profile.node_weight(node)
 
-    def calculate_weight(self, node_a: int, node_b: int, way_data: OSMWayData) -> float:
-        node_a_data = self.graph.node(node_a)
-        node_b_data = self.graph.node(node_b)
-        self.add_implicit_tags(way_data["tags"])
-        way_weight = self.calculate_way_weight(way_data["tags"])
+    def way_weight_for_tag_set(self, tags_key: int | None, tags: dict) -> float:
+        """Calculates the weight of a way, only doing the work once for each distinct set of tags
+
+        - `tags_key` should come from the graph's `TagSetInterner`, or be `None` if the tags weren't interned
+        """
+        if tags_key is None:
+            return self.calculate_way_weight(tags)
+        weight = self.way_weights_by_tag_set.get(tags_key)
+        if weight is not None:
+            self.tag_set_hits += 1
+            return weight
+        self.tag_set_misses += 1
+        weight = self.calculate_way_weight(tags)
+        self.way_weights_by_tag_set[tags_key] = weight
+        return weight
+
+    def tag_set_hit_rate(self) -> float:
+        """Returns the proportion of way weight lookups that were answered from the tag set cache"""
+        lookups = self.tag_set_hits + self.tag_set_misses
+        if lookups == 0:
+            return 0
+        return self.tag_set_hits / lookups
+
+    def weigh_edge(
+        self, node_a: int, node_b: int, way_data: OSMWayData
+    ) -> tuple[float, float]:
+        """Calculates an edge's (way weight per meter, node weight), and stores them in the edge weight cache"""
+        way_weight = self.way_weight_for_tag_set(
+            way_data.get("tags_key"), way_data["tags"]
+        )
         node_weight = self.calculate_node_weight(node_a)
-        if way_data["id"] in self.way_weights:
-            # A bit of a hack: assumes that this function is called exactly once for each section (edge) of the way
-            self.way_weights[way_data["id"]]["total_weight"] += (
-                way_weight * way_data["length"]
-            )
+        self.edge_weights[(node_a, node_b)] = (way_weight, node_weight)
+        return way_weight, node_weight
+
+    def calculate_weight(self, node_a: int, node_b: int, way_data: OSMWayData) -> float:
+        self.weight_calls += 1
+        cached_weights = self.edge_weights.get((node_a, node_b))
+        if cached_weights is None:
+            way_weight, node_weight = self.weigh_edge(node_a, node_b, way_data)
         else:
-            self.way_weights[way_data["id"]] = {
-                "weight": way_weight,
-                "total_weight": way_weight * way_data["length"],
-            }
-        self.segment_weights[(node_a, node_b)] = {
-            "pos_a": self.graph.node_position(node_a),
-            "pos_b": self.graph.node_position(node_b),
-            "weight": way_weight,
-            "total_weight": way_weight * way_data["length"],
-        }
+            self.weight_cache_hits += 1
+            way_weight, node_weight = cached_weights
+        if self.debug_weights is not None:
+            self.debug_weights.record(
+                node_a,
+                node_b,
+                way_data["id"],
+                way_weight,
+                way_weight * way_data["length"],
+            )
         return node_weight + way_weight * way_data["length"]
 
-    def estimate_time(self, way_data: dict) -> float:
+    def tag_columns(self) -> TagColumns:
+        """Returns the graph's tag columns, rebuilding them if they're missing or don't have every key we need"""
+        columns = self.graph.tag_columns
+        if columns is None:
+            return self.graph.build_tag_columns(self.way_tag_keys)
+        missing_keys = [key for key in self.way_tag_keys if key not in columns.codes]
+        if missing_keys:
+            return self.graph.build_tag_columns(columns.keys + missing_keys)
+        return columns
+
+    def way_weight_vector(self) -> numpy.ndarray:
+        """Calculates the way weight (per meter) of every edge at once, in the order of the graph's tag columns
+
+        - Each distinct combination of the tags that the profile reads is only weighed once, and the weights are
+          then spread over the edges with NumPy, so this is quick even for very large graphs
+        - Doesn't use (or fill in) the edge weight cache
+        """
+        return self.tag_columns().evaluate(self.profile.way_weight)
+
+    def weight_column(self) -> numpy.ndarray:
+        """Calculates the weight of every half-edge of a `CompactRoutingGraph` at once, e.g. for its `astar_path()`
+
+        - Gives the same weights as `graph.weight_column(calculator.calculate_weight)`, without weighing edges one by one
+        """
+        graph = self.graph
+        if not isinstance(graph, CompactRoutingGraph):
+            raise ValueError("Weight columns can only be calculated for compact graphs")
+        node_weights = numpy.zeros(graph.node_count())
+        for index, tags in graph.node_tags.items():
+            if tags:
+                node_weights[index] = self.profile.node_weight(tags)
+        edge_weights = self.way_weight_vector() * numpy.asarray(graph.edge_lengths)
+        half_edge_sources = numpy.repeat(
+            numpy.arange(graph.node_count()), numpy.diff(numpy.asarray(graph.offsets))
+        )
+        return (
+            node_weights[half_edge_sources]
+            + edge_weights[numpy.asarray(graph.half_edge_edges)]
+        )
+
+    def search_weight_column(self) -> array:
+        """Returns the weight of every half-edge of a compact graph, for searches on its node indexes
+
+        - Calculated with `weight_column()` the first time this calculator needs it, then kept on the calculator,
+          so it is freed along with the calculator (e.g. when a `CalculatorCache` forgets it)
+        """
+        if self._search_weight_column is None:
+            column = array("d")
+            column.frombytes(self.weight_column().tobytes())
+            self._search_weight_column = column
+        return self._search_weight_column
+
+    def compact_astar_path(
+        self,
+        graph: CompactRoutingGraph,
+        start_node: int,
+        end_node: int,
+        stats: dict[str, int],
+    ) -> list[int]:
+        """Finds the node IDs along the best path with A* on a compact graph's node indexes
+
+        - OSM IDs are only mapped to indexes (and back) at the ends, and edges aren't weighed one by one
+          (so `weight_calls` stays at 0), because the weights come from `search_weight_column()`
+        - The distance heuristic uses `chord_length()`, so ties between equally good paths might be
+          broken differently to the networkx search
+        """
+        node_ids = graph.node_ids
+        end_index = graph.index_of(end_node)
+        if self.heuristic_mode == "landmarks":
+            landmark_heuristic = self.landmarks().heuristic
+
+            def heuristic(index: int) -> float:
+                return landmark_heuristic(node_ids[index], end_node)
+
+        else:
+            lats = graph.lats
+            lons = graph.lons
+            end_position = earth_centred_position(lats[end_index], lons[end_index])
+
+            def heuristic(index: int) -> float:
+                # Like the distance heuristic in `calculate_route_a_star()`, but the straight-line
+                # distance is much quicker to calculate than the geodesic one, and never longer
+                position = earth_centred_position(lats[index], lons[index])
+                return chord_length(position, end_position) * 0.1
+
+        path = graph.astar_index_path(
+            graph.index_of(start_node),
+            end_index,
+            heuristic,
+            self.search_weight_column(),
+            stats,
+        )
+        return [node_ids[index] for index in path]
+
+    def estimate_time(self, way_data: OSMWayData) -> float:
         # Based on my average walking speed of 3.3 km/h
         # TODO this should be an option!
         BASE_SPEED = 0.92  # meters per second
@@ -680,10 +692,28 @@ class RouteCalculator:
     def calculate_route_a_star(
         self, start_pos: Coordinates, end_pos: Coordinates
     ) -> RouteResult:
+        """Finds the best route between two points, using the calculator's search mode
+
+        - The route's `stats` say how long each stage (snapping the points to nodes, searching, and building the
+          `RouteResult`) took in seconds, and how much work the search did. They're also stored in `search_stats`
+          and passed to `stats_hook`, even if no route could be found.
+        """
+        started = perf_counter()
+        weight_calls = self.weight_calls
+        weight_cache_hits = self.weight_cache_hits
+        tag_set_hits = self.tag_set_hits
+        tag_set_misses = self.tag_set_misses
+        stats: dict[str, float | str | bool] = {"search_mode": self.search_mode}
+        self.search_stats = stats
+        # How much work the search did (nodes settled and edges relaxed), which is added to `stats`
+        search_counts: dict[str, int] = {}
+
         start_node = self.graph.nearest_node(start_pos)
         end_node = self.graph.nearest_node(end_pos)
+        snapped = perf_counter()
+        stats["snap_time"] = snapped - started
 
-        def heuristic(node_from, node_to):
+        def distance_heuristic(node_from, node_to):
             direct_distance = distance_between_points(
                 self.graph.node_position(node_from),
                 self.graph.node_position(node_to),
@@ -693,22 +723,194 @@ class RouteCalculator:
             # This means that if a path goes the long way around but has weight density < 0.1, we might miss it
             return direct_distance * 0.1
 
+        if self.heuristic_mode == "landmarks":
+            heuristic = self.landmarks().heuristic
+        else:
+            heuristic = distance_heuristic
+
         # So that we're not passing class methods around as callbacks:
         def weight(node_from, node_to, data):
             return self.calculate_weight(node_from, node_to, data)
 
-        # Perform find the most optimal route using NetworkX's A* algorithm
-        nodes: list[int] = networkx.astar.astar_path(
-            self.graph._graph,
-            start_node,
-            end_node,
-            heuristic=heuristic,
-            weight=weight,  # type: ignore
-        )
+        def finish_stats():
+            stats.update(search_counts)
+            stats["nodes_expanded"] = search_counts.get(
+                "settled_forward", 0
+            ) + search_counts.get("settled_backward", 0)
+            stats["weight_calls"] = self.weight_calls - weight_calls
+            stats["weight_cache_hits"] = self.weight_cache_hits - weight_cache_hits
+            stats["tag_set_hits"] = self.tag_set_hits - tag_set_hits
+            stats["tag_set_misses"] = self.tag_set_misses - tag_set_misses
+            stats["total_time"] = perf_counter() - started
+            if self.stats_hook is not None:
+                self.stats_hook(stats)
+
+        # Perform find the most optimal route using the graph's A* implementation,
+        # or our bidirectional A* implementation
+        try:
+            if self.search_mode == "contraction_hierarchy":
+                nodes = self.contraction_hierarchy().shortest_path(
+                    start_node, end_node, search_counts
+                )
+            elif self.search_mode == "bidirectional_astar":
+                nodes = bidirectional_astar_path(
+                    self.graph, start_node, end_node, heuristic, weight, search_counts
+                )
+            elif (
+                isinstance(self.graph, CompactRoutingGraph)
+                and self.debug_weights is None
+            ):
+                nodes = self.compact_astar_path(
+                    self.graph, start_node, end_node, search_counts
+                )
+            else:
+                settled = set()
+                relaxed = 0
+
+                def weight_counting_settled(node_from, node_to, data):
+                    # A* weighs the edges of each node once, when it settles that node
+                    nonlocal relaxed
+                    settled.add(node_from)
+                    relaxed += 1
+                    return weight(node_from, node_to, data)
+
+                try:
+                    nodes = self.graph.astar_path(
+                        start_node, end_node, heuristic, weight_counting_settled
+                    )
+                finally:
+                    search_counts["settled_forward"] = len(settled)
+                    search_counts["edges_relaxed"] = relaxed
+        except networkx.NetworkXNoPath:
+            stats["search_time"] = perf_counter() - snapped
+            stats["route_found"] = False
+            finish_stats()
+            raise
+        searched = perf_counter()
+        stats["search_time"] = searched - snapped
+        stats["route_found"] = True
 
-        for node in nodes:
-            print(f"https://www.openstreetmap.org/node/{node}")
+        route = self.route_from_nodes(start_pos, end_pos, nodes)
+        stats["reconstruct_time"] = perf_counter() - searched
+        finish_stats()
+        route.stats = stats
+        return route
 
+    def calculate_matrix(
+        self, origins: list[Coordinates], destinations: list[Coordinates]
+    ) -> RouteMatrix:
+        """Calculates the best route between every origin and every destination, e.g. for planning
+
+        - Each point is snapped to its nearest node once, then there's one Dijkstra search per distinct origin node,
+          which stops once it has reached every destination
+        - Each edge's weight, length and time are only calculated once, however many searches use the edge
+        - Unlike `calculate_route_a_star()`, edges with infinite weight are treated as impassable
+        """
+        # Ensure the points are proper Python lists (because JS code may call this function)
+        if type(origins).__name__ == "JsProxy":
+            origins = origins.to_py()  # type: ignore
+        if type(destinations).__name__ == "JsProxy":
+            destinations = destinations.to_py()  # type: ignore
+        origin_nodes = [self.graph.nearest_node(pos) for pos in origins]
+        destination_nodes = [self.graph.nearest_node(pos) for pos in destinations]
+
+        edge_costs: dict[tuple[int, int], tuple[float, float, float]] = {}
+
+        def cost(node_from: int, node_to: int, data) -> tuple[float, float, float]:
+            edge_cost = edge_costs.get((node_from, node_to))
+            if edge_cost is None:
+                edge_cost = (
+                    self.calculate_weight(node_from, node_to, data),
+                    data["length"],
+                    self.estimate_time(data),
+                )
+                edge_costs[(node_from, node_to)] = edge_cost
+            return edge_cost
+
+        shape = (len(origins), len(destinations))
+        weights = numpy.full(shape, inf)
+        distances = numpy.full(shape, inf)
+        times = numpy.full(shape, inf)
+        rows_by_origin: dict[int, list[int]] = {}
+        for row, origin_node in enumerate(origin_nodes):
+            rows_by_origin.setdefault(origin_node, []).append(row)
+        for origin_node, rows in rows_by_origin.items():
+            results = one_to_many_dijkstra(
+                self.graph, origin_node, destination_nodes, cost, measure_count=2
+            )
+            for column, destination_node in enumerate(destination_nodes):
+                result = results.get(destination_node)
+                if result is not None:
+                    (
+                        weights[rows, column],
+                        distances[rows, column],
+                        times[rows, column],
+                    ) = result
+        return RouteMatrix(origins, destinations, weights, distances, times)
+
+    def calculate_isochrone(
+        self,
+        start_pos: Coordinates,
+        budget: float,
+        budget_type: IsochroneBudget = "time",
+    ) -> Isochrone:
+        """Finds every node that can be reached from a point within a budget, using one Dijkstra search
+
+        - With a `"time"` budget (in seconds), uses `estimate_time()` for the quickest path to each node.
+          Edges that `calculate_weight()` gives an infinite weight are still treated as impassable.
+        - With a `"weight"` budget, uses `calculate_weight()`, i.e. the same cost that routes are optimised for
+        - The search stops at the edge of the budget, so it only explores the reachable area
+        """
+        start_node = self.graph.nearest_node(start_pos)
+
+        if budget_type == "time":
+
+            def cost(node_from, node_to, data):
+                if self.calculate_weight(node_from, node_to, data) == inf:
+                    return inf
+                return self.estimate_time(data)
+
+        elif budget_type == "weight":
+
+            def cost(node_from, node_to, data):
+                return self.calculate_weight(node_from, node_to, data)
+
+        else:
+            raise ValueError(f"Unknown isochrone budget type: {budget_type}")
+
+        costs = dijkstra_distances(self.graph, start_node, cost, max_distance=budget)
+        hull = convex_hull(self.graph.node_position(node) for node in costs)
+        return Isochrone(start_pos, budget, budget_type, costs, hull)
+
+    def contraction_hierarchy(self) -> ContractionHierarchy:
+        """Returns the graph's contraction hierarchy for our routing options, building it if necessary
+
+        - Hierarchies loaded with `ContractionHierarchy.load()` can be added to `graph.contraction_hierarchies`
+        """
+        fingerprint = self.fingerprint
+        hierarchy = self.graph.contraction_hierarchies.get(fingerprint)
+        if hierarchy is None:
+            hierarchy = ContractionHierarchy.build(
+                self.graph, self.calculate_weight, fingerprint
+            )
+            self.graph.contraction_hierarchies[fingerprint] = hierarchy
+        return hierarchy
+
+    def landmarks(self) -> Landmarks:
+        """Returns the graph's landmark tables for our routing options, building them if necessary"""
+        fingerprint = self.fingerprint
+        landmarks = self.graph.landmarks.get(fingerprint)
+        if landmarks is None:
+            landmarks = Landmarks.build(self.graph, self.calculate_weight, fingerprint)
+            self.graph.landmarks[fingerprint] = landmarks
+        return landmarks
+
+    def route_from_nodes(
+        self, start_pos: Coordinates, end_pos: Coordinates, nodes: list[int]
+    ) -> RouteResult:
+        """Turns the list of nodes along a path into a `RouteResult`"""
+        start_node = nodes[0]
+        end_node = nodes[-1]
         # Reconstruct the route, to get a list of RouteParts
         parts: list[RoutePart] = []
         parts.append(StartWalking(self.graph.node_position(start_node)))
@@ -730,68 +932,351 @@ class RouteCalculator:
                 )
             )
         parts.append(Arrive(self.graph.node_position(end_node)))
-        return RouteResult(start_pos, end_pos, parts)
+        return RouteResult(start_pos, end_pos, parts, nodes=nodes)
+
+
+class CalculatorCache:
+    """Keeps the calculators for the last few combinations of options and search modes that were used on a graph
+
+    - Reusing calculators means their per-calculator caches (e.g. way weights by tag set) carry over between routes
+    - When more than `max_calculators` have been made, the least recently used one is forgotten
+    """
+
+    def __init__(
+        self, graph: RoutingGraph | CompactRoutingGraph, max_calculators: int = 8
+    ):
+        self.graph = graph
+        self.max_calculators = max_calculators
+        self._calculators: OrderedDict[Hashable, RouteCalculator] = OrderedDict()
+
+    def calculator(
+        self,
+        options: RoutingOptions,
+        search_mode: SearchMode = "astar",
+        heuristic: HeuristicMode = "distance",
+    ) -> RouteCalculator:
+        key = (options.fingerprint(), search_mode, heuristic)
+        calculator = self._calculators.get(key)
+        if calculator is not None:
+            self._calculators.move_to_end(key)
+            return calculator
+        calculator = RouteCalculator(self.graph, options, search_mode, heuristic)
+        self._calculators[key] = calculator
+        if len(self._calculators) > self.max_calculators:
+            self._calculators.popitem(last=False)
+        return calculator
+
+    def __len__(self):
+        return len(self._calculators)
+
+
+OVERPASS_API_URL = "https://overpass-api.de/api/interpreter"
+# The values of highway=* that we download and route along
+ROUTABLE_HIGHWAY_VALUES = [
+    "motorway",
+    "trunk",
+    "primary",
+    "secondary",
+    "tertiary",
+    "unclassified",
+    "residential",
+    "motorway_link",
+    "trunk_link",
+    "primary_link",
+    "secondary_link",
+    "tertiary_link",
+    "living_street",
+    "service",
+    "pedestrian",
+    "track",
+    "road",
+    "footway",
+    "bridleway",
+    "steps",
+    "corridor",
+    "path",
+    "emergency_bay",
+    "cycleway",
+]
 
 
 class RoutingEngine:
-    def __init__(self):
-        pass
+    def __init__(
+        self,
+        overpass_url: str = OVERPASS_API_URL,
+        cache: OverpassCache | None = None,
+    ):
+        self.overpass_url = overpass_url
+        # If provided, raw Overpass responses are stored here and reused
+        self.cache = cache
+        # The graph that `load_tiles()` keeps adding to, and what has been added to it so far
+        self.tiled_graph: RoutingGraph | None = None
+        self.loaded_tiles: set[Tile] = set()
+        self.loaded_way_ids: set[int] = set()
 
-    def download_osm_data(self, bbox: BoundingBox) -> tuple[list[OSMWay], dict]:
-        query = f"""
+    def overpass_query_template(self) -> str:
+        """Returns the Overpass QL query for routable ways, with `{bbox}` where the bounding box should go"""
+        highway_regex = "^(" + "|".join(ROUTABLE_HIGHWAY_VALUES) + ")$"
+        return f"""
         [out:json][timeout:300];
         (
-            way["highway"~"^(motorway|trunk|primary|secondary|tertiary|unclassified|residential|motorway_link|trunk_link|primary_link|secondary_link|tertiary_link|living_street|service|pedestrian|track|road|footway|bridleway|steps|corridor|path|emergency_bay|cycleway)$"]({bbox});
+            way["highway"~"{highway_regex}"]({{bbox}});
             node(w);
         );
         out geom;
         """
-        response = requests.get(
-            "https://overpass-api.de/api/interpreter", params={"data": query}
-        )
+
+    def fetch_overpass_response(self, bbox: BoundingBox) -> bytes:
+        """Returns the raw Overpass API response for the bounding box, from the cache if possible"""
+        query_template = self.overpass_query_template()
+        if self.cache is not None:
+            cached_response = self.cache.get(query_template, bbox)
+            if cached_response is not None:
+                return cached_response
+        query = query_template.replace("{bbox}", str(bbox))
+        response = requests.get(self.overpass_url, params={"data": query})
         response.raise_for_status()
-        response_json = response.json()
+        if self.cache is not None:
+            self.cache.put(query_template, bbox, response.content)
+        return response.content
 
+    def parse_overpass_json(self, response_json: dict) -> tuple[list[OSMWay], dict]:
+        """Converts an Overpass API JSON response into ways and (raw) nodes"""
         raw_nodes = {}
         ways = []
         for node in response_json["elements"]:
             if node["type"] != "node":
                 continue
+            if "tags" in node:
+                node["tags"] = intern_tags(node["tags"])
             raw_nodes[node["id"]] = node
+        # Nodes are often in more than one way, so we only make one OSMNode for each of them
+        osm_nodes: dict[int, OSMNode] = {}
         for way in response_json["elements"]:
             if way["type"] != "way":
                 continue
             nodes = []
             for node_id in way["nodes"]:
-                node: dict = raw_nodes[node_id]
-                tags = node.get("tags", {})
-                nodes.append(
-                    OSMNode(id=node_id, pos=(node["lat"], node["lon"]), tags=tags)
-                )
-            ways.append(OSMWay(id=way["id"], nodes=nodes, tags=way["tags"]))
+                osm_node = osm_nodes.get(node_id)
+                if osm_node is None:
+                    node: dict = raw_nodes[node_id]
+                    osm_node = OSMNode(
+                        id=node_id,
+                        pos=(node["lat"], node["lon"]),
+                        tags=node.get("tags", {}),
+                    )
+                    osm_nodes[node_id] = osm_node
+                nodes.append(osm_node)
+            ways.append(
+                OSMWay(id=way["id"], nodes=nodes, tags=intern_tags(way["tags"]))
+            )
         return ways, raw_nodes
 
-    def compute_graph(
-        self, ways: list[OSMWay], raw_nodes: dict[int, dict]
+    def download_osm_data(self, bbox: BoundingBox) -> tuple[list[OSMWay], dict]:
+        response_json = json.loads(self.fetch_overpass_response(bbox))
+        return self.parse_overpass_json(response_json)
+
+    def stream_overpass_response(self, bbox: BoundingBox) -> Iterator[bytes]:
+        """Yields the raw Overpass API response for the bounding box in chunks, as it downloads (or from the cache)"""
+        query_template = self.overpass_query_template()
+        if self.cache is not None:
+            cached_response = self.cache.get(query_template, bbox)
+            if cached_response is not None:
+                for start in range(0, len(cached_response), CHUNK_SIZE):
+                    yield cached_response[start : start + CHUNK_SIZE]
+                return
+        query = query_template.replace("{bbox}", str(bbox))
+        # Only keep the whole response around if we're going to cache it
+        received: list[bytes] | None = [] if self.cache is not None else None
+        with requests.get(
+            self.overpass_url, params={"data": query}, stream=True
+        ) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                if received is not None:
+                    received.append(chunk)
+                yield chunk
+        if self.cache is not None and received is not None:
+            self.cache.put(query_template, bbox, b"".join(received))
+
+    def stream_graph(self, bbox: BoundingBox, exact_lengths=False) -> RoutingGraph:
+        """Downloads the OSM data for the bounding box and builds a routing graph from it, all at the same time
+
+        - Does the same as `compute_graph(*download_osm_data(bbox))`, but uses much less memory,
+          because the whole response (and its parsed JSON) never has to be held in memory at once
+        - The response is downloaded on a background thread while we parse it and build the graph,
+          so this doesn't work under Pyodide
+        """
+        chunks = read_in_background(self.stream_overpass_response(bbox))
+        return self.compute_graph_streaming(
+            iter_overpass_elements(chunks), exact_lengths
+        )
+
+    def compute_graph_streaming(
+        self, elements: Iterable[dict], exact_lengths=False, batch_size=20_000
     ) -> RoutingGraph:
-        graph = networkx.Graph()
-        for way in ways:
-            for i in range(len(way.nodes) - 1):
-                node_from = way.nodes[i]
-                node_to = way.nodes[i + 1]
-                if graph.has_edge(node_from.id, node_to.id):
-                    # :ohno:
-                    print(f"Duplicate edge between {node_from.id} and {node_to.id}")
-                graph.add_edge(
-                    node_from.id,
-                    node_to.id,
-                    tags=way.tags,
-                    id=way.id,
-                    length=distance_between_points(node_from.pos, node_to.pos),
+        """Builds a routing graph from Overpass API elements as they arrive, e.g. from `iter_overpass_elements()`
+
+        - Only node positions and tags are kept, rather than the whole element
+        - Ways are split into segments as soon as all of their nodes have arrived (Overpass puts nodes first),
+          and segments are added to the graph in batches of about `batch_size`
+        """
+        routing_graph = RoutingGraph(networkx.Graph())
+        positions: dict[int, Coordinates] = {}
+        node_tags: dict[int, dict] = {}
+        # Ways that arrived before some of their nodes
+        waiting_ways: list[dict] = []
+        unmeasured: list[tuple[int, int, int, int, dict]] = []
+
+        def add_way(way: dict, skip_missing_nodes=False):
+            tags_key, tags = routing_graph.tag_sets.intern(way["tags"])
+            node_ids = way["nodes"]
+            for i in range(len(node_ids) - 1):
+                if skip_missing_nodes and (
+                    node_ids[i] not in positions or node_ids[i + 1] not in positions
+                ):
+                    continue
+                unmeasured.append(
+                    (node_ids[i], node_ids[i + 1], way["id"], tags_key, tags)
                 )
-        for node_id, node in raw_nodes.items():
-            if node["id"] in graph.nodes:
-                graph.nodes[node_id]["pos"] = (node["lat"], node["lon"])
-                if "tags" in node:
-                    graph.nodes[node_id]["tags"] = node["tags"]
-        return RoutingGraph(graph)
+
+        def add_batch():
+            segments = measure_segments(unmeasured, positions, exact_lengths)
+            routing_graph.add_segments(segments, positions, node_tags)
+            unmeasured.clear()
+
+        for element in elements:
+            match element["type"]:
+                case "node":
+                    positions[element["id"]] = (element["lat"], element["lon"])
+                    if "tags" in element:
+                        node_tags[element["id"]] = intern_tags(element["tags"])
+                case "way":
+                    if all(node_id in positions for node_id in element["nodes"]):
+                        add_way(element)
+                        if len(unmeasured) >= batch_size:
+                            add_batch()
+                    else:
+                        waiting_ways.append(element)
+        for way in waiting_ways:
+            # Any nodes that still haven't arrived aren't in the data at all (e.g. when a way has been cut off
+            # at the edge of an extract), so we have to leave out the segments that use them
+            add_way(way, skip_missing_nodes=True)
+        add_batch()
+        routing_graph.build_spatial_index()
+        return routing_graph
+
+    def load_osm_file(self, path: str, exact_lengths=False) -> RoutingGraph:
+        """Builds a routing graph from a local OSM XML file (`.osm`, `.osm.bz2` or `.osm.gz`), instead of downloading
+
+        - Includes the same ways as the Overpass query, i.e. those with a `highway=*` value in `ROUTABLE_HIGHWAY_VALUES`
+        - The file is parsed as a stream, so memory use depends on the size of the routing graph, not the file
+        """
+        return self.compute_graph_streaming(
+            iter_osm_file_elements(path, ROUTABLE_HIGHWAY_VALUES), exact_lengths
+        )
+
+    def load_tiles(self, bbox: BoundingBox) -> RoutingGraph:
+        """Returns a graph that covers (at least) the bounding box, only downloading the tiles that we don't have yet
+
+        - The area is split into slippy map tiles (see `tiles.py`), and each tile is downloaded separately
+        - Each tile's ways are added to the same `RoutingGraph`, which is returned every time,
+          so calculators' caches carry over between routes in nearby areas
+        - Overpass returns every way that touches a tile along with all of its nodes,
+          so a way that crosses a tile boundary is complete in each tile that it touches.
+          We only add it the first time, and it joins up with the other tiles' ways at their shared nodes.
+        """
+        if self.tiled_graph is None:
+            self.tiled_graph = RoutingGraph(networkx.Graph())
+            self.tiled_graph.build_spatial_index()
+        for tile in tiles_for_bbox(bbox):
+            if tile in self.loaded_tiles:
+                continue
+            ways, raw_nodes = self.download_osm_data(tile_bbox(tile))
+            new_ways = [way for way in ways if way.id not in self.loaded_way_ids]
+            self.tiled_graph.add_ways(new_ways, raw_nodes)
+            self.loaded_way_ids.update(way.id for way in new_ways)
+            self.loaded_tiles.add(tile)
+        return self.tiled_graph
+
+    @overload
+    def compute_graph(
+        self,
+        ways: list[OSMWay],
+        raw_nodes: dict[int, dict],
+        exact_lengths: bool = False,
+        compact: Literal[False] = False,
+    ) -> RoutingGraph: ...
+
+    @overload
+    def compute_graph(
+        self,
+        ways: list[OSMWay],
+        raw_nodes: dict[int, dict],
+        exact_lengths: bool,
+        compact: Literal[True],
+    ) -> CompactRoutingGraph: ...
+
+    @overload
+    def compute_graph(
+        self,
+        ways: list[OSMWay],
+        raw_nodes: dict[int, dict],
+        exact_lengths: bool = False,
+        *,
+        compact: Literal[True],
+    ) -> CompactRoutingGraph: ...
+
+    @overload
+    def compute_graph(
+        self,
+        ways: list[OSMWay],
+        raw_nodes: dict[int, dict],
+        exact_lengths: bool = False,
+        compact: bool = False,
+    ) -> RoutingGraph | CompactRoutingGraph: ...
+
+    def compute_graph(
+        self,
+        ways: list[OSMWay],
+        raw_nodes: dict[int, dict],
+        exact_lengths=False,
+        compact=False,
+    ) -> RoutingGraph | CompactRoutingGraph:
+        """Builds a routing graph from OSM ways and nodes.
+
+        - Segment lengths are calculated all at once with `segment_lengths()`,
+          unless `exact_lengths` is true, in which case each one is calculated with `distance_between_points()`
+        - If `compact` is true, builds a `CompactRoutingGraph` (array-backed) instead of a `RoutingGraph` (NetworkX-backed)
+        - The tags that the default profile reads are stored as columns too, for weighing every edge at once
+        """
+        tag_sets = TagSetInterner()
+        segments = way_segments(ways, tag_sets, exact_lengths)
+        positions = {
+            node_id: (node["lat"], node["lon"]) for node_id, node in raw_nodes.items()
+        }
+        node_tags = {
+            node_id: node["tags"]
+            for node_id, node in raw_nodes.items()
+            if "tags" in node
+        }
+        if compact:
+            compact_graph = CompactRoutingGraph.from_edges(
+                (
+                    (node_from, node_to, way_id, tags_key, length)
+                    for node_from, node_to, way_id, tags_key, _, length in segments
+                ),
+                positions=positions,
+                node_tags=node_tags,
+                tag_sets=tag_sets,
+            )
+            compact_graph.build_spatial_index()
+            compact_graph.build_tag_columns(DEFAULT_WAY_TAG_KEYS)
+            return compact_graph
+
+        routing_graph = RoutingGraph(networkx.Graph())
+        routing_graph.tag_sets = tag_sets
+        routing_graph.add_segments(segments, positions, node_tags)
+        routing_graph.build_spatial_index()
+        routing_graph.build_tag_columns(DEFAULT_WAY_TAG_KEYS)
+        return routing_graph
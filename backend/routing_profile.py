@@ -0,0 +1,763 @@
+from math import inf
+from typing import Any, Protocol
+import json
+from osm_data_types import (
+    truthy_tag,
+    way_has_sidewalk,
+    way_incline_gradient,
+    way_lanes,
+    way_maxspeed_mph,
+    way_width_meters,
+)
+
+
+class ProfileOptions(Protocol):
+    def true(self, key: str) -> bool: ...
+    def get_tri_state(self, key: str) -> int: ...
+    def positive(self, key: str) -> bool: ...
+    def negative(self, key: str) -> bool: ...
+
+
+def prefer(option: str, by: float) -> dict:
+    """A factor of `1 - option * by`, so preferring (1) something makes it cheaper, and avoiding (-1) makes it dearer"""
+    return {"prefer": option, "by": by}
+
+
+def when(option: str | list[str], factor: float, otherwise: float = 1) -> dict:
+    """A factor that's only applied if a boolean option (or any of a list of them) is true"""
+    return {"option": option, "true": factor, "false": otherwise}
+
+
+def with_values(values: list[str], factor) -> dict:
+    return {value: factor for value in values}
+
+
+NICE_PAVED_SURFACES = [
+    "asphalt",
+    "chipseal",
+    "paving_stones:lanes",
+    "paving_stones",
+    "bricks",
+    "concrete:plates",
+    "concrete:lanes",
+    "concrete",
+]
+PAVED_SURFACES = [
+    "grass_paver",
+    "sett",
+    "unhewn_cobblestone",
+    "metal",
+    "metal_grid",
+    "wood",
+    "rubber",
+    "tiles",
+    "paved",
+    "cobblestone",
+    "cobblestone:flattened",
+]
+NICE_UNPAVED_SURFACES = [
+    "compacted",
+    "fine_gravel",
+    "gravel",
+    "shells",
+    "rock",
+    "pebblestone",
+    "woodchips",
+]
+BARE_GROUND_SURFACES = ["dirt", "grass", "sand", "snow", "earth"]
+MUDDY_SURFACES = ["mud"]
+PUBLIC_RIGHTS_OF_WAY = [
+    "public_footpath",
+    "public_bridleway",
+    "restricted_byway",
+    "byway_open_to_all_traffic",
+    "public_right_of_way",
+    "core_path",
+]
+
+# How the weights of ways and nodes are calculated, as tables of factors
+#
+# - A factor is a number, `prefer(option, by)`, `when(option, factor)`, a switch on a tri-state option
+#   (`{"option": ..., "avoid": ..., "neutral": ..., "prefer": ...}`), a list of factors (which are multiplied),
+#   or a table of factors for the values of another tag (`{"tag": ..., "values": {...}, "default": ...}`)
+# - Options are applied once, when a profile is compiled with `CompiledProfile`
+DEFAULT_PROFILE: dict[str, Any] = {
+    # Tags that other tags imply, which are added (unless they're already there) before anything else.
+    # Each condition is a tag and the values it can have, where None means that the tag is missing.
+    "implied_tags": [
+        {"if": {"highway": ["motorway", "motorway_link"]}, "then": {"foot": "no"}},
+        {"if": {"service": ["driveway"]}, "then": {"access": "private"}},
+        {
+            "if": {"service": ["parking_aisle"], "access": [None, "yes"]},
+            "then": {"foot": "yes"},
+        },
+        {"if": {"service": ["emergency_access"]}, "then": {"access": "no"}},
+        {"if": {"service": ["bus"]}, "then": {"foot": "no"}},
+    ],
+    # Whether each value of foot=* (or access=* if there's no foot=*) can be walked on.
+    # Values that aren't listed are allowed.
+    "access": {
+        "no": False,
+        "private": {"option": "allow_private_access"},
+        "customers": {"option": "allow_customer_access"},
+        "permit": {"option": "allow_customer_access"},
+        "agricultural": False,
+        "forestry": False,
+        "delivery": False,
+        "military": False,
+    },
+    # Roads: the weight of walking along the carriageway, for each highway=* value
+    "road_highways": {
+        **with_values(["motorway", "motorway_link"], 50_000),
+        **with_values(["trunk", "trunk_link"], 10_000),
+        **with_values(["primary", "primary_link"], 20),
+        **with_values(["secondary", "secondary_link"], 15),
+        **with_values(
+            ["tertiary", "tertiary_link"], when("allow_higher_traffic_roads", 5, 10)
+        ),
+        "unclassified": when("allow_higher_traffic_roads", 4, 6),
+        "residential": 3,
+        "living_street": 1.5,
+        "service": {
+            "tag": "service",
+            "values": {
+                "driveway": 1,
+                "parking_aisle": 2,
+                "parking": 2,
+                "alley": 1.3,
+                "drive_through": 5,
+                "slipway": 7,
+                "layby": 1.75,
+            },
+            "default": 2,
+        },
+    },
+    "walking_on_roads": when("allow_walking_on_roads", 1, 60),
+    "multi_lane_road": {"lanes": 2, "factor": 2},
+    # Applied to carriageways that have each of these tags (with a value other than no)
+    "road_tags": {"shoulder": 0.9, "verge": 0.95},
+    # Roads with a sidewalk are weighed as these path tags, or as this weight if sidewalk=* isn't tagged
+    "pavement_tags": {
+        "highway": "footway",
+        "footway": "sidewalk",
+        "surface": "asphalt",
+    },
+    "untagged_pavement": 1.2,
+    "fast_road": {"maxspeed_mph": 60, "factor": 1.1},
+    # Paths: only paths that aren't mixed use get their highway=* factor
+    "path_highways": {
+        **with_values(
+            [
+                "footway",
+                "bridleway",
+                "steps",
+                "corridor",
+                "path",
+                "track",
+                "pedestrian",
+            ],
+            1,
+        ),
+        "cycleway": 1.5,
+    },
+    "mixed_use": {"segregated": ["yes", "no"], "foot": ["designated"]},
+    # Paths that are assumed to be maintained (and suitable for wheelchairs), or that are maintained if they have
+    # any of the `maintained_tags`, unless they're tagged informal=yes
+    "maintained_highways": ["footway", "cycleway", "pedestrian"],
+    "maintained_tags": ["designation", "operator"],
+    "informal": prefer("desire_paths", 0.5),
+    "maintained": prefer("maintained_paths", 0.5),
+    "unmaintained": 1.05,
+    "maintained_trail_visibility": "excellent",
+    # The factor for each sac_scale=* value, and whether it makes a path suitable for wheelchairs
+    "sac_scale": {
+        "strolling": {"factor": 0.9, "wheelchair": True},
+        "hiking": {"factor": 1},
+        "mountain_hiking": {"factor": 2.5, "wheelchair": False},
+        "demanding_mountain_hiking": {
+            "factor": {
+                "option": "treacherous_paths",
+                "avoid": 10,
+                "neutral": 3,
+                "prefer": 0.99,
+            },
+            "wheelchair": False,
+        },
+        "alpine_hiking": {
+            "factor": {
+                "option": "treacherous_paths",
+                "avoid": 1000,
+                "neutral": 30,
+                "prefer": 20,
+            },
+            "wheelchair": False,
+        },
+        **with_values(
+            ["demanding_alpine_hiking", "difficult_alpine_hiking"],
+            {"factor": inf, "wheelchair": False},
+        ),
+    },
+    "trail_visibility": {
+        "excellent": 0.9,
+        "good": 1.02,
+        **with_values(["intermediate", "bad", "horrible", "no"], 1.05),
+    },
+    # Applied if trailblazed=* is present, unless it's no
+    "trailblazed": 0.91,
+    # Paths narrower than this (in meters) are impassable, and wider ones get the factor of the first width they exceed
+    "min_width": 0.2,
+    "widths": [[5, 0.9], [2, 0.975]],
+    # Tables of factors for other path tags, applied in order
+    "path_tags": [
+        {
+            "tag": "designation",
+            "values": {
+                **with_values(
+                    ["public_footpath", "public_bridleway", "restricted_byway"], 0.9
+                ),
+                "byway_open_to_all_traffic": 0.95,
+                "public_right_of_way": 0.91,
+                "core_path": 0.9,
+            },
+        },
+        {
+            "tag": "designation",
+            "values": with_values(PUBLIC_RIGHTS_OF_WAY, prefer("rights_of_way", 0.3)),
+        },
+        {"tag": "segregated", "values": {"yes": 0.98, "no": 1.02}},
+        {"tag": "obstacle", "values": {"vegetation": 1.10}},
+        {"tag": "footway", "values": {"sidewalk": prefer("pavements", 0.4)}},
+    ],
+    # wheelchair=* defaults to yes for paths that are suitable for wheelchairs, otherwise no
+    "wheelchair": {
+        "yes": when("wheelchair_accessible", 0.9),
+        "no": when("wheelchair_accessible", 100),
+        "limited": when("wheelchair_accessible", 0.96),
+        "designated": when("wheelchair_accessible", 0.89),
+    },
+    # Everything: applied to carriageways and paths (but not pavements)
+    "surfaces": {
+        **with_values(NICE_PAVED_SURFACES, [prefer("paved_paths", 0.5), 0.95]),
+        **with_values(
+            PAVED_SURFACES,
+            [prefer("paved_paths", 0.5), when("wheelchair_accessible", 1.1, 0.95)],
+        ),
+        **with_values(NICE_UNPAVED_SURFACES, [prefer("unpaved_paths", 0.5), 0.99]),
+        **with_values(BARE_GROUND_SURFACES, [prefer("unpaved_paths", 0.5), 1.05]),
+        **with_values(MUDDY_SURFACES, [prefer("unpaved_paths", 0.5), 4]),
+    },
+    # The smoothness=* to assume for each surface=* value, if smoothness=* isn't tagged
+    "assumed_smoothness": {"asphalt": "good", "chipseal": "good"},
+    "smoothness": {
+        **with_values(["excellent", "good", "intermediate"], 0.95),
+        **with_values(["very_bad", "horrible", "very_horrible"], 1.9),
+        "impassable": {
+            "tag": "sac_scale",
+            "values": {"strolling": 2, "hiking": 2},
+            "default": 5,
+        },
+    },
+    # Applied to any incline=* other than 0
+    "incline": 1.1,
+    "ford": {"yes": 3, "stepping_stones": 2.5},
+    "lit": with_values(
+        ["yes", "24/7", "automatic", "limited"], prefer("lit_paths", 0.3)
+    ),
+    "indoor_values": ["yes", "corridor"],
+    "indoor_highways": ["corridor"],
+    "indoor": prefer("indoor_paths", 0.5),
+    # Indoor ways count as covered, as do ways with any of these tags (with a value other than no)
+    "covered_tags": ["covered", "tunnel", "shelter"],
+    "covered": prefer("covered_paths", 0.4),
+    # Anything else with highway=road gets this weight, and everything else is impassable
+    "unknown_road": 1,
+    # Nodes: barriers that are impassable if locked=yes, and those that are impassable unless they're open
+    "lockable_barriers": ["gate", "sliding_gate", "wicket_gate"],
+    "closed_barriers": ["barrier_board"],
+    # Crossings: the weight for each crossing=* value, or for crossing_ref=* if crossing=* doesn't say
+    # which type of crossing it is (or says there's no crossing)
+    "crossings": {
+        "no": inf,
+        "zebra": 1.2,
+        "traffic_signals": 1,
+        **with_values(["uncontrolled", "unmarked"], 2),
+        "informal": 4,
+    },
+    "crossing_refs": {"zebra": 1.2},
+    "default_crossing": 2.5,
+    "marked_crossings": ["zebra", "traffic_signals"],
+    "marked_crossing_refs": ["zebra"],
+    "unmarked_crossing": when("prefer_marked_crossings", 3),
+    "traffic_light_crossings": ["traffic_signals"],
+    "no_traffic_lights": when("prefer_traffic_light_crossings", 2.5),
+    "raised_crossing": 0.75,
+    "continuous_crossing": 0.5,
+    "crossing_island": 0.7,
+    "traffic_signals_sound": {
+        "yes": when("prefer_audible_crossings", 0.6),
+        "no": when("prefer_audible_crossings", 4),
+    },
+    # Raised crossings count as having lowered kerbs
+    "kerbs": {
+        "lowered": when(["wheelchair_accessible", "prefer_dipped_kerbs"], 0.8),
+        "flush": when(["wheelchair_accessible", "prefer_dipped_kerbs"], 0.75),
+    },
+    "flush_kerb_without_tactile_paving": when("prefer_tactile_paving", 10),
+}
+
+
+def profile_fingerprint(profile: dict) -> str:
+    """Returns a string that is equal for any two identical profiles"""
+    return json.dumps(profile, sort_keys=True)
+
+
+# Way tags that `CompiledProfile.way_weight()` reads whatever the profile says
+WAY_TAG_KEYS = [
+    "highway",
+    "foot",
+    "access",
+    "sidewalk",
+    "sidewalk:left",
+    "sidewalk:right",
+    "sidewalk:both",
+    "maxspeed",
+    "lanes",
+    "informal",
+    "trail_visibility",
+    "sac_scale",
+    "trailblazed",
+    "width",
+    "est_width",
+    "wheelchair",
+    "surface",
+    "smoothness",
+    "incline",
+    "ford",
+    "lit",
+    "indoor",
+]
+
+
+def profile_way_tag_keys(profile: dict) -> list[str]:
+    """Returns every tag key that the weight of a way can depend on with this profile (whatever the options)
+
+    - Ways whose tags only differ in other keys (e.g. `name=*`) always have the same weight
+    """
+    keys = dict.fromkeys(WAY_TAG_KEYS)
+    for rule in profile["implied_tags"]:
+        keys.update(dict.fromkeys(rule["if"]))
+        keys.update(dict.fromkeys(rule["then"]))
+    for section in ["road_tags", "mixed_use", "maintained_tags", "covered_tags"]:
+        keys.update(dict.fromkeys(profile[section]))
+
+    def add_table_keys(spec):
+        if isinstance(spec, dict):
+            if "tag" in spec:
+                keys[spec["tag"]] = None
+            for value in spec.values():
+                add_table_keys(value)
+        elif isinstance(spec, list):
+            for value in spec:
+                add_table_keys(value)
+
+    add_table_keys(profile)
+    return list(keys)
+
+
+DEFAULT_WAY_TAG_KEYS = profile_way_tag_keys(DEFAULT_PROFILE)
+
+
+def profile_option_keys(profile: dict) -> list[str]:
+    """Returns every routing option that compiling this profile looks up, so every one that the options must have"""
+    keys = {}
+
+    def add_option_keys(spec):
+        if isinstance(spec, dict):
+            if "option" in spec:
+                option = spec["option"]
+                keys.update(
+                    dict.fromkeys(option if isinstance(option, list) else [option])
+                )
+            elif "by" in spec:
+                keys[spec["prefer"]] = None
+            for value in spec.values():
+                add_option_keys(value)
+        elif isinstance(spec, list):
+            for value in spec:
+                add_option_keys(value)
+
+    add_option_keys(profile)
+    return list(keys)
+
+
+DEFAULT_OPTION_KEYS = profile_option_keys(DEFAULT_PROFILE)
+
+
+# Factors keyed by tag value, which are looked up with `tags.get()`, so the value might be missing
+type FactorTable = dict[str | None, Any]
+
+
+class TagTable:
+    """A table of factors for the values of one tag, with the routing options already applied"""
+
+    __slots__ = ("key", "factors", "default")
+
+    def __init__(self, key: str, factors: FactorTable, default: Any = 1):
+        self.key = key
+        self.factors = factors
+        self.default = default
+
+    def factor(self, tags: dict) -> float:
+        factor = self.factors.get(tags.get(self.key), self.default)
+        if type(factor) is TagTable:
+            return factor.factor(tags)
+        return factor
+
+
+class CompiledProfile:
+    """A routing profile (see `DEFAULT_PROFILE`) with the routing options applied, which weighs ways and nodes
+
+    - Every option is looked up once, here, so weighing a way is mostly dict lookups and multiplications
+    - Factors are multiplied in the same order as they're listed, so the weights don't depend on rounding
+    """
+
+    def __init__(self, profile: dict[str, Any], options: ProfileOptions):
+        self.options = options
+
+        def factor(spec) -> Any:
+            return self.resolve(spec)
+
+        def table(specs: dict[str, Any]) -> FactorTable:
+            return {value: factor(spec) for value, spec in specs.items()}
+
+        self.implied_tags = [
+            (
+                [(key, frozenset(values)) for key, values in rule["if"].items()],
+                rule["then"],
+            )
+            for rule in profile["implied_tags"]
+        ]
+        # The values of the first tag in each rule's conditions, so that most ways can skip checking every rule
+        implied_tag_triggers: dict[str, set] = {}
+        for conditions, _ in self.implied_tags:
+            key, values = conditions[0]
+            implied_tag_triggers.setdefault(key, set()).update(values)
+        self.implied_tag_triggers = [
+            (key, frozenset(values)) for key, values in implied_tag_triggers.items()
+        ]
+        self.forbidden_access = frozenset(
+            value
+            for value, allowed in profile["access"].items()
+            if not self.resolve_bool(allowed)
+        )
+        self.road_highways = table(profile["road_highways"])
+        self.walking_on_roads = factor(profile["walking_on_roads"])
+        self.multi_lanes = profile["multi_lane_road"]["lanes"]
+        self.multi_lane_factor = factor(profile["multi_lane_road"]["factor"])
+        self.road_tags = [
+            (key, factor(spec)) for key, spec in profile["road_tags"].items()
+        ]
+        self.untagged_pavement = factor(profile["untagged_pavement"])
+        self.fast_road_speed = profile["fast_road"]["maxspeed_mph"]
+        self.fast_road_factor = factor(profile["fast_road"]["factor"])
+
+        self.path_highways = table(profile["path_highways"])
+        self.mixed_use = [
+            (key, frozenset(values)) for key, values in profile["mixed_use"].items()
+        ]
+        self.maintained_highways = frozenset(profile["maintained_highways"])
+        self.maintained_tags = profile["maintained_tags"]
+        self.informal_factor = factor(profile["informal"])
+        self.maintained_factor = factor(profile["maintained"])
+        self.unmaintained_factor = factor(profile["unmaintained"])
+        self.maintained_trail_visibility = profile["maintained_trail_visibility"]
+        self.sac_scale = {
+            value: (factor(spec["factor"]), spec.get("wheelchair"))
+            for value, spec in profile["sac_scale"].items()
+        }
+        self.trail_visibility = table(profile["trail_visibility"])
+        self.trailblazed_factor = factor(profile["trailblazed"])
+        self.min_width = profile["min_width"]
+        self.widths = [(width, factor(spec)) for width, spec in profile["widths"]]
+        self.path_tags = [self.resolve(spec) for spec in profile["path_tags"]]
+        self.wheelchair = table(profile["wheelchair"])
+
+        self.surfaces = table(profile["surfaces"])
+        self.assumed_smoothness = profile["assumed_smoothness"]
+        self.smoothness = table(profile["smoothness"])
+        self.incline_factor = factor(profile["incline"])
+        self.ford = table(profile["ford"])
+        self.lit = table(profile["lit"])
+        self.indoor_values = frozenset(profile["indoor_values"])
+        self.indoor_highways = frozenset(profile["indoor_highways"])
+        self.indoor_factor = factor(profile["indoor"])
+        self.covered_tags = profile["covered_tags"]
+        self.covered_factor = factor(profile["covered"])
+        self.unknown_road = factor(profile["unknown_road"])
+
+        self.lockable_barriers = frozenset(profile["lockable_barriers"])
+        self.closed_barriers = frozenset(profile["closed_barriers"])
+        self.crossings = table(profile["crossings"])
+        self.crossing_refs = table(profile["crossing_refs"])
+        self.default_crossing = factor(profile["default_crossing"])
+        self.marked_crossings = frozenset(profile["marked_crossings"])
+        self.marked_crossing_refs = frozenset(profile["marked_crossing_refs"])
+        self.unmarked_crossing_factor = factor(profile["unmarked_crossing"])
+        self.traffic_light_crossings = frozenset(profile["traffic_light_crossings"])
+        self.no_traffic_lights_factor = factor(profile["no_traffic_lights"])
+        self.raised_crossing_factor = factor(profile["raised_crossing"])
+        self.continuous_crossing_factor = factor(profile["continuous_crossing"])
+        self.crossing_island_factor = factor(profile["crossing_island"])
+        self.traffic_signals_sound = table(profile["traffic_signals_sound"])
+        self.kerbs = table(profile["kerbs"])
+        self.flush_kerb_factor = factor(profile["flush_kerb_without_tactile_paving"])
+
+        # Pavements along roads are weighed like this path, which only depends on the options
+        pavement_weight = self.path_weight(profile["pavement_tags"])
+        assert pavement_weight is not None, "pavement_tags must be a path"
+        self.pavement_weight = pavement_weight
+
+    def resolve(self, spec) -> Any:
+        """Applies the routing options to a factor, returning a number (or a `TagTable`)"""
+        if isinstance(spec, list):
+            product = self.resolve(spec[0])
+            for factor in spec[1:]:
+                product *= self.resolve(factor)
+            return product
+        if not isinstance(spec, dict):
+            return spec
+        if "tag" in spec:
+            return TagTable(
+                spec["tag"],
+                {
+                    value: self.resolve(factor)
+                    for value, factor in spec["values"].items()
+                },
+                self.resolve(spec.get("default", 1)),
+            )
+        if "option" not in spec:
+            return 1 - self.options.get_tri_state(spec["prefer"]) * spec["by"]
+        if "true" in spec:
+            return self.resolve(spec["true" if self.resolve_bool(spec) else "false"])
+        if self.options.positive(spec["option"]):
+            return self.resolve(spec["prefer"])
+        if self.options.negative(spec["option"]):
+            return self.resolve(spec["avoid"])
+        return self.resolve(spec["neutral"])
+
+    def resolve_bool(self, spec) -> bool:
+        if isinstance(spec, bool):
+            return spec
+        option = spec["option"]
+        if isinstance(option, list):
+            return any(self.options.true(key) for key in option)
+        return self.options.true(option)
+
+    def with_implied_tags(self, tags: dict) -> dict:
+        """Returns the tags with any implied tags added, without changing the (shared) tags dict"""
+        for key, values in self.implied_tag_triggers:
+            if (tags.get(key) or None) in values:
+                break
+        else:
+            return tags
+        for conditions, implied in self.implied_tags:
+            if all((tags.get(key) or None) in values for key, values in conditions):
+                missing = {
+                    key: value for key, value in implied.items() if key not in tags
+                }
+                if missing:
+                    tags = {**tags, **missing}
+        return tags
+
+    def access_is_legal(self, tags: dict) -> bool:
+        access = tags.get("foot") or tags.get("access")
+        return access not in self.forbidden_access
+
+    def way_weight(self, tags: dict) -> float:
+        """Calculates the weight (per meter) of a way"""
+        tags = self.with_implied_tags(tags)
+        if not self.access_is_legal(tags):
+            return inf
+        highway = tags.get("highway")
+
+        road_factor = self.road_highways.get(highway)
+        if road_factor is not None:
+            has_sidewalk = way_has_sidewalk(tags)
+            if has_sidewalk is None:
+                # Deprioritize ways where we're just assuming a sidewalk is present
+                pavement_weight = self.untagged_pavement
+            elif has_sidewalk == "no":
+                # We're walking on the road carriageway
+                if tags.get("foot") == "use_sidepath":
+                    return inf
+                if type(road_factor) is TagTable:
+                    road_factor = road_factor.factor(tags)
+                return (
+                    road_factor
+                    * self.walking_on_roads
+                    * self.additional_road_factor(tags)
+                    * self.general_factor(tags)
+                )
+            else:
+                pavement_weight = self.pavement_weight
+            maxspeed = way_maxspeed_mph(tags)
+            if maxspeed and maxspeed >= self.fast_road_speed:
+                pavement_weight *= self.fast_road_factor
+            return pavement_weight
+
+        path_weight = self.path_weight(tags)
+        if path_weight is not None:
+            return path_weight * self.general_factor(tags)
+        if highway == "road":
+            return self.unknown_road
+        return inf
+
+    def additional_road_factor(self, tags: dict) -> float:
+        factor = 1
+        lanes = way_lanes(tags)
+        if lanes is not None and lanes >= self.multi_lanes:
+            factor *= self.multi_lane_factor
+        for key, tag_factor in self.road_tags:
+            if truthy_tag(tags, key):
+                factor *= tag_factor
+        return factor
+
+    def path_weight(self, tags: dict) -> float | None:
+        highway = tags.get("highway")
+        weight = self.path_highways.get(highway)
+        if weight is None:
+            return None
+        get = tags.get
+        for key, values in self.mixed_use:
+            if get(key) in values:
+                weight = 1
+                break
+
+        wheelchair_suitable = False
+        maintained = 0
+        if highway in self.maintained_highways:
+            maintained = 1
+            wheelchair_suitable = True
+        for key in self.maintained_tags:
+            if get(key):
+                maintained = 1
+                break
+        if tags.get("informal") == "yes":
+            maintained = -1
+            weight *= self.informal_factor
+        trail_visibility = tags.get("trail_visibility")
+        if maintained == 1:
+            if trail_visibility is None:
+                trail_visibility = self.maintained_trail_visibility
+            weight *= self.maintained_factor
+        elif maintained == -1:
+            weight *= self.unmaintained_factor
+
+        sac_scale = self.sac_scale.get(tags.get("sac_scale"))  # type: ignore
+        if sac_scale is not None:
+            weight *= sac_scale[0]
+            if sac_scale[1] is not None:
+                wheelchair_suitable = sac_scale[1]
+        weight *= self.trail_visibility.get(trail_visibility, 1)  # type: ignore
+        trailblazed = tags.get("trailblazed")
+        if trailblazed is not None and trailblazed != "no":
+            weight *= self.trailblazed_factor
+        width = way_width_meters(tags)
+        if width is not None:
+            if width < self.min_width:
+                weight = inf
+            else:
+                for min_width, width_factor in self.widths:
+                    if width > min_width:
+                        weight *= width_factor
+                        break
+        for tag_table in self.path_tags:
+            weight *= tag_table.factor(tags)
+        wheelchair = tags.get("wheelchair", "yes" if wheelchair_suitable else "no")
+        weight *= self.wheelchair.get(wheelchair, 1)
+        return weight
+
+    def general_factor(self, tags: dict) -> float:
+        factor = 1
+        surface = tags.get("surface")
+        factor *= self.surfaces.get(surface, 1)  # type: ignore
+        smoothness = tags.get("smoothness", self.assumed_smoothness.get(surface))  # type: ignore
+        smoothness_factor = self.smoothness.get(smoothness, 1)  # type: ignore
+        if type(smoothness_factor) is TagTable:
+            smoothness_factor = smoothness_factor.factor(tags)
+        factor *= smoothness_factor
+        gradient = way_incline_gradient(tags)
+        if gradient is not None and gradient != 0:
+            factor *= self.incline_factor
+        factor *= self.ford.get(tags.get("ford"), 1)  # type: ignore
+        factor *= self.lit.get(tags.get("lit"), 1)  # type: ignore
+        indoors = (
+            tags.get("indoor") in self.indoor_values
+            or tags.get("highway") in self.indoor_highways
+        )
+        if indoors:
+            factor *= self.indoor_factor
+        if indoors:
+            factor *= self.covered_factor
+        else:
+            for key in self.covered_tags:
+                if truthy_tag(tags, key):
+                    factor *= self.covered_factor
+                    break
+        return factor
+
+    def node_weight(self, tags: dict) -> float:
+        """Calculates the weight of passing through a node with tags"""
+        if not self.access_is_legal(tags):
+            return inf
+        # Most barriers only block motor traffic, so we only consider those that generally block pedestrians.
+        # We assume (by default) that lockable barriers will be able to be opened by a pedestrian,
+        # unless tagged with locked=yes, and that closed barriers are impassable unless explicitly open or unlocked
+        barrier = tags.get("barrier")
+        if barrier in self.lockable_barriers and tags.get("locked") == "yes":
+            return inf
+        if barrier in self.closed_barriers:
+            explicitly_unlocked = tags.get("locked") == "no" or tags.get("open") in [
+                "yes",
+                "partial",
+            ]
+            if not explicitly_unlocked:
+                return inf
+        if tags.get("highway") == "crossing":
+            return self.crossing_weight(tags)
+        return 0
+
+    def crossing_weight(self, tags: dict) -> float:
+        crossing = tags.get("crossing")
+        crossing_ref = tags.get("crossing_ref")
+        weight = self.crossings.get(crossing)  # type: ignore
+        if weight is None or weight == inf:
+            weight = self.crossing_refs.get(crossing_ref, weight)  # type: ignore
+        if weight is None:
+            weight = self.default_crossing
+        marked_crossing = (
+            crossing in self.marked_crossings
+            or crossing_ref in self.marked_crossing_refs
+            or truthy_tag(tags, "crossing:markings")
+        )
+        if not marked_crossing:
+            weight *= self.unmarked_crossing_factor
+        traffic_light_crossing = crossing in self.traffic_light_crossings or (
+            truthy_tag(tags, "traffic_signals")
+        )
+        if not traffic_light_crossing:
+            weight *= self.no_traffic_lights_factor
+
+        raised_crossing = tags.get("traffic_calming") == "table"
+        if raised_crossing:
+            weight *= self.raised_crossing_factor
+        elif tags.get("crossing:continuous") == "yes":
+            weight *= self.continuous_crossing_factor
+        if tags.get("crossing:island") == "yes":
+            weight *= self.crossing_island_factor
+        weight *= self.traffic_signals_sound.get(tags.get("traffic_signals:sound"), 1)  # type: ignore
+        kerb = tags.get("kerb")
+        weight *= self.kerbs.get("lowered" if raised_crossing else kerb, 1)  # type: ignore
+        if kerb == "flush" and tags.get("tactile_paving") == "no":
+            weight *= self.flush_kerb_factor
+        return weight
@@ -0,0 +1,161 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from typing import Iterable, Iterator
+from compact_graph import CompactRoutingGraph
+from graph_snapshot import read_snapshot_from, snapshot_size, write_snapshot_into
+from osm_data_types import Coordinates
+from route_result import RouteResult
+from routing_engine import (
+    CalculatorCache,
+    HeuristicMode,
+    RoutingGraph,
+    RoutingOptions,
+    SearchMode,
+)
+
+# Multiprocessing isn't available under Pyodide, so this module is only used outside the browser
+
+
+class SharedGraph:
+    """A routing graph stored in a block of shared memory, so that other processes can use it without copying it
+
+    - The block holds a graph snapshot (see `graph_snapshot`), so it takes up about as much memory as a snapshot file
+    - Call `close()` (or use a `with` block) when finished with it, otherwise the memory is only freed at exit
+    """
+
+    def __init__(self, graph: RoutingGraph | CompactRoutingGraph):
+        if isinstance(graph, RoutingGraph):
+            graph = graph.to_compact()
+        columns, metadata = graph.snapshot_columns()
+        self.memory = shared_memory.SharedMemory(
+            create=True, size=snapshot_size(columns, metadata)
+        )
+        write_snapshot_into(self.memory.buf, columns, metadata)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def close(self):
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self) -> "SharedGraph":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def attach_shared_graph(
+    name: str,
+) -> tuple[CompactRoutingGraph, shared_memory.SharedMemory]:
+    """Uses a graph that another process shared with `SharedGraph`, without copying its arrays
+
+    - Also returns the shared memory block, which must be kept around (and not closed) while the graph is in use
+    """
+    try:
+        # The process that created the block is responsible for deleting it
+        memory = shared_memory.SharedMemory(name=name, track=False)  # type: ignore
+    except TypeError:
+        # Before Python 3.13 the block is always tracked, which is fine for worker processes
+        # because they share their parent's resource tracker
+        memory = shared_memory.SharedMemory(name=name)
+    columns, _ = read_snapshot_from(memory.buf, f"Shared graph {name}")
+    return CompactRoutingGraph.from_snapshot_columns(columns), memory
+
+
+# State of each worker process
+_worker_graph: CompactRoutingGraph | None = None
+_worker_memory: shared_memory.SharedMemory | None = None
+_worker_calculators: CalculatorCache | None = None
+
+
+def _attach_worker(name: str):
+    global _worker_graph, _worker_memory, _worker_calculators
+    _worker_graph, _worker_memory = attach_shared_graph(name)
+    _worker_calculators = CalculatorCache(_worker_graph)
+
+
+def _calculate_route(
+    options: dict,
+    start_pos: Coordinates,
+    end_pos: Coordinates,
+    search_mode: SearchMode,
+    heuristic: HeuristicMode,
+) -> RouteResult:
+    assert _worker_calculators is not None
+    # Reuse calculators, so that their caches carry over between routes
+    calculator = _worker_calculators.calculator(
+        RoutingOptions(options), search_mode, heuristic
+    )
+    return calculator.calculate_route_a_star(start_pos, end_pos)
+
+
+class RouteWorkerPool:
+    """Calculates routes in several worker processes at once, which all share one copy of the graph
+
+    - Each worker only has its own copy of the tag tables, plus whatever it caches (e.g. edge weights)
+    - By default, there is one worker per CPU core
+    - Workers are started fresh rather than forked, so they don't inherit (and slowly copy, as reference counts
+      change) the Python objects of whatever graph this process built
+    """
+
+    def __init__(
+        self,
+        graph: RoutingGraph | CompactRoutingGraph,
+        max_workers: int | None = None,
+    ):
+        self.shared_graph = SharedGraph(graph)
+        self.executor = ProcessPoolExecutor(
+            max_workers,
+            mp_context=get_context("spawn"),
+            initializer=_attach_worker,
+            initargs=(self.shared_graph.name,),
+        )
+
+    def submit_route(
+        self,
+        options: dict,
+        start_pos: Coordinates,
+        end_pos: Coordinates,
+        search_mode: SearchMode = "astar",
+        heuristic: HeuristicMode = "distance",
+    ) -> Future[RouteResult]:
+        """Starts calculating a route in one of the workers, like `RouteCalculator.calculate_route_a_star()`"""
+        return self.executor.submit(
+            _calculate_route, options, start_pos, end_pos, search_mode, heuristic
+        )
+
+    def map_routes(
+        self,
+        options: dict,
+        journeys: Iterable[tuple[Coordinates, Coordinates]],
+        search_mode: SearchMode = "astar",
+        heuristic: HeuristicMode = "distance",
+        chunksize: int = 8,
+    ) -> Iterator[RouteResult]:
+        """Calculates the routes for many (start, end) pairs across all of the workers, yielding them in order
+
+        - Routes are sent to workers in chunks of `chunksize`, to cut down on the overhead of each task
+        """
+        journeys = list(journeys)
+        return self.executor.map(
+            _calculate_route,
+            [options] * len(journeys),
+            [start for start, _ in journeys],
+            [end for _, end in journeys],
+            [search_mode] * len(journeys),
+            [heuristic] * len(journeys),
+            chunksize=chunksize,
+        )
+
+    def shutdown(self):
+        self.executor.shutdown()
+        self.shared_graph.close()
+
+    def __enter__(self) -> "RouteWorkerPool":
+        return self
+
+    def __exit__(self, *_):
+        self.shutdown()
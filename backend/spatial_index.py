@@ -0,0 +1,214 @@
+from collections.abc import Buffer
+from math import cos, radians
+from typing import Callable
+import numpy
+from geometry import (
+    distance_between_points,
+    earth_centred_position,
+    earth_centred_positions,
+)
+from osm_data_types import Coordinates
+
+# Approximate length of one degree of latitude, in meters
+METERS_PER_DEGREE = 111_320
+# Up to this far, a geodesic distance is less than 20 cm longer than the straight line through the Earth
+# (which is much quicker to calculate), so the straight line can be used to rule out nodes exactly
+FAR_METERS = 50_000
+
+
+class SpatialIndex:
+    """A grid of square buckets over projected node positions, used to find nodes near a point.
+
+    - Positions are projected onto a flat plane (equirectangular, centred on the first inserted point),
+      so distances from the index are only approximate
+    - The index only narrows down the candidates: callers should rank them with a geodesic distance
+    """
+
+    # Projected distances may be a little out compared to geodesic distances
+    # (mainly because the projection stretches as we move away from the reference latitude),
+    # so we fetch every candidate that could be within this margin of the best approximate distance
+    TOLERANCE = 0.02
+    SLACK_METERS = 1
+
+    def __init__(self, cell_size: float = 100):
+        self.cell_size = cell_size
+        self._cells: dict[tuple[int, int], list[tuple[int, float, float]]] = {}
+        self._reference_lat: float | None = None
+        self._x_scale = METERS_PER_DEGREE
+        self._min_cell: tuple[int, int] | None = None
+        self._max_cell: tuple[int, int] | None = None
+        # (node IDs, lats, lons) arrays of every node, for queries far outside the grid (see `candidates()`)
+        self._all_nodes: tuple[list[int], numpy.ndarray, numpy.ndarray] | None = None
+        self.size = 0
+
+    def project(self, pos: Coordinates) -> tuple[float, float]:
+        """Converts coordinates to (x, y) meters on the index's flat plane"""
+        if self._reference_lat is None:
+            self._reference_lat = pos[0]
+            self._x_scale = METERS_PER_DEGREE * cos(radians(pos[0]))
+        return pos[1] * self._x_scale, pos[0] * METERS_PER_DEGREE
+
+    def _cell_of(self, x: float, y: float) -> tuple[int, int]:
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, node_id: int, pos: Coordinates):
+        x, y = self.project(pos)
+        cell = self._cell_of(x, y)
+        self._cells.setdefault(cell, []).append((node_id, x, y))
+        self._all_nodes = None
+        self.size += 1
+        if self._min_cell is None or self._max_cell is None:
+            self._min_cell = self._max_cell = cell
+            return
+        self._min_cell = (
+            min(self._min_cell[0], cell[0]),
+            min(self._min_cell[1], cell[1]),
+        )
+        self._max_cell = (
+            max(self._max_cell[0], cell[0]),
+            max(self._max_cell[1], cell[1]),
+        )
+
+    def _ring(
+        self,
+        centre: tuple[int, int],
+        radius: int,
+        min_cell: tuple[int, int],
+        max_cell: tuple[int, int],
+    ):
+        """Yields the cells that are exactly `radius` cells away from the centre cell, and within the
+        `min_cell`..`max_cell` box (so that far away queries don't check lots of cells that can't have any nodes)
+        """
+        cx, cy = centre
+        if radius == 0:
+            yield centre
+            return
+        x_range = range(
+            max(cx - radius, min_cell[0]), min(cx + radius, max_cell[0]) + 1
+        )
+        for y in (cy - radius, cy + radius):
+            if min_cell[1] <= y <= max_cell[1]:
+                for x in x_range:
+                    yield x, y
+        y_range = range(
+            max(cy - radius + 1, min_cell[1]), min(cy + radius - 1, max_cell[1]) + 1
+        )
+        for x in (cx - radius, cx + radius):
+            if min_cell[0] <= x <= max_cell[0]:
+                for y in y_range:
+                    yield x, y
+
+    def candidates(self, pos: Coordinates, k: int = 1) -> list[int]:
+        """Returns the IDs of nodes that could be among the `k` nearest to the provided position.
+
+        - At least `k` IDs are returned, unless there are fewer than `k` nodes in the index
+        - The IDs are sorted by approximate (projected) distance
+        - Only the cells inside the box around every node are checked, so this never checks more cells than that
+          box has, however far away the position is
+        - Further than `FAR_METERS` outside that box, the flat projection is too distorted to narrow down the
+          candidates, so every node is checked with `nearest_by_scan()` instead
+        """
+        if self._min_cell is None or self._max_cell is None:
+            return []
+        x, y = self.project(pos)
+        centre = self._cell_of(x, y)
+        # The furthest ring that could possibly contain any nodes
+        max_radius = max(
+            abs(centre[0] - self._min_cell[0]),
+            abs(centre[0] - self._max_cell[0]),
+            abs(centre[1] - self._min_cell[1]),
+            abs(centre[1] - self._max_cell[1]),
+        )
+        # Rings closer than this can't contain any nodes, because they're outside the grid
+        min_radius = max(
+            self._min_cell[0] - centre[0],
+            centre[0] - self._max_cell[0],
+            self._min_cell[1] - centre[1],
+            centre[1] - self._max_cell[1],
+            0,
+        )
+        if min_radius * self.cell_size > FAR_METERS:
+            node_ids, lats, lons = self._every_node()
+            return [node_ids[index] for index in nearest_by_scan(pos, k, lats, lons)]
+        found: list[tuple[float, int]] = []
+        for radius in range(min_radius, max_radius + 1):
+            for cell in self._ring(centre, radius, self._min_cell, self._max_cell):
+                for node_id, node_x, node_y in self._cells.get(cell, ()):
+                    distance = ((node_x - x) ** 2 + (node_y - y) ** 2) ** 0.5
+                    found.append((distance, node_id))
+            if len(found) >= k:
+                found.sort()
+                cutoff = found[k - 1][0] * (1 + self.TOLERANCE) + self.SLACK_METERS
+                # Anything in a ring we haven't looked at yet is at least this far away
+                if radius * self.cell_size >= cutoff:
+                    break
+        if not found:
+            return []
+        found.sort()
+        cutoff = found[min(k, len(found)) - 1][0] * (1 + self.TOLERANCE)
+        cutoff += self.SLACK_METERS
+        return [node_id for distance, node_id in found if distance <= cutoff]
+
+    def _every_node(self) -> tuple[list[int], numpy.ndarray, numpy.ndarray]:
+        """Returns the IDs and coordinates of every node in the index, unprojecting their positions"""
+        if self._all_nodes is None:
+            entries = [entry for cell in self._cells.values() for entry in cell]
+            xs = numpy.array([x for _, x, _ in entries], dtype=numpy.float64)
+            ys = numpy.array([y for _, _, y in entries], dtype=numpy.float64)
+            self._all_nodes = (
+                [node_id for node_id, _, _ in entries],
+                ys / METERS_PER_DEGREE,
+                xs / self._x_scale,
+            )
+        return self._all_nodes
+
+    def nearest(
+        self,
+        pos: Coordinates,
+        k: int,
+        position_of: Callable[[int], Coordinates],
+    ) -> list[int]:
+        """Returns the IDs of the `k` nodes closest to the provided position, nearest first.
+
+        - Only the final candidates get checked with the (slower) geodesic distance
+        - `position_of` should return the coordinates of a node, given its ID
+        """
+        candidates = self.candidates(pos, k)
+        candidates.sort(
+            key=lambda node_id: distance_between_points(pos, position_of(node_id))
+        )
+        return candidates[:k]
+
+
+def nearest_by_scan(pos: Coordinates, k: int, lats: Buffer, lons: Buffer) -> list[int]:
+    """Returns the indexes of the `k` positions closest to `pos`, nearest first, without needing an index.
+
+    - Checks every position at once with NumPy, which is quicker than building a `SpatialIndex`
+      if we only need to answer a few queries (e.g. just after loading a graph snapshot)
+    - `lats` and `lons` can be anything that supports the buffer protocol, e.g. arrays or memoryviews
+    - Positions are narrowed down with straight-line distances through the Earth, which rule out nodes exactly
+      up to `FAR_METERS` away. Further than that, the result is the `k` nearest by straight-line distance
+      (which only differs from the geodesic order for positions at almost exactly the same distance),
+      because otherwise almost every position would need checking with the slow geodesic distance.
+    """
+    all_lats = numpy.frombuffer(lats, dtype=numpy.float64)
+    all_lons = numpy.frombuffer(lons, dtype=numpy.float64)
+    if len(all_lats) == 0:
+        return []
+    x, y, z = earth_centred_position(pos[0], pos[1])
+    distances = numpy.linalg.norm(
+        earth_centred_positions(all_lats, all_lons) - (x, y, z), axis=1
+    )
+    k = min(k, len(distances))
+    kth_distance = numpy.partition(distances, k - 1)[k - 1]
+    if kth_distance > FAR_METERS:
+        candidates = numpy.argpartition(distances, k - 1)[:k].tolist()
+    else:
+        cutoff = kth_distance + SpatialIndex.SLACK_METERS
+        candidates = numpy.flatnonzero(distances <= cutoff).tolist()
+    candidates.sort(
+        key=lambda index: distance_between_points(
+            pos, (float(all_lats[index]), float(all_lons[index]))
+        )
+    )
+    return candidates[:k]
@@ -0,0 +1,404 @@
+from random import Random
+from osm_data_types import Coordinates
+
+# Roughly 100 m between streets, around Guildford
+ORIGIN: Coordinates = (51.26, -0.41)
+BLOCK_LAT = 0.0009
+BLOCK_LON = 0.0014
+# Extra nodes along each street between two junctions, like real (slightly curvy) streets have
+NODES_PER_BLOCK = 4
+
+# (value, relative frequency) pairs for each tag, loosely based on a typical English town
+STREET_HIGHWAYS = [
+    ("residential", 12),
+    ("unclassified", 3),
+    ("tertiary", 3),
+    ("secondary", 2),
+    ("primary", 1),
+    ("service", 3),
+    ("living_street", 1),
+]
+STREET_SIDEWALKS = [("both", 6), ("separate", 2), ("left", 1), ("right", 1), ("no", 2)]
+STREET_MAXSPEEDS = [("20 mph", 3), ("30 mph", 8), ("40 mph", 2), ("60 mph", 1)]
+STREET_SURFACES = [("asphalt", 10), ("paving_stones", 1), ("sett", 1)]
+PATH_HIGHWAYS = [
+    ("footway", 8),
+    ("path", 4),
+    ("cycleway", 1),
+    ("bridleway", 1),
+    ("steps", 1),
+    ("track", 1),
+]
+PATH_SURFACES = [
+    ("asphalt", 5),
+    ("paving_stones", 2),
+    ("gravel", 2),
+    ("compacted", 2),
+    ("dirt", 2),
+    ("grass", 1),
+    ("mud", 1),
+]
+SAC_SCALES = [("hiking", 8), ("mountain_hiking", 2), ("demanding_mountain_hiking", 1)]
+CROSSINGS = [
+    ("uncontrolled", 5),
+    ("zebra", 3),
+    ("traffic_signals", 3),
+    ("unmarked", 3),
+    ("informal", 1),
+]
+KERBS = [("lowered", 5), ("flush", 2), ("raised", 2)]
+BARRIERS = [("gate", 4), ("kissing_gate", 2), ("stile", 2), ("bollard", 3)]
+
+
+def choose(random: Random, values: list[tuple[str, int]]) -> str:
+    return random.choices(
+        [value for value, _ in values], [weight for _, weight in values]
+    )[0]
+
+
+def synthetic_overpass_json(size: int, seed: int = 0) -> dict:
+    """Generates a town-like grid of streets and footpaths, as an Overpass API JSON response
+
+    - There are `size` streets in each direction. Each street has `NODES_PER_BLOCK` nodes between junctions,
+      so there are about `size * size * (1 + 2 * NODES_PER_BLOCK)` nodes in total
+    - About a third of the blocks have a footpath across them, with a crossing where it meets a street,
+      and sometimes a barrier halfway along
+    - The same `size` and `seed` always give the same data, so benchmark runs can be compared
+    """
+    random = Random(seed)
+    elements: list[dict] = []
+    nodes_by_id: dict[int, dict] = {}
+    next_id = 1
+
+    def add_node(lat: float, lon: float, tags: dict | None = None) -> int:
+        nonlocal next_id
+        node = {"type": "node", "id": next_id, "lat": lat, "lon": lon}
+        if tags:
+            node["tags"] = tags
+        elements.append(node)
+        nodes_by_id[next_id] = node
+        next_id += 1
+        return node["id"]
+
+    def add_way(nodes: list[int], tags: dict):
+        nonlocal next_id
+        elements.append({"type": "way", "id": next_id, "nodes": nodes, "tags": tags})
+        next_id += 1
+
+    def jitter() -> float:
+        return random.uniform(-0.00005, 0.00005)
+
+    def street_tags() -> dict:
+        tags = {"highway": choose(random, STREET_HIGHWAYS)}
+        if tags["highway"] != "service":
+            tags["sidewalk"] = choose(random, STREET_SIDEWALKS)
+            tags["maxspeed"] = choose(random, STREET_MAXSPEEDS)
+        if random.random() < 0.6:
+            tags["surface"] = choose(random, STREET_SURFACES)
+        if random.random() < 0.5:
+            tags["lit"] = "yes" if random.random() < 0.8 else "no"
+        if random.random() < 0.1:
+            tags["access"] = random.choice(["private", "customers", "destination"])
+        return tags
+
+    def path_tags() -> dict:
+        tags = {"highway": choose(random, PATH_HIGHWAYS)}
+        if random.random() < 0.7:
+            tags["surface"] = choose(random, PATH_SURFACES)
+        if tags["highway"] in ["path", "track", "bridleway"]:
+            if random.random() < 0.4:
+                tags["sac_scale"] = choose(random, SAC_SCALES)
+            if random.random() < 0.5:
+                tags["designation"] = random.choice(
+                    ["public_footpath", "public_bridleway", "restricted_byway"]
+                )
+        if random.random() < 0.3:
+            tags["lit"] = random.choice(["yes", "no"])
+        if random.random() < 0.2:
+            tags["width"] = random.choice(["1", "1.5", "2", "3 m"])
+        if tags["highway"] == "steps" and random.random() < 0.5:
+            tags["incline"] = random.choice(["up", "down"])
+        if random.random() < 0.05:
+            tags["covered"] = "yes"
+        return tags
+
+    def crossing_tags() -> dict:
+        tags = {"highway": "crossing", "crossing": choose(random, CROSSINGS)}
+        if random.random() < 0.6:
+            tags["kerb"] = choose(random, KERBS)
+        if random.random() < 0.5:
+            tags["tactile_paving"] = random.choice(["yes", "no"])
+        if tags["crossing"] == "traffic_signals" and random.random() < 0.5:
+            tags["traffic_signals:sound"] = random.choice(["yes", "no"])
+        if random.random() < 0.1:
+            tags["crossing:island"] = "yes"
+        return tags
+
+    junctions = [
+        [
+            add_node(
+                ORIGIN[0] + row * BLOCK_LAT + jitter(),
+                ORIGIN[1] + column * BLOCK_LON + jitter(),
+            )
+            for column in range(size)
+        ]
+        for row in range(size)
+    ]
+
+    def street_nodes(a: tuple[int, int], b: tuple[int, int]) -> list[int]:
+        """Adds the nodes along the street between two neighbouring junctions, returning them (without the ends)"""
+        lat_a, lon_a = ORIGIN[0] + a[0] * BLOCK_LAT, ORIGIN[1] + a[1] * BLOCK_LON
+        lat_b, lon_b = ORIGIN[0] + b[0] * BLOCK_LAT, ORIGIN[1] + b[1] * BLOCK_LON
+        nodes = []
+        for step in range(1, NODES_PER_BLOCK + 1):
+            fraction = step / (NODES_PER_BLOCK + 1)
+            nodes.append(
+                add_node(
+                    lat_a + (lat_b - lat_a) * fraction + jitter(),
+                    lon_a + (lon_b - lon_a) * fraction + jitter(),
+                )
+            )
+        return nodes
+
+    # Streets running east-west, then north-south, each made of ways a few blocks long
+    middles: dict[tuple[tuple[int, int], tuple[int, int]], int] = {}
+    for horizontal in [True, False]:
+        for line in range(size):
+            position = 0
+            while position < size - 1:
+                length = min(random.randint(1, 4), size - 1 - position)
+                nodes = []
+                for block in range(position, position + length):
+                    a = (line, block) if horizontal else (block, line)
+                    b = (line, block + 1) if horizontal else (block + 1, line)
+                    nodes.append(junctions[a[0]][a[1]])
+                    between = street_nodes(a, b)
+                    middles[(a, b)] = between[len(between) // 2]
+                    nodes.extend(between)
+                end = (
+                    (line, position + length)
+                    if horizontal
+                    else (position + length, line)
+                )
+                nodes.append(junctions[end[0]][end[1]])
+                add_way(nodes, street_tags())
+                position += length
+
+    # Footpaths across some of the blocks, from the middle of the west side to the middle of the east side
+    for row in range(size - 1):
+        for column in range(size - 1):
+            if random.random() > 0.35:
+                continue
+            west = middles[((row, column), (row + 1, column))]
+            east = middles[((row, column + 1), (row + 1, column + 1))]
+            # The ends of the footpath are where it crosses the street
+            for end in [west, east]:
+                node = nodes_by_id[end]
+                if "tags" not in node and random.random() < 0.7:
+                    node["tags"] = crossing_tags()
+            middle_tags = None
+            if random.random() < 0.2:
+                middle_tags = {"barrier": choose(random, BARRIERS)}
+                if middle_tags["barrier"] == "gate" and random.random() < 0.1:
+                    middle_tags["locked"] = "yes"
+            middle = add_node(
+                ORIGIN[0] + (row + 0.5) * BLOCK_LAT + jitter(),
+                ORIGIN[1] + (column + 0.5) * BLOCK_LON + jitter(),
+                middle_tags,
+            )
+            add_way([west, middle, east], path_tags())
+
+    return {"version": 0.6, "generator": "synthetic_osm", "elements": elements}
+
+
+# Values for each tag in `synthetic_tag_corpus()`, including some that routing doesn't know about
+CORPUS_ACCESS_VALUES = [
+    "yes",
+    "no",
+    "private",
+    "customers",
+    "permit",
+    "agricultural",
+    "forestry",
+    "delivery",
+    "military",
+    "destination",
+    "permissive",
+    "designated",
+    "use_sidepath",
+    "",
+]
+CORPUS_WAY_TAGS: dict[str, list[str]] = {
+    "highway": [
+        "motorway",
+        "motorway_link",
+        "trunk",
+        "trunk_link",
+        "primary",
+        "primary_link",
+        "secondary",
+        "secondary_link",
+        "tertiary",
+        "tertiary_link",
+        "unclassified",
+        "residential",
+        "living_street",
+        "service",
+        "road",
+        "footway",
+        "bridleway",
+        "steps",
+        "corridor",
+        "path",
+        "cycleway",
+        "track",
+        "pedestrian",
+        "construction",
+        "platform",
+    ],
+    "service": [
+        "driveway",
+        "parking_aisle",
+        "parking",
+        "alley",
+        "drive_through",
+        "slipway",
+        "layby",
+        "emergency_access",
+        "bus",
+        "siding",
+    ],
+    "access": CORPUS_ACCESS_VALUES,
+    "foot": CORPUS_ACCESS_VALUES,
+    "sidewalk": ["both", "left", "right", "no", "none", "separate", "lane", "yes"],
+    "sidewalk:left": ["yes", "no", "separate", "lane", "none", "maybe"],
+    "sidewalk:right": ["yes", "no", "separate", "lane", "none", "maybe"],
+    "sidewalk:both": ["yes", "no", "separate", "lane", "none", "maybe"],
+    "maxspeed": [
+        "20 mph",
+        "30 mph",
+        "60 mph",
+        "70 mph",
+        "50",
+        "100",
+        "signals",
+        "30 knots",
+        "0",
+    ],
+    "lanes": ["1", "2", "3", "2;3"],
+    "shoulder": ["yes", "no", "left", "none"],
+    "verge": ["yes", "no", "both"],
+    "segregated": ["yes", "no"],
+    "informal": ["yes", "no"],
+    "designation": [
+        "public_footpath",
+        "public_bridleway",
+        "restricted_byway",
+        "byway_open_to_all_traffic",
+        "public_right_of_way",
+        "core_path",
+        "permissive_footpath",
+    ],
+    "operator": ["Surrey County Council"],
+    "sac_scale": [
+        "strolling",
+        "hiking",
+        "mountain_hiking",
+        "demanding_mountain_hiking",
+        "alpine_hiking",
+        "demanding_alpine_hiking",
+        "difficult_alpine_hiking",
+        "T2",
+    ],
+    "trail_visibility": [
+        "excellent",
+        "good",
+        "intermediate",
+        "bad",
+        "horrible",
+        "no",
+        "fair",
+    ],
+    "trailblazed": ["yes", "no", "blazes", ""],
+    "width": ["0.1", "1", "2", "2.5", "5", "6", "3 m", "2 ft", "wide"],
+    "est_width": ["0.15", "1.5", "4", "10", "narrow"],
+    "obstacle": ["vegetation", "fallen_tree"],
+    "footway": ["sidewalk", "crossing", "access_aisle"],
+    "wheelchair": ["yes", "no", "limited", "designated", "bad"],
+    "surface": [
+        "asphalt",
+        "chipseal",
+        "paving_stones",
+        "concrete",
+        "sett",
+        "cobblestone",
+        "wood",
+        "compacted",
+        "fine_gravel",
+        "gravel",
+        "dirt",
+        "grass",
+        "sand",
+        "mud",
+        "ice",
+    ],
+    "smoothness": [
+        "excellent",
+        "good",
+        "intermediate",
+        "bad",
+        "very_bad",
+        "horrible",
+        "very_horrible",
+        "impassable",
+    ],
+    "incline": ["up", "down", "0%", "5%", "-10%", "2°", "steep"],
+    "ford": ["yes", "stepping_stones", "no"],
+    "lit": ["yes", "no", "24/7", "automatic", "limited", "disused", "sunset-sunrise"],
+    "indoor": ["yes", "corridor", "no"],
+    "covered": ["yes", "no", "arcade"],
+    "tunnel": ["yes", "building_passage", "no"],
+    "shelter": ["yes", "no"],
+}
+CORPUS_NODE_TAGS: dict[str, list[str]] = {
+    "highway": ["crossing", "crossing", "crossing", "traffic_signals", "stop"],
+    "crossing": [value for value, _ in CROSSINGS] + ["no", "marked", "traffic_signals"],
+    "crossing_ref": ["zebra", "pelican", "toucan"],
+    "crossing:markings": ["yes", "no", "zebra", "surface"],
+    "traffic_signals": ["yes", "crossing", "no"],
+    "traffic_calming": ["table", "bump"],
+    "crossing:continuous": ["yes", "no"],
+    "crossing:island": ["yes", "no"],
+    "traffic_signals:sound": ["yes", "no", "locate"],
+    "kerb": ["lowered", "flush", "raised", "rolled"],
+    "tactile_paving": ["yes", "no", "incorrect"],
+    "barrier": [value for value, _ in BARRIERS]
+    + ["sliding_gate", "wicket_gate", "barrier_board"],
+    "locked": ["yes", "no"],
+    "open": ["yes", "partial", "no"],
+    "access": CORPUS_ACCESS_VALUES,
+    "foot": CORPUS_ACCESS_VALUES,
+}
+
+
+def synthetic_tag_corpus(
+    count: int, seed: int = 0
+) -> tuple[list[dict[str, str]], list[dict[str, str]]]:
+    """Generates `count` random way tag sets and `count` random node tag sets
+
+    - Every tag set has a `highway=*` tag, and each other tag is added with a value from `CORPUS_WAY_TAGS`
+      (or `CORPUS_NODE_TAGS`) a quarter of the time, so unusual combinations turn up too
+    - For checking that two ways of weighing tags agree (see `benchmark.py`), rather than for building graphs
+    """
+    random = Random(seed)
+
+    def tag_set(values: dict[str, list[str]]) -> dict[str, str]:
+        return {
+            key: random.choice(choices)
+            for key, choices in values.items()
+            if key == "highway" or random.random() < 0.25
+        }
+
+    way_tags = [tag_set(CORPUS_WAY_TAGS) for _ in range(count)]
+    node_tags = [tag_set(CORPUS_NODE_TAGS) for _ in range(count)]
+    return way_tags, node_tags
@@ -0,0 +1,116 @@
+from typing import Callable, Sequence
+import numpy
+
+# Mixed-radix combination codes are squeezed back down (with `numpy.unique()`) before they could overflow
+MAX_COMBINATION_CODE = 2**62
+
+
+def smallest_code_type(category_count: int) -> type:
+    if category_count <= 2**8:
+        return numpy.uint8
+    if category_count <= 2**16:
+        return numpy.uint16
+    return numpy.uint32
+
+
+class TagColumns:
+    """The values of the routing-relevant tags of every edge, stored as one small-integer column per tag key
+
+    - Each key has a list of categories (the distinct values it has), where code 0 means that the tag is missing
+    - `codes[key][i]` is the category of the key's value on edge `i`, so bulk operations can use NumPy
+      instead of looking at one tags dict per edge
+    - Only the keys that were asked for are stored, so edges that only differ in other tags look identical
+    """
+
+    def __init__(
+        self,
+        keys: list[str],
+        categories: dict[str, list[str | None]],
+        codes: dict[str, numpy.ndarray],
+    ):
+        self.keys = keys
+        self.categories = categories
+        self.codes = codes
+        # Built the first time they're needed, see `combinations()`
+        self._combination_tags: list[dict[str, str]] | None = None
+        self._edge_combinations: numpy.ndarray | None = None
+
+    @classmethod
+    def from_tag_sets(
+        cls,
+        tag_sets: Sequence[dict[str, str]],
+        edge_tags_keys: Sequence[int] | numpy.ndarray,
+        keys: list[str],
+    ) -> "TagColumns":
+        """Builds the columns from a graph's interned tag sets (see `TagSetInterner`) and the tags key of each edge
+
+        - Each tag set is only looked at once, and then each column is filled in for every edge in one go
+        """
+        tag_set_indexes = numpy.asarray(edge_tags_keys)
+        categories: dict[str, list[str | None]] = {}
+        codes: dict[str, numpy.ndarray] = {}
+        for key in keys:
+            value_codes: dict[str, int] = {}
+            tag_set_codes = [
+                (
+                    value_codes.setdefault(tags[key], len(value_codes) + 1)
+                    if key in tags
+                    else 0
+                )
+                for tags in tag_sets
+            ]
+            code_type = smallest_code_type(len(value_codes) + 1)
+            categories[key] = [None, *value_codes]
+            codes[key] = numpy.array(tag_set_codes, dtype=code_type)[tag_set_indexes]
+        return cls(keys, categories, codes)
+
+    def __len__(self):
+        return len(self.codes[self.keys[0]]) if self.keys else 0
+
+    def edge_tags(self, edge_index: int) -> dict[str, str]:
+        """Returns the (routing-relevant) tags of one edge, as a dict"""
+        return {
+            key: self.categories[key][self.codes[key][edge_index]]  # type: ignore
+            for key in self.keys
+            if self.codes[key][edge_index]
+        }
+
+    def combinations(self) -> tuple[list[dict[str, str]], numpy.ndarray]:
+        """Returns the distinct combinations of tags that the edges have, and which combination each edge has
+
+        - Combinations are found by folding the columns into one integer code per edge, then finding the unique
+          codes. This only depends on the edges, so it's done once and reused for every set of routing options.
+        """
+        if self._combination_tags is not None:
+            return self._combination_tags, self._edge_combinations  # type: ignore
+        combined = numpy.zeros(len(self), dtype=numpy.int64)
+        combination_count = 1
+        for key in self.keys:
+            category_count = len(self.categories[key])
+            if category_count == 1:
+                continue
+            if combination_count * category_count >= MAX_COMBINATION_CODE:
+                distinct, combined = numpy.unique(combined, return_inverse=True)
+                combination_count = len(distinct)
+            combined = combined * category_count + self.codes[key]
+            combination_count *= category_count
+        _, first_edges, edge_combinations = numpy.unique(
+            combined, return_index=True, return_inverse=True
+        )
+        self._combination_tags = [
+            self.edge_tags(edge_index) for edge_index in first_edges.tolist()
+        ]
+        self._edge_combinations = edge_combinations.reshape(-1)
+        return self._combination_tags, self._edge_combinations
+
+    def evaluate(self, weigh: Callable[[dict[str, str]], float]) -> numpy.ndarray:
+        """Returns `weigh(tags)` for every edge, only calling it once for each distinct combination of tags
+
+        - `weigh` must only depend on the keys that the columns store, e.g. `CompiledProfile.way_weight()`
+          with columns built for `profile_way_tag_keys()`
+        """
+        combination_tags, edge_combinations = self.combinations()
+        combination_weights = numpy.array(
+            [weigh(tags) for tags in combination_tags], dtype=numpy.float64
+        )
+        return combination_weights[edge_combinations]
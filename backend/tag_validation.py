@@ -0,0 +1,135 @@
+from osm_data_types import (
+    SIDEWALK_NO_VALUES,
+    SIDEWALK_YES_VALUES,
+    TAG_VALUE_PARSERS,
+    parsed_tag_value,
+)
+
+# Values that `RouteCalculator` knows how to handle, for tags where anything else is ignored
+KNOWN_WAY_TAG_VALUES: dict[str, list[str]] = {
+    "sac_scale": [
+        "strolling",
+        "hiking",
+        "mountain_hiking",
+        "demanding_mountain_hiking",
+        "alpine_hiking",
+        "demanding_alpine_hiking",
+        "difficult_alpine_hiking",
+    ],
+    "trail_visibility": ["excellent", "good", "intermediate", "bad", "horrible", "no"],
+    "sidewalk": ["both", "left", "right", "no", "none", "separate", "lane"],
+    "sidewalk:left": SIDEWALK_YES_VALUES + SIDEWALK_NO_VALUES,
+    "sidewalk:right": SIDEWALK_YES_VALUES + SIDEWALK_NO_VALUES,
+    "sidewalk:both": SIDEWALK_YES_VALUES + SIDEWALK_NO_VALUES,
+}
+KNOWN_CROSSING_VALUES = [
+    "no",
+    "zebra",
+    "traffic_signals",
+    "uncontrolled",
+    "unmarked",
+    "informal",
+]
+
+# (tag key, tag value, what's wrong with it)
+type TagProblem = tuple[str, str, str]
+
+
+def way_tag_problems(tags: dict[str, str]) -> list[TagProblem]:
+    """Checks the tags of a way, parsing (and caching) any numeric values that routing will need"""
+    problems = []
+    for key in TAG_VALUE_PARSERS:
+        value = tags.get(key)
+        if value:
+            _, problem = parsed_tag_value(key, value)
+            if problem is not None:
+                problems.append((key, value, problem))
+    for key, known_values in KNOWN_WAY_TAG_VALUES.items():
+        value = tags.get(key)
+        if value and value not in known_values:
+            problems.append((key, value, "Unknown value, so it's ignored"))
+    if tags.get("highway") == "road":
+        problems.append(
+            ("highway", "road", "Unknown type of road, given a weight of 1")
+        )
+    return problems
+
+
+def node_tag_problems(tags: dict[str, str]) -> list[TagProblem]:
+    """Checks the tags of a node (only crossings have tags that we parse)"""
+    crossing = tags.get("crossing")
+    if (
+        tags.get("highway") == "crossing"
+        and crossing
+        and crossing not in KNOWN_CROSSING_VALUES
+    ):
+        return [
+            ("crossing", crossing, "Unknown crossing type, given the default weight")
+        ]
+    return []
+
+
+class TagValidationReport:
+    """Problems with the tags of a graph's ways and nodes, found while the graph is being built
+
+    - Each distinct (element type, tag, value) problem is listed once, with the number of elements
+      that have it and the IDs of the first few, so routing never has to warn about tags
+    - Ways with the same tag set share their problems, so each tag set is only checked once
+    """
+
+    def __init__(self, max_examples: int = 3):
+        self.max_examples = max_examples
+        self.problems: dict[tuple[str, str, str], dict] = {}
+        # Problems of each tag set that's been checked, keyed by tags key
+        self.tag_set_problems: dict[int, list[TagProblem]] = {}
+
+    def __len__(self):
+        return len(self.problems)
+
+    def add(self, element_type: str, element_id: int, problem: TagProblem):
+        key, value, message = problem
+        row = self.problems.get((element_type, key, value))
+        if row is None:
+            row = {
+                "element_type": element_type,
+                "tag": key,
+                "value": value,
+                "problem": message,
+                "count": 0,
+                "example_ids": [],
+            }
+            self.problems[(element_type, key, value)] = row
+        row["count"] += 1
+        if len(row["example_ids"]) < self.max_examples:
+            row["example_ids"].append(element_id)
+
+    def check_way(self, way_id: int, tags_key: int, tags: dict[str, str]):
+        problems = self.tag_set_problems.get(tags_key)
+        if problems is None:
+            problems = way_tag_problems(tags)
+            self.tag_set_problems[tags_key] = problems
+        for problem in problems:
+            self.add("way", way_id, problem)
+
+    def check_node(self, node_id: int, tags: dict[str, str]):
+        for problem in node_tag_problems(tags):
+            self.add("node", node_id, problem)
+
+    def rows(self) -> list[dict]:
+        """Returns every problem, most common first"""
+        return sorted(self.problems.values(), key=lambda row: -row["count"])
+
+    def summary(self) -> str:
+        if not self.problems:
+            return "No problems with tag values"
+        lines = [f"{len(self.problems)} problems with tag values:"]
+        for row in self.rows():
+            examples = ", ".join(
+                f"{row['element_type']}/{element_id}"
+                for element_id in row["example_ids"]
+            )
+            lines.append(
+                f"  {row['tag']}={row['value']}: {row['problem']} "
+                f"({row['count']} {row['element_type']}s, e.g. {examples})"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,81 @@
+"""Routing options, synthetic journeys and search helpers that the tests share"""
+
+from random import Random
+from typing import Callable
+from osm_data_types import OSMWayData
+from synthetic_osm import BLOCK_LAT, BLOCK_LON, ORIGIN
+
+# The same options as the demo route in main.py
+DEFAULT_OPTIONS = {
+    "unpaved_paths": 0,
+    "paved_paths": 0,
+    "covered_paths": 1,
+    "indoor_paths": 0,
+    "pavements": 0,
+    "lit_paths": 0,
+    "steps": 0,
+    "prefer_marked_crossings": False,
+    "prefer_traffic_light_crossings": False,
+    "prefer_audible_crossings": False,
+    "prefer_dipped_kerbs": False,
+    "prefer_tactile_paving": False,
+    "allow_private_access": False,
+    "allow_customer_access": True,
+    "allow_walking_on_roads": True,
+    "allow_higher_traffic_roads": True,
+    "rights_of_way": 1,
+    "maintained_paths": 1,
+    "desire_paths": 0,
+    "treacherous_paths": -1,
+    "wheelchair_accessible": False,
+}
+
+
+def random_options(random: Random) -> dict:
+    """Returns routing options with a random value for each option in `DEFAULT_OPTIONS`"""
+    return {
+        key: (
+            random.choice([True, False])
+            if isinstance(value, bool)
+            else random.choice([-1, 0, 1])
+        )
+        for key, value in DEFAULT_OPTIONS.items()
+    }
+
+
+def option_sets(seed: int, count: int) -> list[dict]:
+    """Returns `DEFAULT_OPTIONS` followed by `count` random sets of options"""
+    random = Random(seed)
+    return [DEFAULT_OPTIONS] + [random_options(random) for _ in range(count)]
+
+
+def random_journeys(
+    size: int, seed: int, count: int
+) -> list[tuple[tuple[float, float], tuple[float, float]]]:
+    """Returns (start, end) points anywhere on a synthetic grid with `size` streets in each direction"""
+    random = Random(seed)
+
+    def random_point():
+        return (
+            ORIGIN[0] + random.uniform(0, size - 1) * BLOCK_LAT,
+            ORIGIN[1] + random.uniform(0, size - 1) * BLOCK_LON,
+        )
+
+    return [(random_point(), random_point()) for _ in range(count)]
+
+
+def random_node_pairs(graph, seed: int, count: int) -> list[tuple[int, int]]:
+    """Returns (start, end) pairs of the graph's node IDs"""
+    random = Random(seed)
+    nodes = sorted(graph.nodes())
+    return [(random.choice(nodes), random.choice(nodes)) for _ in range(count)]
+
+
+def path_weight(
+    graph, path: list[int], weight: Callable[[int, int, OSMWayData], float]
+) -> float:
+    """Adds up `weight(node_from, node_to, data)` along a path of node IDs"""
+    return sum(
+        weight(node_from, node_to, dict(graph.neighbours(node_from))[node_to])
+        for node_from, node_to in zip(path, path[1:])
+    )
@@ -0,0 +1,86 @@
+import pytest
+from compact_graph import CompactRoutingGraph
+from osm_data_types import TagSetInterner
+from routing_engine import RouteCalculator, RoutingEngine, RoutingOptions
+from routing_fixtures import DEFAULT_OPTIONS, random_journeys
+from synthetic_osm import synthetic_overpass_json
+
+SIZE = 20
+JOURNEYS = 10
+
+
+@pytest.fixture(scope="module")
+def graphs():
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(SIZE, 0))
+    return (
+        engine.compute_graph(ways, raw_nodes),
+        engine.compute_graph(ways, raw_nodes, compact=True),
+    )
+
+
+def test_compact_routes_match_networkx_routes(graphs):
+    graph, compact_graph = graphs
+    options = RoutingOptions(DEFAULT_OPTIONS)
+    calculator = RouteCalculator(graph, options)
+    compact_calculator = RouteCalculator(compact_graph, options)
+    for start, end in random_journeys(SIZE, 0, JOURNEYS):
+        route = calculator.calculate_route_a_star(start, end)
+        compact_route = compact_calculator.calculate_route_a_star(start, end)
+        assert compact_route.total_distance() == pytest.approx(route.total_distance())
+        # The compact search reads its weights from a column, instead of weighing edges one by one
+        assert compact_calculator.search_stats["weight_calls"] == 0
+
+
+def test_duplicate_edges_are_counted():
+    tag_sets = TagSetInterner()
+    tags_key, _ = tag_sets.intern({"highway": "footway"})
+    graph = CompactRoutingGraph.from_edges(
+        [(1, 2, 10, tags_key, 1.0), (2, 1, 11, tags_key, 2.0)],
+        {1: (0.0, 0.0), 2: (0.0, 0.001)},
+        {},
+        tag_sets,
+    )
+    assert graph.build_stats["duplicate_edges"] == 1
+    assert graph.edge_count() == 1
+
+
+def test_search_weight_column_matches_weighing_each_edge(graphs):
+    _, compact_graph = graphs
+    options = RoutingOptions(DEFAULT_OPTIONS)
+    calculator = RouteCalculator(compact_graph, options)
+    column = calculator.search_weight_column()
+    # Kept on the calculator, rather than on the graph
+    assert calculator.search_weight_column() is column
+    expected = compact_graph.weight_column(
+        RouteCalculator(compact_graph, options).calculate_weight
+    )
+    assert list(column) == pytest.approx(list(expected))
+
+
+def test_snapshot_round_trip(graphs, tmp_path):
+    _, compact_graph = graphs
+    path = tmp_path / "graph.snapshot"
+    compact_graph.save_snapshot(path)
+    loaded = CompactRoutingGraph.load_snapshot(path)
+
+    assert list(loaded.nodes()) == list(compact_graph.nodes())
+    assert loaded.edge_count() == compact_graph.edge_count()
+    # Node tag sets are stored after the way tag sets, which keep their keys
+    way_tag_sets = compact_graph.tag_sets.tag_sets
+    assert loaded.tag_sets.tag_sets[: len(way_tag_sets)] == way_tag_sets
+    for node_id in compact_graph.nodes():
+        assert loaded.node_position(node_id) == compact_graph.node_position(node_id)
+        assert loaded.node(node_id) == compact_graph.node(node_id)
+        assert list(loaded.neighbours(node_id)) == list(
+            compact_graph.neighbours(node_id)
+        )
+
+    options = RoutingOptions(DEFAULT_OPTIONS)
+    calculator = RouteCalculator(compact_graph, options)
+    loaded_calculator = RouteCalculator(loaded, options)
+    for start, end in random_journeys(SIZE, 1, JOURNEYS):
+        route = calculator.calculate_route_a_star(start, end)
+        loaded_route = loaded_calculator.calculate_route_a_star(start, end)
+        assert loaded_route.nodes == route.nodes
+        assert loaded_route.total_distance() == route.total_distance()
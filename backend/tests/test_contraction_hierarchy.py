@@ -0,0 +1,112 @@
+from math import inf
+import pickle
+import pytest
+from networkx import NetworkXNoPath
+from contraction_hierarchy import ContractionHierarchy
+from graph_search import dijkstra_distances
+from routing_engine import RouteCalculator, RoutingEngine, RoutingOptions
+from routing_fixtures import (
+    DEFAULT_OPTIONS,
+    option_sets,
+    path_weight,
+    random_node_pairs,
+)
+from synthetic_osm import synthetic_overpass_json
+
+SIZE = 8
+OPTION_SETS = 3
+PAIRS = 15
+
+
+@pytest.fixture(scope="module")
+def graph():
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(SIZE, 0))
+    return engine.compute_graph(ways, raw_nodes)
+
+
+def assert_matches_dijkstra(graph, hierarchy: ContractionHierarchy, weight, pairs):
+    for start, end in pairs:
+        distances = dijkstra_distances(graph, start, weight)
+        if end not in distances:
+            with pytest.raises(NetworkXNoPath):
+                hierarchy.shortest_path(start, end)
+            continue
+        path = hierarchy.shortest_path(start, end)
+        assert path[0] == start and path[-1] == end
+        assert path_weight(graph, path, weight) == pytest.approx(distances[end])
+
+
+@pytest.mark.parametrize("options", option_sets(0, OPTION_SETS))
+def test_hierarchy_routes_are_as_good_as_dijkstra(graph, options):
+    calculator = RouteCalculator(
+        graph, RoutingOptions(options), search_mode="contraction_hierarchy"
+    )
+    assert_matches_dijkstra(
+        graph,
+        calculator.contraction_hierarchy(),
+        calculator.calculate_weight,
+        random_node_pairs(graph, 0, PAIRS),
+    )
+
+
+def test_infinite_weight_edges_are_impassable(graph):
+    calculator = RouteCalculator(graph, RoutingOptions(DEFAULT_OPTIONS))
+    nodes = sorted(graph.nodes())
+    # Cut one node off completely, and block a few edges elsewhere
+    isolated = nodes[len(nodes) // 2]
+    blocked = {(isolated, neighbour) for neighbour, _ in graph.neighbours(isolated)}
+    for node in nodes[::7]:
+        blocked.update((node, neighbour) for neighbour, _ in graph.neighbours(node))
+    blocked |= {(node_b, node_a) for node_a, node_b in blocked}
+
+    def weight(node_from, node_to, data):
+        if (node_from, node_to) in blocked:
+            return inf
+        return calculator.calculate_weight(node_from, node_to, data)
+
+    hierarchy = ContractionHierarchy.build(graph, weight, "blocked")
+    pairs = random_node_pairs(graph, 1, PAIRS)
+    assert_matches_dijkstra(graph, hierarchy, weight, pairs)
+    for start, end in pairs:
+        if isolated not in (start, end):
+            with pytest.raises(NetworkXNoPath):
+                hierarchy.shortest_path(start, isolated)
+            with pytest.raises(NetworkXNoPath):
+                hierarchy.shortest_path(isolated, end)
+
+
+def test_saved_hierarchy_loads_and_routes_the_same(graph, tmp_path):
+    calculator = RouteCalculator(
+        graph, RoutingOptions(DEFAULT_OPTIONS), search_mode="contraction_hierarchy"
+    )
+    hierarchy = calculator.contraction_hierarchy()
+    path = str(tmp_path / "hierarchy.pickle")
+    hierarchy.save(path)
+    loaded = ContractionHierarchy.load(path)
+    assert loaded.fingerprint == hierarchy.fingerprint
+    assert loaded.ranks == hierarchy.ranks
+    assert loaded.upward == hierarchy.upward
+    assert loaded.downward == hierarchy.downward
+    assert loaded.shortcut_middles == hierarchy.shortcut_middles
+    for start, end in random_node_pairs(graph, 2, PAIRS):
+        assert loaded.shortest_path(start, end) == hierarchy.shortest_path(start, end)
+
+    # A calculator on another copy of the graph uses the loaded hierarchy rather than building its own
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(SIZE, 0))
+    other_graph = engine.compute_graph(ways, raw_nodes)
+    other_graph.contraction_hierarchies[loaded.fingerprint] = loaded
+    other_calculator = RouteCalculator(
+        other_graph,
+        RoutingOptions(DEFAULT_OPTIONS),
+        search_mode="contraction_hierarchy",
+    )
+    assert other_calculator.contraction_hierarchy() is loaded
+
+
+def test_loading_another_format_version_fails(tmp_path):
+    path = tmp_path / "hierarchy.pickle"
+    path.write_bytes(pickle.dumps({"version": ContractionHierarchy.FORMAT_VERSION + 1}))
+    with pytest.raises(ValueError):
+        ContractionHierarchy.load(str(path))
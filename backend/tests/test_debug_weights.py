@@ -0,0 +1,44 @@
+import pytest
+from debug_weights import DebugWeightRecorder
+from routing_engine import RouteCalculator, RoutingEngine, RoutingOptions
+from routing_fixtures import DEFAULT_OPTIONS, random_journeys
+from synthetic_osm import synthetic_overpass_json
+
+SIZE = 8
+JOURNEYS = 5
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_recorded_weights_match_route_segment_weights(compact):
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(SIZE, 0))
+    graph = engine.compute_graph(ways, raw_nodes, compact=compact)
+    options = RoutingOptions(DEFAULT_OPTIONS)
+    calculator = RouteCalculator(graph, options, debug_weights=True)
+    plain_calculator = RouteCalculator(graph, options)
+    for start, end in random_journeys(SIZE, 0, JOURNEYS):
+        route = calculator.calculate_route_a_star(start, end)
+        route_weights = calculator.route_segment_weights(route)
+        assert len(route_weights) == len(route.nodes) - 1
+        assert plain_calculator.route_segment_weights(route) == route_weights
+        recorded = {
+            (segment["pos_a"], segment["pos_b"]): segment
+            for segment in calculator.segment_weights()
+        }
+        for segment in route_weights:
+            assert recorded[(segment["pos_a"], segment["pos_b"])] == segment
+
+
+def test_recorder_keeps_every_row_as_it_grows():
+    recorder = DebugWeightRecorder(capacity=1)
+    for row in range(10):
+        recorder.record(row, row + 1, 100 + row % 3, row * 0.5, row * 2.0)
+    assert len(recorder) == 10
+    assert [
+        segment["weight"]
+        for segment in recorder.segment_weights(lambda node: (node, 0))
+    ] == [row * 0.5 for row in range(10)]
+    assert recorder.way_weights()[100] == {
+        "weight": 0.0,
+        "total_weight": sum(row * 2.0 for row in range(0, 10, 3)),
+    }
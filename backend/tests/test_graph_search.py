@@ -0,0 +1,91 @@
+from math import inf
+import pytest
+from networkx import NetworkXNoPath
+from graph_search import dijkstra_distances
+from routing_engine import RouteCalculator, RoutingEngine, RoutingOptions
+from routing_fixtures import option_sets, path_weight, random_node_pairs
+from synthetic_osm import synthetic_overpass_json
+
+SIZE = 8
+OPTION_SETS = 3
+PAIRS = 15
+
+
+@pytest.fixture(scope="module")
+def graphs():
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(SIZE, 0))
+    return (
+        engine.compute_graph(ways, raw_nodes),
+        engine.compute_graph(ways, raw_nodes, compact=True),
+    )
+
+
+def assert_routes_match_dijkstra(calculator: RouteCalculator, pairs):
+    graph = calculator.graph
+    for start, end in pairs:
+        distances = dijkstra_distances(graph, start, calculator.calculate_weight)
+        start_pos, end_pos = graph.node_position(start), graph.node_position(end)
+        if end not in distances:
+            with pytest.raises(NetworkXNoPath):
+                calculator.calculate_route_a_star(start_pos, end_pos)
+            continue
+        nodes = calculator.calculate_route_a_star(start_pos, end_pos).nodes
+        assert nodes[0] == start and nodes[-1] == end
+        assert path_weight(graph, nodes, calculator.calculate_weight) == pytest.approx(
+            distances[end]
+        )
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("options", option_sets(0, OPTION_SETS))
+def test_bidirectional_routes_are_as_good_as_dijkstra(graphs, compact, options):
+    calculator = RouteCalculator(
+        graphs[compact], RoutingOptions(options), search_mode="bidirectional_astar"
+    )
+    assert_routes_match_dijkstra(calculator, random_node_pairs(graphs[0], 0, PAIRS))
+
+
+@pytest.mark.parametrize("search_mode", ["astar", "bidirectional_astar"])
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("options", option_sets(1, OPTION_SETS))
+def test_landmark_routes_are_as_good_as_dijkstra(graphs, search_mode, compact, options):
+    calculator = RouteCalculator(
+        graphs[compact],
+        RoutingOptions(options),
+        search_mode=search_mode,
+        heuristic="landmarks",
+    )
+    assert_routes_match_dijkstra(calculator, random_node_pairs(graphs[0], 1, PAIRS))
+
+
+def test_landmarks_never_overestimate(graphs):
+    graph, _ = graphs
+    for options in option_sets(2, OPTION_SETS):
+        calculator = RouteCalculator(graph, RoutingOptions(options))
+        landmarks = calculator.landmarks()
+        for start, end in random_node_pairs(graph, 2, PAIRS):
+            distances = dijkstra_distances(graph, start, calculator.calculate_weight)
+            assert landmarks.heuristic(start, end) <= distances.get(end, inf) + 1e-9
+
+
+def test_landmarks_are_not_shared_between_options(graphs):
+    graph, _ = graphs
+    first_options, second_options = (
+        RoutingOptions(options) for options in option_sets(3, 1)
+    )
+    assert first_options.fingerprint() != second_options.fingerprint()
+    first = RouteCalculator(graph, first_options, heuristic="landmarks")
+    second = RouteCalculator(graph, second_options, heuristic="landmarks")
+    first_landmarks = first.landmarks()
+    second_landmarks = second.landmarks()
+    assert second_landmarks is not first_landmarks
+    assert first_landmarks.fingerprint == first.fingerprint
+    assert second_landmarks.fingerprint == second.fingerprint
+    # Each calculator keeps using the tables for its own options
+    assert first.landmarks() is first_landmarks
+    assert second.landmarks() is second_landmarks
+    # The second tables are built with the second options' weights
+    for start, end in random_node_pairs(graph, 3, PAIRS):
+        distances = dijkstra_distances(graph, start, second.calculate_weight)
+        assert second_landmarks.heuristic(start, end) <= distances.get(end, inf) + 1e-9
@@ -0,0 +1,48 @@
+from math import inf
+import pytest
+from graph_search import dijkstra_distances
+from routing_engine import RouteCalculator, RoutingEngine, RoutingOptions
+from routing_fixtures import DEFAULT_OPTIONS, option_sets, random_journeys
+from synthetic_osm import synthetic_overpass_json
+
+SIZE = 8
+
+
+@pytest.fixture(scope="module")
+def graph():
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(SIZE, 0))
+    return engine.compute_graph(ways, raw_nodes)
+
+
+@pytest.mark.parametrize("options", option_sets(0, 2))
+@pytest.mark.parametrize("budget", [0, 50, 300, inf])
+def test_weight_isochrone_matches_dijkstra(graph, options, budget):
+    calculator = RouteCalculator(graph, RoutingOptions(options))
+    (start, _), *_ = random_journeys(SIZE, 0, 1)
+    isochrone = calculator.calculate_isochrone(start, budget, "weight")
+    distances = dijkstra_distances(
+        graph, graph.nearest_node(start), calculator.calculate_weight
+    )
+    expected = {node: cost for node, cost in distances.items() if cost <= budget}
+    assert isochrone.nodes() == set(expected)
+    for node, cost in expected.items():
+        assert isochrone.costs[node] == pytest.approx(cost)
+
+
+@pytest.mark.parametrize("budget", [0, 30, 120])
+def test_time_isochrone_matches_dijkstra(graph, budget):
+    calculator = RouteCalculator(graph, RoutingOptions(DEFAULT_OPTIONS))
+    (start, _), *_ = random_journeys(SIZE, 1, 1)
+    isochrone = calculator.calculate_isochrone(start, budget)
+
+    def time(node_from, node_to, data):
+        if calculator.calculate_weight(node_from, node_to, data) == inf:
+            return inf
+        return calculator.estimate_time(data)
+
+    distances = dijkstra_distances(graph, graph.nearest_node(start), time)
+    assert isochrone.nodes() == {
+        node for node, cost in distances.items() if cost <= budget
+    }
+    assert 0 < len(isochrone.nodes()) < len(distances)
@@ -0,0 +1,99 @@
+import bz2
+import gzip
+import pytest
+from osm_file import iter_osm_file_elements
+from routing_engine import ROUTABLE_HIGHWAY_VALUES, RoutingEngine
+
+OSM_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6" generator="test">
+  <bounds minlat="51.27" minlon="-0.40" maxlat="51.28" maxlon="-0.39"/>
+  <node id="1" lat="51.2730" lon="-0.3980"/>
+  <node id="2" lat="51.2735" lon="-0.3975">
+    <tag k="highway" v="crossing"/>
+    <tag k="crossing" v="traffic_signals"/>
+  </node>
+  <node id="3" lat="51.2740" lon="-0.3970"/>
+  <node id="4" lat="51.2745" lon="-0.3965"><tag k="amenity" v="bench"/></node>
+  <node id="5" lat="51.2750" lon="-0.3960"/>
+  <node id="6" lat="51.2755" lon="-0.3955"/>
+  <way id="10">
+    <nd ref="1"/>
+    <nd ref="2"/>
+    <nd ref="3"/>
+    <tag k="highway" v="residential"/>
+    <tag k="name" v="Caf\xc3\xa9 Street"/>
+  </way>
+  <way id="11">
+    <nd ref="3"/>
+    <nd ref="5"/>
+    <tag k="highway" v="footway"/>
+  </way>
+  <way id="12">
+    <nd ref="4"/>
+    <nd ref="5"/>
+    <nd ref="6"/>
+    <nd ref="4"/>
+    <tag k="building" v="yes"/>
+  </way>
+  <way id="13">
+    <nd ref="5"/>
+    <nd ref="6"/>
+    <tag k="highway" v="proposed"/>
+  </way>
+  <relation id="20">
+    <member type="way" ref="10" role=""/>
+    <tag k="type" v="route"/>
+  </relation>
+</osm>
+"""
+
+EXPECTED_ELEMENTS = [
+    {"type": "node", "id": 1, "lat": 51.2730, "lon": -0.3980},
+    {
+        "type": "node",
+        "id": 2,
+        "lat": 51.2735,
+        "lon": -0.3975,
+        "tags": {"highway": "crossing", "crossing": "traffic_signals"},
+    },
+    {"type": "node", "id": 3, "lat": 51.2740, "lon": -0.3970},
+    {"type": "node", "id": 5, "lat": 51.2750, "lon": -0.3960},
+    {
+        "type": "way",
+        "id": 10,
+        "nodes": [1, 2, 3],
+        "tags": {"highway": "residential", "name": "Café Street"},
+    },
+    {"type": "way", "id": 11, "nodes": [3, 5], "tags": {"highway": "footway"}},
+]
+
+
+@pytest.fixture(
+    params=[
+        ("map.osm", bytes),
+        ("map.osm.gz", gzip.compress),
+        ("map.osm.bz2", bz2.compress),
+    ]
+)
+def osm_file(request, tmp_path):
+    name, compress = request.param
+    path = tmp_path / name
+    path.write_bytes(compress(OSM_XML))
+    return path
+
+
+def test_only_routable_ways_and_their_nodes_are_read(osm_file):
+    assert list(iter_osm_file_elements(osm_file, ROUTABLE_HIGHWAY_VALUES)) == (
+        EXPECTED_ELEMENTS
+    )
+
+
+def test_loaded_graph_matches_overpass_graph(osm_file):
+    engine = RoutingEngine()
+    graph = engine.load_osm_file(str(osm_file))
+    ways, raw_nodes = engine.parse_overpass_json({"elements": EXPECTED_ELEMENTS})
+    expected = engine.compute_graph(ways, raw_nodes)
+    assert sorted(graph.nodes()) == sorted(expected.nodes()) == [1, 2, 3, 5]
+    for node_id in expected.nodes():
+        assert graph.node_position(node_id) == expected.node_position(node_id)
+        assert dict(graph.neighbours(node_id)) == dict(expected.neighbours(node_id))
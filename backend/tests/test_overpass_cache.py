@@ -0,0 +1,144 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+import json
+import pytest
+import overpass_cache
+from osm_data_types import BoundingBox
+from overpass_cache import OverpassCache
+from routing_engine import RoutingEngine
+
+# A tiny Overpass response: one footway between two nodes
+RESPONSE = json.dumps(
+    {
+        "elements": [
+            {"type": "node", "id": 1, "lat": 51.0, "lon": -0.1},
+            {"type": "node", "id": 2, "lat": 51.001, "lon": -0.1},
+            {"type": "way", "id": 10, "nodes": [1, 2], "tags": {"highway": "footway"}},
+        ]
+    }
+).encode()
+
+BBOX = BoundingBox(51.0, -0.2, 51.1, -0.1)
+INNER_BBOX = BoundingBox(51.02, -0.18, 51.05, -0.15)
+
+
+class FakeOverpassHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)  # type: ignore
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def overpass_server():
+    """A local stand-in for the Overpass API, which records the path of every request it gets"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOverpassHandler)
+    server.requests = []  # type: ignore
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(overpass_cache, "time", clock)
+    return clock
+
+
+def engine_for(server, cache: OverpassCache) -> RoutingEngine:
+    host, port = server.server_address
+    return RoutingEngine(overpass_url=f"http://{host}:{port}/api", cache=cache)
+
+
+def test_miss_then_hit(overpass_server, clock, tmp_path):
+    engine = engine_for(overpass_server, OverpassCache(tmp_path))
+    ways, _ = engine.download_osm_data(BBOX)
+    assert len(overpass_server.requests) == 1
+    assert "51.0,-0.2,51.1,-0.1" in overpass_server.requests[0].replace("%2C", ",")
+
+    cached_ways, _ = engine.download_osm_data(BBOX)
+    assert len(overpass_server.requests) == 1
+    assert [way.id for way in cached_ways] == [way.id for way in ways]
+
+
+def test_cache_is_reused_between_instances(overpass_server, clock, tmp_path):
+    engine_for(overpass_server, OverpassCache(tmp_path)).download_osm_data(BBOX)
+    engine_for(overpass_server, OverpassCache(tmp_path)).download_osm_data(BBOX)
+    assert len(overpass_server.requests) == 1
+
+
+def test_bbox_inside_cached_bbox_is_served_from_cache(overpass_server, clock, tmp_path):
+    engine = engine_for(overpass_server, OverpassCache(tmp_path))
+    engine.download_osm_data(BBOX)
+    assert engine.fetch_overpass_response(INNER_BBOX) == RESPONSE
+    assert len(overpass_server.requests) == 1
+
+    # The other way around isn't covered by the cache
+    engine = engine_for(overpass_server, OverpassCache(tmp_path / "other"))
+    engine.download_osm_data(INNER_BBOX)
+    engine.download_osm_data(BBOX)
+    assert len(overpass_server.requests) == 3
+
+
+def test_expired_entries_are_refetched(overpass_server, clock, tmp_path):
+    engine = engine_for(overpass_server, OverpassCache(tmp_path, ttl=60))
+    engine.download_osm_data(BBOX)
+    clock.now += 59
+    engine.download_osm_data(BBOX)
+    assert len(overpass_server.requests) == 1
+
+    clock.now += 2
+    engine.download_osm_data(BBOX)
+    assert len(overpass_server.requests) == 2
+    clock.now += 1
+    engine.download_osm_data(BBOX)
+    assert len(overpass_server.requests) == 2
+
+
+def test_least_recently_used_entry_is_evicted(overpass_server, clock, tmp_path):
+    # Room for two responses, but not three
+    cache = OverpassCache(tmp_path, max_bytes=len(RESPONSE) * 5 // 2)
+    engine = engine_for(overpass_server, cache)
+    bboxes = [BoundingBox(51.0 + i, -0.2, 51.1 + i, -0.1) for i in range(3)]
+
+    engine.download_osm_data(bboxes[0])
+    clock.now += 1
+    engine.download_osm_data(bboxes[1])
+    clock.now += 1
+    # Using the first entry again makes the second one the least recently used
+    engine.download_osm_data(bboxes[0])
+    clock.now += 1
+    engine.download_osm_data(bboxes[2])
+    assert len(overpass_server.requests) == 3
+
+    cached_bboxes = [entry["bbox"] for entry in cache._entries]
+    assert cached_bboxes == [[51.0, -0.2, 51.1, -0.1], [53.0, -0.2, 53.1, -0.1]]
+    assert cache.total_bytes() <= cache.max_bytes
+    # Only the remaining entries' files (and the index) are left on disk
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        [entry["file"] for entry in cache._entries] + [OverpassCache.INDEX_FILE]
+    )
+
+    clock.now += 1
+    engine.download_osm_data(bboxes[0])
+    assert len(overpass_server.requests) == 3
+    engine.download_osm_data(bboxes[1])
+    assert len(overpass_server.requests) == 4
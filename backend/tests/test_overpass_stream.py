@@ -0,0 +1,65 @@
+import json
+import pytest
+from overpass_stream import iter_overpass_elements
+from synthetic_osm import synthetic_overpass_json
+
+# Numbers of every shape, multi-byte characters and keys either side of the elements
+RESPONSE = (
+    '{"version": 0.6, "osm3s": {"copyright": "© OpenStreetMap"},\n'
+    ' "elements": [\n'
+    '  {"type": "node", "id": 123456789, "lat": 51.2734712, "lon": -0.3979160},\n'
+    '  {"type": "node", "id": 2, "lat": -1.5e-7, "lon": 1E+2, "tags": {"name": "Café ☕"}},\n'
+    '  {"type": "way", "id": 3, "nodes": [123456789, 2], "tags": {"highway": "footway", "width": "1.5"}},\n'
+    '  [], 0, -0.25, true, null, "\\u00e9"\n'
+    ' ],\n "remark": "done"}'
+).encode()
+
+
+def chunked(data: bytes, size: int) -> list[bytes]:
+    return [data[index : index + size] for index in range(0, len(data), size)]
+
+
+def test_elements_match_json_loads_for_every_chunk_size():
+    expected = json.loads(RESPONSE)["elements"]
+    for size in range(1, len(RESPONSE) + 1):
+        assert list(iter_overpass_elements(chunked(RESPONSE, size))) == expected
+
+
+def test_synthetic_elements_match_json_loads():
+    response = synthetic_overpass_json(3, 0)
+    data = json.dumps(response).encode()
+    expected = response["elements"]
+    for size in [1, 7, 64, 4096]:
+        assert list(iter_overpass_elements(chunked(data, size))) == expected
+
+
+def test_truncated_responses_are_rejected():
+    for length in range(len(RESPONSE)):
+        with pytest.raises(ValueError):
+            json.loads(RESPONSE[:length])
+        for size in [1, 5, len(RESPONSE)]:
+            with pytest.raises(ValueError):
+                list(iter_overpass_elements(chunked(RESPONSE[:length], size)))
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        '{"elements":[,,{"a":1} {"b":2}]}',
+        '{"elements":[{"a":1} {"b":2}]}',
+        '{"elements":[{"a":1},,{"b":2}]}',
+        '{"elements":[{"a":1},]}',
+        '{"elements":[,]}',
+        '{,"elements":[]}',
+        '{"version":1 "elements":[]}',
+        '{"elements":[],}',
+        '{"elements":[]}}',
+        '{1:2,"elements":[]}',
+    ],
+)
+def test_invalid_separators_are_rejected(response):
+    with pytest.raises(ValueError):
+        json.loads(response)
+    for size in [1, len(response)]:
+        with pytest.raises(ValueError):
+            list(iter_overpass_elements(chunked(response.encode(), size)))
@@ -0,0 +1,51 @@
+from math import inf
+import pytest
+from networkx import NetworkXNoPath
+from routing_engine import RouteCalculator, RoutingEngine, RoutingOptions
+from routing_fixtures import option_sets, path_weight, random_journeys
+from synthetic_osm import synthetic_overpass_json
+
+SIZE = 8
+POINTS = 5
+
+
+@pytest.fixture(scope="module")
+def graph():
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(SIZE, 0))
+    return engine.compute_graph(ways, raw_nodes)
+
+
+@pytest.mark.parametrize("options", option_sets(0, 2))
+def test_matrix_matches_individual_routes(graph, options):
+    calculator = RouteCalculator(graph, RoutingOptions(options))
+    journeys = random_journeys(SIZE, 0, POINTS)
+    origins = [start for start, _ in journeys]
+    # Includes an origin as a destination, so there's a route of no length
+    destinations = [end for _, end in journeys] + [origins[0]]
+    matrix = calculator.calculate_matrix(origins, destinations)
+    assert matrix.weights.shape == (len(origins), len(destinations))
+    for row, origin in enumerate(origins):
+        for column, destination in enumerate(destinations):
+            try:
+                route = calculator.calculate_route_a_star(origin, destination)
+            except NetworkXNoPath:
+                assert matrix.weights[row, column] == inf
+                continue
+            weight = path_weight(graph, route.nodes, calculator.calculate_weight)
+            if weight == inf:
+                # Routes can cross impassable edges, which the matrix never does
+                assert matrix.weights[row, column] == inf
+                continue
+            assert matrix.weights[row, column] == pytest.approx(weight)
+            assert matrix.distances[row, column] == pytest.approx(
+                path_weight(graph, route.nodes, lambda a, b, data: data["length"])
+            )
+            assert matrix.times[row, column] == pytest.approx(
+                path_weight(
+                    graph,
+                    route.nodes,
+                    lambda a, b, data: calculator.estimate_time(data),
+                )
+            )
+    assert matrix.weights[0, len(destinations) - 1] == 0
@@ -0,0 +1,109 @@
+from signal import SIGTERM
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import asyncio
+import json
+import os
+from route_result import RouteResult
+from route_server import Region, RoutingServer
+from routing_engine import RoutingEngine
+from routing_fixtures import DEFAULT_OPTIONS
+from synthetic_osm import BLOCK_LAT, BLOCK_LON, ORIGIN, synthetic_overpass_json
+
+SIZE = 5
+
+
+class RecordingRegion(Region):
+    """A region that remembers whether it has been shut down"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shut_down = False
+
+    def shutdown(self):
+        super().shutdown()
+        self.shut_down = True
+
+
+def post_json(address: tuple[str, int], path: str, body: dict) -> tuple[int, dict]:
+    request = Request(
+        f"http://{address[0]}:{address[1]}{path}",
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urlopen(request, timeout=10) as response:
+            return response.status, json.load(response)
+    except HTTPError as error:
+        return error.code, json.load(error)
+
+
+def route_request(**changes) -> dict:
+    return {
+        "region": "grid",
+        "start": [ORIGIN[0], ORIGIN[1]],
+        "end": [ORIGIN[0] + (SIZE - 1) * BLOCK_LAT, ORIGIN[1] + (SIZE - 1) * BLOCK_LON],
+        "options": DEFAULT_OPTIONS,
+    } | changes
+
+
+class BrokenRegion(Region):
+    """A region whose searches fail with a bug, rather than because of the request"""
+
+    def calculate_route(self, options, start, end, search_mode) -> RouteResult:
+        raise KeyError("bug")
+
+
+def serve_requests(
+    server: RoutingServer, requests: list[dict]
+) -> list[tuple[int, dict]]:
+    """Posts each request to `/route` in turn, then stops the server with SIGTERM"""
+
+    async def run() -> list[tuple[int, dict]]:
+        serving = asyncio.create_task(server.serve("127.0.0.1", 0))
+        await asyncio.wait_for(server.listening.wait(), 10)
+        assert server.address is not None
+        responses = [
+            await asyncio.to_thread(post_json, server.address, "/route", request)
+            for request in requests
+        ]
+        os.kill(os.getpid(), SIGTERM)
+        await asyncio.wait_for(serving, 10)
+        return responses
+
+    return asyncio.run(run())
+
+
+def grid_graph():
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(SIZE, 0))
+    return engine.compute_graph(ways, raw_nodes, compact=True)
+
+
+def test_server_answers_routes_and_stops_on_sigterm():
+    region = RecordingRegion(grid_graph())
+    missing_option = dict(DEFAULT_OPTIONS)
+    del missing_option["rights_of_way"]
+    (ok_status, route), *errors = serve_requests(
+        RoutingServer({"grid": region}),
+        [
+            route_request(),
+            route_request(start=[ORIGIN[0]]),
+            route_request(end=[200.0, ORIGIN[1]]),
+            route_request(options=missing_option),
+            route_request(region="nowhere"),
+        ],
+    )
+    assert ok_status == 200
+    assert route["distance"] > 0
+    assert [status for status, _ in errors] == [400, 400, 400, 404]
+    assert all("error" in response for _, response in errors)
+    assert "rights_of_way" in errors[2][1]["error"]
+    assert region.shut_down
+
+
+def test_unexpected_errors_are_internal_server_errors():
+    responses = serve_requests(
+        RoutingServer({"grid": BrokenRegion(grid_graph())}), [route_request()]
+    )
+    assert responses == [(500, {"error": "Internal server error"})]
@@ -0,0 +1,45 @@
+import pytest
+from reference_weights import ReferenceWeights
+from routing_engine import RoutingOptions
+from routing_fixtures import DEFAULT_OPTIONS, option_sets
+from routing_profile import DEFAULT_PROFILE, CompiledProfile
+from synthetic_osm import synthetic_tag_corpus
+
+CORPUS_SIZE = 2_000
+OPTION_SETS = 10
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_default_profile_matches_reference_way_weights(seed):
+    way_tags, _ = synthetic_tag_corpus(CORPUS_SIZE, seed)
+    for options in option_sets(seed, OPTION_SETS):
+        routing_options = RoutingOptions(options)
+        profile = CompiledProfile(DEFAULT_PROFILE, routing_options)
+        reference = ReferenceWeights(routing_options)
+        for tags in way_tags:
+            # The reference adds implied tags to the dict that it's given
+            reference_tags = dict(tags)
+            reference.add_implicit_tags(reference_tags)
+            assert profile.way_weight(tags) == reference.calculate_way_weight(
+                reference_tags
+            ), f"way {tags} with {options}"
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_default_profile_matches_reference_node_weights(seed):
+    _, node_tags = synthetic_tag_corpus(CORPUS_SIZE, seed)
+    for options in option_sets(seed, OPTION_SETS):
+        routing_options = RoutingOptions(options)
+        profile = CompiledProfile(DEFAULT_PROFILE, routing_options)
+        reference = ReferenceWeights(routing_options)
+        for tags in node_tags:
+            assert profile.node_weight(tags) == reference.calculate_node_weight(
+                tags
+            ), f"node {tags} with {options}"
+
+
+def test_implied_tags_dont_change_shared_tags():
+    profile = CompiledProfile(DEFAULT_PROFILE, RoutingOptions(DEFAULT_OPTIONS))
+    tags = {"highway": "service", "service": "driveway"}
+    profile.way_weight(tags)
+    assert tags == {"highway": "service", "service": "driveway"}
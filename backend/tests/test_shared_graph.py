@@ -0,0 +1,25 @@
+from routing_engine import RouteCalculator, RoutingEngine, RoutingOptions
+from routing_fixtures import DEFAULT_OPTIONS, random_journeys
+from shared_graph import RouteWorkerPool
+from synthetic_osm import synthetic_overpass_json
+
+SIZE = 8
+JOURNEYS = 6
+
+
+def test_workers_route_like_this_process():
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(SIZE, 0))
+    graph = engine.compute_graph(ways, raw_nodes, compact=True)
+    calculator = RouteCalculator(graph, RoutingOptions(DEFAULT_OPTIONS))
+    journeys = random_journeys(SIZE, 0, JOURNEYS)
+    with RouteWorkerPool(graph, 1) as pool:
+        worker_routes = list(pool.map_routes(DEFAULT_OPTIONS, journeys, chunksize=2))
+        bidirectional_route = pool.submit_route(
+            DEFAULT_OPTIONS, *journeys[0], search_mode="bidirectional_astar"
+        ).result()
+    for (start, end), worker_route in zip(journeys, worker_routes):
+        route = calculator.calculate_route_a_star(start, end)
+        assert worker_route.nodes == route.nodes
+        assert worker_route.total_distance() == route.total_distance()
+    assert bidirectional_route.total_distance() == worker_routes[0].total_distance()
@@ -0,0 +1,60 @@
+from array import array
+from time import perf_counter
+import pytest
+from geometry import distance_between_points
+from routing_engine import RoutingEngine
+from routing_fixtures import random_journeys
+from spatial_index import nearest_by_scan
+from synthetic_osm import synthetic_overpass_json
+
+SIZE = 12
+
+
+@pytest.fixture(scope="module")
+def graph():
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(SIZE, 0))
+    return engine.compute_graph(ways, raw_nodes)
+
+
+def nearest_by_checking_every_node(graph, pos) -> int:
+    return min(
+        graph.nodes(),
+        key=lambda node_id: distance_between_points(pos, graph.node_position(node_id)),
+    )
+
+
+def test_nearest_node_matches_checking_every_node(graph):
+    points = [point for journey in random_journeys(SIZE, 0, 5) for point in journey]
+    for pos in points:
+        assert graph.nearest_node(pos) == nearest_by_checking_every_node(graph, pos)
+
+
+@pytest.mark.parametrize("pos", [(0, 0), (-51, 179), (89, -179)])
+def test_far_away_nearest_node_is_quick(graph, pos):
+    started = perf_counter()
+    node_id = graph.nearest_node(pos)
+    assert perf_counter() - started < 0.1
+    # This far away, the nearest node is picked by straight-line distance, which can't be noticeably further
+    nearest_distance = distance_between_points(
+        pos, graph.node_position(nearest_by_checking_every_node(graph, pos))
+    )
+    assert distance_between_points(pos, graph.node_position(node_id)) < (
+        nearest_distance + 1
+    )
+
+
+def test_nearest_by_scan_matches_checking_every_node(graph):
+    node_ids = list(graph.nodes())
+    lats = array("d", (graph.node_position(node_id)[0] for node_id in node_ids))
+    lons = array("d", (graph.node_position(node_id)[1] for node_id in node_ids))
+    points = [point for journey in random_journeys(SIZE, 1, 5) for point in journey]
+    for pos in points:
+        nearest = [node_ids[index] for index in nearest_by_scan(pos, 3, lats, lons)]
+        expected = sorted(
+            node_ids,
+            key=lambda node_id: distance_between_points(
+                pos, graph.node_position(node_id)
+            ),
+        )[:3]
+        assert nearest == expected
@@ -0,0 +1,76 @@
+import numpy
+import pytest
+import tag_columns
+from osm_data_types import TagSetInterner
+from routing_engine import RouteCalculator, RoutingEngine, RoutingOptions
+from routing_fixtures import DEFAULT_OPTIONS, option_sets
+from routing_profile import DEFAULT_PROFILE, DEFAULT_WAY_TAG_KEYS, CompiledProfile
+from synthetic_osm import synthetic_overpass_json, synthetic_tag_corpus
+from tag_columns import TagColumns
+
+EDGES = 5_000
+OPTION_SETS = 3
+
+
+@pytest.fixture(scope="module")
+def corpus() -> tuple[list[dict[str, str]], numpy.ndarray]:
+    way_tags, _ = synthetic_tag_corpus(500, 0)
+    tag_sets = TagSetInterner()
+    for tags in way_tags:
+        tag_sets.intern(tags)
+    edge_tags_keys = numpy.random.default_rng(0).integers(
+        len(tag_sets), size=EDGES, dtype=numpy.int32
+    )
+    return tag_sets.tag_sets, edge_tags_keys
+
+
+def weigh_each_edge(profile, tag_sets, edge_tags_keys) -> numpy.ndarray:
+    return numpy.array([profile.way_weight(tag_sets[key]) for key in edge_tags_keys])
+
+
+@pytest.mark.parametrize("options", option_sets(0, OPTION_SETS))
+def test_evaluate_matches_weighing_each_edge(corpus, options):
+    tag_sets, edge_tags_keys = corpus
+    profile = CompiledProfile(DEFAULT_PROFILE, RoutingOptions(options))
+    columns = TagColumns.from_tag_sets(tag_sets, edge_tags_keys, DEFAULT_WAY_TAG_KEYS)
+    assert len(columns) == EDGES
+    numpy.testing.assert_array_equal(
+        columns.evaluate(profile.way_weight),
+        weigh_each_edge(profile, tag_sets, edge_tags_keys),
+    )
+
+
+def test_edge_tags_only_have_stored_keys(corpus):
+    tag_sets, edge_tags_keys = corpus
+    keys = ["highway", "surface", "lit"]
+    columns = TagColumns.from_tag_sets(tag_sets, edge_tags_keys, keys)
+    for edge_index in range(0, EDGES, 97):
+        tags = tag_sets[edge_tags_keys[edge_index]]
+        assert columns.edge_tags(edge_index) == {
+            key: value for key, value in tags.items() if key in keys
+        }
+
+
+def test_combinations_are_the_same_when_codes_are_folded(corpus, monkeypatch):
+    tag_sets, edge_tags_keys = corpus
+    profile = CompiledProfile(DEFAULT_PROFILE, RoutingOptions(DEFAULT_OPTIONS))
+    expected = weigh_each_edge(profile, tag_sets, edge_tags_keys)
+    # So that the combined codes are renumbered after almost every column
+    monkeypatch.setattr(tag_columns, "MAX_COMBINATION_CODE", 64)
+    columns = TagColumns.from_tag_sets(tag_sets, edge_tags_keys, DEFAULT_WAY_TAG_KEYS)
+    numpy.testing.assert_array_equal(columns.evaluate(profile.way_weight), expected)
+
+
+@pytest.mark.parametrize("options", option_sets(2, OPTION_SETS))
+def test_graph_way_weight_vector_matches_each_edge(options):
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(8, 0))
+    graph = engine.compute_graph(ways, raw_nodes, compact=True)
+    calculator = RouteCalculator(graph, RoutingOptions(options))
+    numpy.testing.assert_array_equal(
+        calculator.way_weight_vector(),
+        [
+            calculator.profile.way_weight(graph.edge_data(edge_index)["tags"])
+            for edge_index in range(graph.edge_count())
+        ],
+    )
@@ -0,0 +1,68 @@
+import pytest
+from osm_data_types import PARSED_TAG_VALUE_CACHE_SIZE, parsed_tag_value
+from routing_engine import RoutingEngine
+
+NODES = [
+    {"type": "node", "id": 1, "lat": 51.2730, "lon": -0.3980},
+    {
+        "type": "node",
+        "id": 2,
+        "lat": 51.2735,
+        "lon": -0.3975,
+        "tags": {"highway": "crossing", "crossing": "dragons"},
+    },
+    {"type": "node", "id": 3, "lat": 51.2740, "lon": -0.3970},
+    {"type": "node", "id": 4, "lat": 51.2745, "lon": -0.3965},
+]
+WAYS = [
+    {
+        "type": "way",
+        "id": 10,
+        "nodes": [1, 2],
+        "tags": {"highway": "residential", "maxspeed": "fast", "width": "2 m"},
+    },
+    {
+        "type": "way",
+        "id": 11,
+        "nodes": [2, 3],
+        "tags": {"highway": "residential", "maxspeed": "fast", "width": "2 m"},
+    },
+    {
+        "type": "way",
+        "id": 12,
+        "nodes": [3, 4],
+        "tags": {"highway": "path", "sac_scale": "abseiling", "maxspeed": "30 mph"},
+    },
+    {"type": "way", "id": 13, "nodes": [4, 1], "tags": {"highway": "road"}},
+]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_report_lists_each_invalid_tag(compact):
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json({"elements": NODES + WAYS})
+    graph = engine.compute_graph(ways, raw_nodes, compact=compact)
+    assert graph.tag_report is not None
+    rows = {
+        (row["element_type"], row["tag"], row["value"]): row
+        for row in graph.tag_report.rows()
+    }
+    assert set(rows) == {
+        ("way", "maxspeed", "fast"),
+        ("way", "sac_scale", "abseiling"),
+        ("way", "highway", "road"),
+        ("node", "crossing", "dragons"),
+    }
+    maxspeed = rows[("way", "maxspeed", "fast")]
+    assert maxspeed["count"] == 2
+    assert maxspeed["example_ids"] == [10, 11]
+    assert "fast" in maxspeed["problem"]
+    assert rows[("node", "crossing", "dragons")]["example_ids"] == [2]
+    assert "maxspeed=fast" in graph.tag_report.summary()
+
+
+def test_parsed_values_are_cached_within_a_bound():
+    assert parsed_tag_value("width", "2 m") == (2.0, None)
+    value, problem = parsed_tag_value("lanes", "many")
+    assert value is None and problem is not None
+    assert parsed_tag_value.cache_info().maxsize == PARSED_TAG_VALUE_CACHE_SIZE
@@ -0,0 +1,70 @@
+import pytest
+from osm_data_types import BoundingBox
+from routing_engine import RoutingEngine
+from synthetic_osm import BLOCK_LAT, BLOCK_LON, ORIGIN, synthetic_overpass_json
+from tiles import tiles_for_bbox
+
+SIZE = 20
+GRID_BBOX = BoundingBox(
+    ORIGIN[0],
+    ORIGIN[1],
+    ORIGIN[0] + (SIZE - 1) * BLOCK_LAT,
+    ORIGIN[1] + (SIZE - 1) * BLOCK_LON,
+)
+
+
+class TiledEngine(RoutingEngine):
+    """Answers each tile's query from one synthetic grid, like Overpass would, and remembers which were asked for"""
+
+    def __init__(self):
+        super().__init__()
+        self.grid_ways, self.grid_nodes = self.parse_overpass_json(
+            synthetic_overpass_json(SIZE, 0)
+        )
+        self.downloaded: list[BoundingBox] = []
+
+    def download_osm_data(self, bbox: BoundingBox):
+        self.downloaded.append(bbox)
+        # Every way that touches the area, with all of its nodes
+        ways = [
+            way
+            for way in self.grid_ways
+            if any(
+                bbox.min_lat <= node.pos[0] <= bbox.max_lat
+                and bbox.min_lon <= node.pos[1] <= bbox.max_lon
+                for node in way.nodes
+            )
+        ]
+        node_ids = {node.id for way in ways for node in way.nodes}
+        return ways, {node_id: self.grid_nodes[node_id] for node_id in node_ids}
+
+
+def edges(graph) -> dict:
+    """Maps every edge (in both directions) to its data, leaving out the graph's own tag set keys"""
+    return {
+        (node_id, neighbour): {
+            key: value for key, value in data.items() if key != "tags_key"
+        }
+        for node_id in graph.nodes()
+        for neighbour, data in graph.neighbours(node_id)
+    }
+
+
+def test_tiled_graph_matches_compute_graph():
+    engine = TiledEngine()
+    assert len(tiles_for_bbox(GRID_BBOX)) > 1
+    graph = engine.load_tiles(GRID_BBOX)
+    expected = engine.compute_graph(engine.grid_ways, engine.grid_nodes)
+
+    assert sorted(graph.nodes()) == sorted(expected.nodes())
+    for node_id in expected.nodes():
+        assert graph.node_position(node_id) == expected.node_position(node_id)
+    graph_edges, expected_edges = edges(graph), edges(expected)
+    assert graph_edges.keys() == expected_edges.keys()
+    for edge, data in expected_edges.items():
+        assert graph_edges[edge] == data | {"length": pytest.approx(data["length"])}
+    assert len(engine.downloaded) == len(tiles_for_bbox(GRID_BBOX))
+
+    # Tiles that have already been loaded aren't downloaded again
+    assert engine.load_tiles(GRID_BBOX) is graph
+    assert len(engine.downloaded) == len(tiles_for_bbox(GRID_BBOX))
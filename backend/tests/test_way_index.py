@@ -0,0 +1,59 @@
+import pytest
+from routing_engine import RoutingEngine
+from synthetic_osm import synthetic_overpass_json
+
+SIZE = 8
+
+
+@pytest.fixture(scope="module")
+def ways_and_graphs():
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(SIZE, 0))
+    return ways, [
+        engine.compute_graph(ways, raw_nodes),
+        engine.compute_graph(ways, raw_nodes, compact=True),
+    ]
+
+
+def scan_way_edges(graph) -> dict[int, set[frozenset[int]]]:
+    """Finds the (undirected) edges of every way by checking every edge"""
+    way_edges: dict[int, set[frozenset[int]]] = {}
+    for node_id in graph.nodes():
+        for neighbour, data in graph.neighbours(node_id):
+            way_edges.setdefault(data["id"], set()).add(frozenset((node_id, neighbour)))
+    return way_edges
+
+
+def test_way_index_matches_scanning_every_edge(ways_and_graphs):
+    ways, graphs = ways_and_graphs
+    for graph in graphs:
+        expected = scan_way_edges(graph)
+        for way in ways:
+            edges = graph.get_edges_from_way(way.id)
+            assert {frozenset(edge) for edge in edges} == expected.get(way.id, set())
+            assert len(edges) == len(expected.get(way.id, ()))
+            # In order along the way
+            for (a, b), (c, d) in zip(edges, edges[1:]):
+                assert {a, b} & {c, d}
+        assert graph.get_edges_from_way(-1) == []
+
+
+def test_ways_from_node_match_scanning_every_edge(ways_and_graphs):
+    _, graphs = ways_and_graphs
+    for graph in graphs:
+        for node_id in graph.nodes():
+            assert sorted(graph.get_ways_from_node(node_id)) == sorted(
+                {data["id"] for _, data in graph.neighbours(node_id)}
+            )
+
+
+def test_way_index_stays_correct_as_ways_are_added():
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(SIZE, 1))
+    graph = engine.compute_graph(ways[::2], raw_nodes)
+    # Some of these ways are added again, as when tiles overlap
+    graph.add_ways(ways[1::2] + ways[::4], raw_nodes)
+    expected = scan_way_edges(graph)
+    for way in ways:
+        edges = graph.get_edges_from_way(way.id)
+        assert {frozenset(edge) for edge in edges} == expected.get(way.id, set())
@@ -0,0 +1,52 @@
+from random import Random
+import sys
+import pytest
+from routing_engine import (
+    CalculatorCache,
+    RouteCalculator,
+    RoutingEngine,
+    RoutingOptions,
+)
+from routing_fixtures import DEFAULT_OPTIONS, random_journeys, random_options
+from synthetic_osm import synthetic_overpass_json
+from weight_cache import EdgeWeightCache
+
+SIZE = 6
+
+
+@pytest.fixture
+def graph():
+    engine = RoutingEngine()
+    ways, raw_nodes = engine.parse_overpass_json(synthetic_overpass_json(SIZE, 0))
+    return engine.compute_graph(ways, raw_nodes)
+
+
+def test_evicted_profiles_are_released(graph):
+    graph.weight_cache = EdgeWeightCache(max_profiles=1)
+    (start, end), *_ = random_journeys(SIZE, 0, 1)
+    first = RouteCalculator(graph, RoutingOptions(DEFAULT_OPTIONS))
+    first.calculate_route_a_star(start, end)
+    first_weights = graph.weight_cache.profile(first.fingerprint)
+    assert first_weights
+
+    other_options = RoutingOptions(random_options(Random(0)))
+    assert other_options.fingerprint() != first.fingerprint
+    RouteCalculator(graph, other_options).calculate_route_a_star(start, end)
+    assert len(graph.weight_cache) == 1
+    # Only this test still refers to the first profile's weights, even though its calculator is still around
+    assert sys.getrefcount(first_weights) == 2
+    assert first.edge_weights is not first_weights
+
+
+def test_calculator_cache_forgets_least_recently_used(graph):
+    calculators = CalculatorCache(graph, max_calculators=2)
+    default_options = RoutingOptions(DEFAULT_OPTIONS)
+    default_calculator = calculators.calculator(default_options)
+    random = Random(1)
+    for _ in range(3):
+        calculators.calculator(RoutingOptions(random_options(random)))
+        assert calculators.calculator(default_options) is default_calculator
+    assert len(calculators) == 2
+    calculators.calculator(RoutingOptions(random_options(random)))
+    calculators.calculator(RoutingOptions(random_options(random)))
+    assert calculators.calculator(default_options) is not default_calculator
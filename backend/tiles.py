@@ -0,0 +1,39 @@
+from math import asinh, atan, degrees, floor, pi, radians, sinh, tan
+from osm_data_types import BoundingBox
+
+# At zoom 14, a tile is about 2.4 km wide at the equator (and about 1.5 km wide in London)
+TILE_ZOOM = 14
+
+type Tile = tuple[int, int]
+
+
+def tile_for_coordinates(lat: float, lon: float, zoom: int = TILE_ZOOM) -> Tile:
+    """Returns the (x, y) of the slippy map tile that contains the coordinates"""
+    tile_count = 2**zoom
+    x = floor((lon + 180) / 360 * tile_count)
+    y = floor((1 - asinh(tan(radians(lat))) / pi) / 2 * tile_count)
+    # Clamp, so that the east edge and the poles don't give us tiles that don't exist
+    return min(max(x, 0), tile_count - 1), min(max(y, 0), tile_count - 1)
+
+
+def tile_bbox(tile: Tile, zoom: int = TILE_ZOOM) -> BoundingBox:
+    """Returns the area covered by a slippy map tile"""
+    x, y = tile
+    tile_count = 2**zoom
+
+    def tile_lat(y: int) -> float:
+        return degrees(atan(sinh(pi * (1 - 2 * y / tile_count))))
+
+    return BoundingBox(
+        tile_lat(y + 1),
+        x / tile_count * 360 - 180,
+        tile_lat(y),
+        (x + 1) / tile_count * 360 - 180,
+    )
+
+
+def tiles_for_bbox(bbox: BoundingBox, zoom: int = TILE_ZOOM) -> list[Tile]:
+    """Returns every slippy map tile that overlaps the bounding box"""
+    min_x, min_y = tile_for_coordinates(bbox.max_lat, bbox.min_lon, zoom)
+    max_x, max_y = tile_for_coordinates(bbox.min_lat, bbox.max_lon, zoom)
+    return [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
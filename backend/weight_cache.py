@@ -0,0 +1,52 @@
+from collections import OrderedDict
+from typing import Hashable, Iterable
+
+
+class EdgeWeightCache:
+    """Remembers the weights of edges for the last few routing profiles that were used on a graph
+
+    - A routing profile is identified by a fingerprint of the routing options (see `RoutingOptions.fingerprint()`)
+    - When more than `max_profiles` profiles have been used, the least recently used one is forgotten
+    """
+
+    def __init__(self, max_profiles: int = 4):
+        self.max_profiles = max_profiles
+        self._profiles: OrderedDict[Hashable, dict] = OrderedDict()
+        # The most recently used profile, which calculators look up for every edge they weigh
+        self._last_fingerprint: Hashable = None
+        self._last_weights: dict | None = None
+
+    def profile(
+        self, fingerprint: Hashable
+    ) -> dict[tuple[int, int], tuple[float, float]]:
+        """Returns the (mutable) weight cache for a profile, mapping (node_a, node_b) to (way weight, node weight)"""
+        if fingerprint == self._last_fingerprint and self._last_weights is not None:
+            return self._last_weights
+        weights = self._profiles.get(fingerprint)
+        if weights is not None:
+            self._profiles.move_to_end(fingerprint)
+        else:
+            weights = {}
+            self._profiles[fingerprint] = weights
+            if len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        self._last_fingerprint = fingerprint
+        self._last_weights = weights
+        return weights
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def clear(self):
+        self._profiles.clear()
+        self._last_weights = None
+
+    def forget_edges(self, edges: Iterable[tuple[int, int]]):
+        """Removes the cached weights of edges (in both directions) from every profile, e.g. after they've changed
+
+        - Unlike `clear()`, this keeps the weights of every other edge
+        """
+        for node_a, node_b in edges:
+            for weights in self._profiles.values():
+                weights.pop((node_a, node_b), None)
+                weights.pop((node_b, node_a), None)
@@ -216,6 +216,7 @@ async function calculateRoute() {
   routeCalculationProgress(CalculationState.ComputingGraph)
   await tickUI()
   const routing_graph = routing_engine.compute_graph(ways, raw_nodes)
+  console.debug("Tag problems", routing_graph.tag_report.rows().toJs())
   const calculator = py.RouteCalculator(
     routing_graph,
     py.RoutingOptions(options.routing)
@@ -225,6 +226,7 @@ async function calculateRoute() {
   const route = calculator.calculate_route_a_star(startPos, endPos)
   const timeElapsed = performance.now() - performanceStart
   console.debug("Route calculator", calculator)
+  console.debug("Route search stats", route.stats.toJs())
   console.log(
     `Calculated route with ${route.parts.length} parts ` +
       `in ${timeElapsed.toLocaleString()} ms`
@@ -241,7 +243,7 @@ async function calculateRoute() {
     totalTime: route.total_time(),
     totalDistance: route.total_distance(),
     debug: {
-      segmentWeights: calculator.segment_weights_js(),
+      segmentWeights: calculator.route_segment_weights_js(route),
     },
   })
   routeCalculationProgress(CalculationState.Idle)